@@ -0,0 +1,86 @@
+"""
+This file holds the asset registry, which loads the fonts the first time they are asked for and shares them between every module,
+and the startup profiler, which shows where the time goes while the app starts.
+
+Fonts are kept by (file, size), so every module that uses Roboto-Thin at 16 gets the same Font object (and the text cache can share the text rendered with it).
+The time spent loading fonts and icons is added up in timings, so the profiler can show it on its own instead of as part of whatever was happening at the time.
+"""
+# imports
+import time
+
+import pygame
+
+# where the fonts are
+FONT_FOLDER = "./Assets_PROG2/Fonts"
+# the fonts the app uses
+BOLD = "Roboto-Bold.ttf"
+MEDIUM = "Roboto-Medium.ttf"
+THIN = "Roboto-Thin.ttf"
+
+# every font loaded so far, by (file, size)
+fonts: dict[tuple[str, int], pygame.font.Font] = {}
+# the seconds spent loading each kind of asset (fonts, icons), read by the startup profiler
+timings: dict[str, float] = {"fonts": 0.0, "icons": 0.0}
+
+
+def get_font(file: str, size: int) -> pygame.font.Font:
+    """
+    Arguments:
+    - file: (str) the name of the font file in FONT_FOLDER (e.g. BOLD)
+    - size: (int) the size of the font
+
+    Returns the font, loading it if it hasn't been used yet
+    """
+    key = (file, size)
+    font = fonts.get(key)
+    if font is None:
+        start = time.perf_counter()
+        # the font module is the only part of pygame needed to load a font, so modules can load fonts before pygame.init is called
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = fonts[key] = pygame.font.Font(f"{FONT_FOLDER}/{file}", size)
+        timings["fonts"] += time.perf_counter()-start
+    return font
+
+
+def record(kind: str, seconds: float) -> None:
+    """ Add the time spent loading an asset of some kind (e.g. icons) """
+    timings[kind] = timings.get(kind, 0.0)+seconds
+    return None
+
+
+class StartupProfiler:
+    """
+    Measures how long each phase of starting the app takes (the time spent loading assets during a phase is counted as its own phase)
+    """
+    def __init__(self, start: float | None = None) -> None:
+        """
+        Arguments:
+        - start: (float) the time.perf_counter() the app started at, if it was taken before the profiler could be imported
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start # when the last phase ended
+        self.seen: dict[str, float] = {} # the asset timings when the last phase ended (nothing had been loaded when the app started)
+        self.phases: dict[str, float] = {} # the seconds each phase took, in the order they happened
+        return None
+
+
+    def mark(self, phase: str) -> None:
+        """ End a phase, it took the time since the last one ended (minus the time spent loading assets meanwhile) """
+        now = time.perf_counter()
+        elapsed = now-self.last
+        for kind, seconds in timings.items():
+            loading = seconds-self.seen.get(kind, 0.0)
+            self.seen[kind] = seconds
+            if loading > 0:
+                self.phases[kind] = self.phases.get(kind, 0.0)+loading
+                elapsed -= loading
+        self.phases[phase] = self.phases.get(phase, 0.0)+elapsed
+        self.last = now
+        return None
+
+
+    def report(self) -> str:
+        """ Returns the time each phase took and the total """
+        lines = [f"  {phase:<14}{seconds*1000:8.1f} ms" for phase, seconds in self.phases.items()]
+        return "\n".join([f"Startup took {(self.last-self.start)*1000:.1f} ms:"]+lines)
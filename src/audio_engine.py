@@ -0,0 +1,670 @@
+"""
+This file holds the AudioEngine, a playback backend that decodes and mixes the music itself, instead of leaving it to pygame.mixer.music (which streams the file and can't do much else).
+
+- a decoder thread decodes a song (all of it, the way mixer.Sound does) as soon as it is loaded or queued, and works out its gain
+- the producer thread cuts the decoded song into float32 blocks, applies the gain, crossfades into the queued song and writes the blocks to a RingBuffer
+- the feeder thread reads CHUNK frames at a time from the ring buffer into Sounds, and keeps one playing and one queued on a mixer Channel
+
+The ring buffer is only written by the producer and only read by the feeder, each moving its own index, so they never wait for each other.
+Marks written next to the audio say where each song (or seek) starts in the ring buffer, so the feeder knows what is playing and when to post the end event.
+The ring buffer also keeps the audio that was just played, so a seek within what is buffered (RING_AHEAD seconds ahead, or back) only moves the feeder's index,
+anything else is asked from the producer, which starts again from the decoded song straight away.
+
+It has the methods of pygame.mixer.music that the MusicPlayer uses, so it is selected by passing backend=ENGINE to the MusicPlayer (see music_player.py).
+A song is only decoded after load or queue returned, so one that can't be decoded is reported with an error event (see set_errorevent) instead of pygame.error.
+NumPy is only needed (and imported) when the engine is used.
+
+Run this file (python audio_engine.py [seconds] [song]) to compare the CPU use, underruns and seek times of both backends.
+"""
+# imports
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import numpy as np
+import pygame
+from pygame import mixer
+
+# frames in every Sound given to the Channel (about 23 ms at 44.1 kHz)
+CHUNK = 1024
+# frames the producer writes to the ring buffer at once
+BLOCK = 4096
+# how much audio the ring buffer keeps ahead of what is playing, and behind it (seconds)
+RING_AHEAD = 12.0
+RING_BEHIND = 12.0
+# how often the feeder checks the channel (seconds)
+POLL = 0.003
+# how loud songs are made when normalising (RMS in dBFS), and the most their gain is changed by (dB)
+TARGET_RMS_DB = -20.0
+MAX_GAIN_DB = 12.0
+# how many decoded songs are kept (the one playing, the one queued and the one before)
+DECODED = 3
+
+# kinds of marks
+START = "start" # playing (or seeking) started here
+SWITCH = "switch" # the queued song starts here (the song before may still be fading out)
+END = "end" # nothing comes after this
+
+
+def decode(path: str, gain_db: float | None, normalise: bool) -> tuple[np.ndarray, float]:
+    """
+    Arguments:
+    - path: (str) the path of the song
+    - gain_db: (float or None) the gain to play it at (dB), e.g. from its ReplayGain tag
+    - normalise: (bool) whether to work out the gain from how loud it is if gain_db is None
+
+    Returns the samples of the whole song in the mixer's format (frames x channels) and the gain to multiply them by to get floats from -1 to 1
+    """
+    samples = pygame.sndarray.array(mixer.Sound(path))
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    scale = 1/np.iinfo(samples.dtype).max if samples.dtype.kind in "iu" else 1.0
+    if gain_db is None and normalise and len(samples):
+        # the loudness and peak, a few seconds at a time so the whole song isn't copied as floats
+        squares = peak = 0.0
+        for i in range(0, len(samples), 1 << 18):
+            part = samples[i:i+(1 << 18)].astype(np.float32)*scale
+            squares += float(np.square(part, dtype=np.float64).sum())
+            peak = max(peak, float(np.abs(part).max()))
+        rms = (squares/samples.size)**0.5
+        gain_db = min(max(TARGET_RMS_DB-20*np.log10(max(rms, 1e-9)), -MAX_GAIN_DB), MAX_GAIN_DB)
+        # never louder than it can go without clipping
+        gain_db = min(gain_db, -20*np.log10(max(peak, 1e-9)))
+    return samples, scale*10**((gain_db or 0.0)/20)
+
+
+class Track:
+    """ A song loaded (or queued) in the engine, decoded in the background """
+    def __init__(self, path: str, future: Future) -> None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+        - future: (Future) returns what decode returns
+        """
+        self.path = path
+        self.future = future
+        return None
+
+
+    def is_ready(self) -> bool:
+        """ Returns whether it has been decoded (or failed to be) """
+        return self.future.done()
+
+
+    def get(self) -> tuple[np.ndarray, float] | None:
+        """ Returns the samples and gain (see decode), None if it couldn't be decoded, waiting for it if it isn't decoded yet """
+        try:
+            return self.future.result()
+        except (pygame.error, OSError, ValueError) as e:
+            print(f"Couldn't decode {self.path}: {e}")
+            return None
+
+
+class Mark:
+    """ Where something starts in the ring buffer """
+    def __init__(self, index: int, kind: str, track: Track | None, frame: int, serial: int) -> None:
+        """
+        Arguments:
+        - index: (int) the frame of the ring buffer it starts at (counted since the engine started)
+        - kind: (str) START, SWITCH or END
+        - track: (Track) the song from there on
+        - frame: (int) the frame of the song at index
+        - serial: (int) the play request it was written for
+        """
+        self.index = index
+        self.kind = kind
+        self.track = track
+        self.frame = frame
+        self.serial = serial
+        return None
+
+
+class Chunk:
+    """ A Sound given to the Channel: where it is in the song (and since the mark the mixer's counter counts from) """
+    def __init__(self, mark: Mark, start: int, frames: int) -> None:
+        """
+        Arguments:
+        - mark: (Mark) the START or SWITCH mark it comes after
+        - start: (int) how many frames after the mark it starts
+        - frames: (int) how long it is
+        """
+        self.mark = mark
+        self.start = start
+        self.frames = frames
+        return None
+
+
+class RingBuffer:
+    """
+    Frames of float32 audio, written by one thread and read by another without locking:
+    the writer only moves written, the reader only moves read (both count frames since the start, the buffer wraps them around)
+    """
+    def __init__(self, frames: int, channels: int) -> None:
+        """
+        Arguments:
+        - frames: (int) how many frames it holds
+        - channels: (int) how many channels every frame has
+        """
+        self.data = np.zeros((frames, channels), np.float32)
+        self.size = frames
+        self.written = 0
+        self.read = 0
+        return None
+
+
+    def available(self) -> int:
+        """ Returns how many frames can be read """
+        return self.written-self.read
+
+
+    def space(self) -> int:
+        """ Returns how many frames can be written without overwriting any that haven't been read """
+        return self.size-(self.written-self.read)
+
+
+    def write(self, block: np.ndarray) -> None:
+        """ Write the frames (the writer must check there is space for them first) """
+        start = self.written % self.size
+        first = min(len(block), self.size-start)
+        self.data[start:start+first] = block[:first]
+        self.data[:len(block)-first] = block[first:]
+        # only move the index once the frames are there
+        self.written += len(block)
+        return None
+
+
+    def take(self, frames: int) -> np.ndarray:
+        """ Returns a copy of the next frames (at most the ones available) and moves past them """
+        frames = min(frames, self.available())
+        start = self.read % self.size
+        first = min(frames, self.size-start)
+        block = np.concatenate((self.data[start:start+first], self.data[:frames-first])) if first < frames else self.data[start:start+frames].copy()
+        self.read += frames
+        return block
+
+
+    def holds(self, index: int) -> bool:
+        """ Returns whether the frame at index is still in the buffer (with a margin for a block the writer may be writing) """
+        return self.written-self.size+2*BLOCK <= index <= self.written
+
+
+class AudioEngine:
+    def __init__(self, crossfade: float = 0.0, normalise: bool = False, channel: int = 0) -> None:
+        """
+        Arguments:
+        - crossfade: (float) how long the queued song fades in over the end of the one playing (seconds, 0 to start it straight after)
+        - normalise: (bool) whether to bring every song to the same loudness (when it isn't loaded with a gain)
+        - channel: (int) the mixer channel to play on (it is reserved for the engine)
+
+        The mixer must already be initialised (16 bit)
+        """
+        self.rate, size, self.channels = mixer.get_init()
+        if abs(size) != 16:
+            raise pygame.error("the audio engine needs the mixer to be 16 bit")
+        mixer.set_reserved(channel+1)
+        self.channel = mixer.Channel(channel)
+        self.crossfade = crossfade
+        self.normalise = normalise
+        self.volume = 1.0
+        self.endevent = pygame.NOEVENT
+        self.errorevent = pygame.NOEVENT
+        # how far the mixer's counter (get_pos) is ahead of what can be heard: the buffer the sound card is playing
+        self.latency = 512/self.rate
+
+        self.ring = RingBuffer(int((RING_AHEAD+RING_BEHIND)*self.rate), self.channels)
+        self.behind = int(RING_BEHIND*self.rate) # frames the producer leaves behind what was read
+        self.marks: deque[Mark] = deque() # written by the producer, read by the feeder
+        self.decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decoder")
+        self.tracks: dict[str, Track] = {} # the latest decoded songs, by path
+
+        # shared by the main thread and the feeder (and the producer's commands), never held while decoding or waiting
+        self.lock = threading.Lock()
+        self.loaded: Track | None = None # the song play plays (the one playing, once a queued one starts)
+        self.queued: Track | None = None
+        self.command: tuple[int, Track | None, int] | None = None # (serial, song, frame) the producer should play from next
+        self.serial = 0 # the latest play request
+        self.switched: Track | None = None # the song the producer last crossed into
+        self.want: int | None = None # the play request the feeder is waiting for the producer to start
+        self.mark: Mark | None = None # the START or SWITCH mark the feeder is reading after
+        self.sent: deque[Chunk] = deque() # the chunks the channel is playing and has queued
+        self.playing: tuple[Chunk, float] | None = None # the chunk that can be heard, and since when
+        self.ended = False # whether the feeder has read up to an END mark
+        self.paused = False
+        self.paused_at = 0.0
+        self.underruns = 0 # how often the channel ran out of audio while playing
+        self.chunks = 0 # how many chunks were played
+
+        self.wake = threading.Event() # wakes the producer up
+        self.closing = threading.Event()
+        self.threads = [threading.Thread(target=self.produce, name="producer", daemon=True), threading.Thread(target=self.feed, name="feeder", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return None
+
+
+    def get_track(self, path: str, gain_db: float | None) -> Track:
+        """ Returns the song at path, decoding it on the decoder thread if it isn't decoded already """
+        if not os.path.isfile(path):
+            raise pygame.error(f"No file '{path}' found")
+        track = self.tracks.pop(path, None)
+        if track is None or gain_db is not None:
+            track = Track(path, self.decoder.submit(decode, path, gain_db, self.normalise))
+        self.tracks[path] = track
+        # forget the oldest songs (the one playing and the one queued are the latest)
+        while len(self.tracks) > DECODED:
+            del self.tracks[next(iter(self.tracks))]
+        return track
+
+
+    # the methods of pygame.mixer.music
+    def load(self, path: str, gain_db: float | None = None) -> None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+        - gain_db: (float) the gain to play it at (dB), if not given it is normalised (if normalise is on) or played as it is
+
+        Stop playing and load the song (it is decoded in the background), raises pygame.error if there is no such file
+        """
+        track = self.get_track(path, gain_db)
+        self.stop()
+        with self.lock:
+            self.loaded = track
+            self.queued = None
+        return None
+
+
+    def queue(self, path: str, gain_db: float | None = None) -> None:
+        """ Queue the song to start (or fade in) when the one playing ends, see load """
+        track = self.get_track(path, gain_db)
+        with self.lock:
+            self.queued = track
+            mark = self.mark
+            if self.switched is not None and self.switched.path != path and self.switched is not self.loaded and mark is not None and mark.track is not self.switched:
+                # the producer already crossed into another song, so have it start again from what the feeder reads next
+                self.request(mark.track, mark.frame+self.ring.read-mark.index)
+        self.wake.set()
+        return None
+
+
+    def play(self, loops: int = 0, start: float = 0.0) -> None:
+        """
+        Arguments:
+        - loops: (int) not used, it is there to match pygame.mixer.music.play
+        - start: (float) where in the song to play from (seconds)
+
+        Play the loaded song from start, straight away if start is in the audio that is still buffered
+        """
+        with self.lock:
+            if self.loaded is None:
+                raise pygame.error("music not loaded")
+            frame = max(int(start*self.rate), 0)
+            self.channel.stop()
+            self.sent.clear()
+            self.playing = None
+            self.paused = False
+            self.ended = False
+            mark = self.mark
+            index = mark.index+frame-mark.frame if mark is not None and mark.track is self.loaded else -1
+            following = self.marks[0].index if self.marks else self.ring.written
+            if self.want is None and mark is not None and mark.index <= index < following and self.ring.holds(index):
+                # it's buffered: skip (or go back) to it, and count from there
+                self.mark = Mark(index, START, mark.track, frame, mark.serial)
+                self.ring.read = index
+            else:
+                self.request(self.loaded, frame)
+        self.wake.set()
+        return None
+
+
+    def request(self, track: Track | None, frame: int) -> None:
+        """ Ask the producer to play from the frame of the song (None to stop), and the feeder to wait for it (must be called with the lock) """
+        self.serial += 1
+        self.command = (self.serial, track, frame)
+        self.want = self.serial if track is not None else None
+        if track is None:
+            self.mark = None
+        return None
+
+
+    def pause(self) -> None:
+        """ Pause the channel, and the counter with it """
+        with self.lock:
+            if not self.paused:
+                self.channel.pause()
+                self.paused = True
+                self.paused_at = time.perf_counter()
+        return None
+
+
+    def unpause(self) -> None:
+        """ Carry on playing """
+        with self.lock:
+            if self.paused:
+                self.channel.unpause()
+                self.paused = False
+                if self.playing is not None:
+                    chunk, since = self.playing
+                    self.playing = (chunk, since+time.perf_counter()-self.paused_at)
+        return None
+
+
+    def stop(self) -> None:
+        """ Stop playing (play starts the loaded song again) """
+        with self.lock:
+            self.channel.stop()
+            self.sent.clear()
+            self.playing = None
+            self.paused = False
+            self.ended = False
+            self.request(None, 0)
+        self.wake.set()
+        return None
+
+
+    def get_pos(self) -> int:
+        """ Returns how long the song has played since play was called, or the queued song started (ms) """
+        with self.lock:
+            if self.playing is None:
+                return 0
+            chunk, since = self.playing
+            now = self.paused_at if self.paused else time.perf_counter()
+            return int((chunk.start+min((now-since)*self.rate, chunk.frames))*1000/self.rate)
+
+
+    def get_busy(self) -> bool:
+        """ Returns whether a song is playing """
+        return self.mark is not None and not self.paused
+
+
+    def set_volume(self, volume: float) -> None:
+        self.volume = min(max(volume, 0.0), 1.0)
+        self.channel.set_volume(self.volume)
+        return None
+
+
+    def get_volume(self) -> float:
+        return self.volume
+
+
+    def set_endevent(self, event_type: int = pygame.NOEVENT) -> None:
+        """ Post an event of event_type when a song ends (or the queued one starts) """
+        self.endevent = event_type
+        return None
+
+
+    def set_errorevent(self, event_type: int = pygame.NOEVENT) -> None:
+        """
+        Post an event of event_type (with the path of the song) when a song that was loaded or queued can't be decoded.
+        The mixer can't load such a song, but the engine only decodes it after load or queue returned.
+        Without an error event, a song that can't be decoded ends straight away
+        """
+        self.errorevent = event_type
+        return None
+
+
+    def set_crossfade(self, seconds: float) -> None:
+        """ Change how long the queued song fades in over the end of the one playing (from the next song on) """
+        self.crossfade = max(seconds, 0.0)
+        return None
+
+
+    def get_stats(self) -> dict:
+        """ Returns the number of chunks played and underruns, and how much audio is buffered ahead (seconds) """
+        return {"chunks": self.chunks, "underruns": self.underruns, "buffered": self.ring.available()/self.rate}
+
+
+    def close(self) -> None:
+        """ Stop the threads and the channel (before the mixer is quit) """
+        self.closing.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join()
+        self.decoder.shutdown(wait=False, cancel_futures=True)
+        self.channel.stop()
+        return None
+
+
+    # the producer thread
+    def produce(self) -> None:
+        """ Write the songs to the ring buffer block by block, crossfading into the queued song """
+        track: Track | None = None
+        frame = 0
+        fade: tuple | None = None # (samples, gain, frame, frames done, frames in all) of the song fading out
+        origin = 0 # where the latest play request starts (the feeder skips everything before it, so it can be overwritten)
+        while not self.closing.is_set():
+            self.wake.clear()
+            with self.lock:
+                command, self.command = self.command, None
+                queued = self.queued
+            if command is not None:
+                serial, track, frame = command
+                fade = None
+                self.switched = None
+                if track is not None:
+                    origin = self.ring.written
+                    self.marks.append(Mark(origin, START, track, frame, serial))
+            # wait for something to play, the song to be decoded, or space in the ring buffer (leaving what was just played)
+            if track is None or not track.is_ready() or self.ring.size-self.behind-(self.ring.written-max(self.ring.read, origin)) < BLOCK:
+                self.wake.wait(BLOCK/self.rate/4)
+                continue
+            data = track.get()
+            if data is None:
+                # it couldn't be decoded, so tell the player (or end it straight away if it isn't listening)
+                if self.errorevent != pygame.NOEVENT:
+                    pygame.event.post(pygame.event.Event(self.errorevent, path=track.path))
+                else:
+                    self.marks.append(Mark(self.ring.written, END, track, frame, 0))
+                track = None
+                continue
+            samples, gain = data
+            end = len(samples)
+            fade_frames = min(int(self.crossfade*self.rate), end)
+            next_data = queued.get() if queued is not None and queued.is_ready() else None
+            if queued is not None and queued.is_ready() and next_data is None:
+                # the queued song couldn't be decoded, so this one ends as if nothing was queued
+                with self.lock:
+                    if self.queued is queued:
+                        self.queued = None
+                if self.errorevent != pygame.NOEVENT:
+                    pygame.event.post(pygame.event.Event(self.errorevent, path=queued.path))
+                queued = None
+            if next_data is not None and end-frame <= fade_frames:
+                # start the queued song, fading out what is left of this one over it
+                self.marks.append(Mark(self.ring.written, SWITCH, queued, 0, 0))
+                self.switched = queued
+                with self.lock:
+                    if self.queued is queued:
+                        self.queued = None
+                fade = (samples, gain, frame, 0, end-frame) if frame < end else None
+                track, frame = queued, 0
+                continue
+            if frame >= end:
+                if queued is not None:
+                    self.wake.wait(BLOCK/self.rate/4) # the queued song isn't decoded yet
+                else:
+                    self.marks.append(Mark(self.ring.written, END, track, frame, 0))
+                    track = None
+                continue
+            # stop where the queued song will start fading in
+            limit = end-fade_frames if queued is not None and end-fade_frames > frame else end
+            count = min(BLOCK, limit-frame)
+            block = samples[frame:frame+count].astype(np.float32)
+            block *= gain
+            if fade is not None:
+                old, old_gain, old_frame, done, total = fade
+                n = min(count, total-done, len(old)-old_frame-done)
+                # equal power, so it doesn't get quieter in the middle
+                t = (np.arange(done, done+n, dtype=np.float32)+0.5)*(np.pi/2/total)
+                block[:n] *= np.sin(t)[:, None]
+                block[:n] += old[old_frame+done:old_frame+done+n].astype(np.float32)*(old_gain*np.cos(t))[:, None]
+                fade = (old, old_gain, old_frame, done+n, total) if done+n < total else None
+            self.ring.write(block)
+            frame += count
+        return None
+
+
+    # the feeder thread
+    def feed(self) -> None:
+        """ Keep the channel playing a chunk and with one queued """
+        while not self.closing.is_set():
+            with self.lock:
+                self.service(time.perf_counter())
+            time.sleep(POLL)
+        return None
+
+
+    def service(self, now: float) -> None:
+        """ Notice the chunks the channel finished, and give it more (called with the lock) """
+        if self.want is not None:
+            # skip everything until the producer starts the play request
+            while self.marks and self.marks[0].serial != self.want:
+                self.marks.popleft()
+            if not self.marks:
+                return None
+            self.mark = self.marks.popleft()
+            self.ring.read = self.mark.index
+            self.want = None
+        if self.paused or self.mark is None:
+            return None
+
+        if self.sent:
+            queued = self.channel.get_queue()
+            if not self.channel.get_busy():
+                if queued is not None:
+                    return None # the chunk ended and the queued one is about to start (pygame starts it from the audio thread once it gets the GIL)
+                # it played everything it had
+                self.sent.clear()
+                if not self.ended:
+                    self.underruns += 1
+            elif len(self.sent) == 2 and queued is None:
+                # the queued chunk started
+                self.sent.popleft()
+                self.heard(self.sent[0], now)
+
+        while len(self.sent) < 2:
+            chunk, block = self.take()
+            if chunk is None:
+                break
+            sound = pygame.sndarray.make_sound(np.clip(block*32767, -32768, 32767).astype(np.int16).reshape(len(block), -1) if self.channels > 1 else np.clip(block[:, 0]*32767, -32768, 32767).astype(np.int16))
+            if self.sent:
+                self.channel.queue(sound)
+            else:
+                self.channel.play(sound)
+                self.heard(chunk, now)
+            self.sent.append(chunk)
+
+        if self.ended and not self.sent:
+            # everything was played
+            self.mark = None
+            self.ended = False
+            pygame.event.post(pygame.event.Event(self.endevent))
+        return None
+
+
+    def take(self) -> tuple[Chunk | None, np.ndarray | None]:
+        """ Returns the next chunk from the ring buffer (up to the next mark) and its audio, (None, None) if there isn't any yet (called with the lock) """
+        while self.marks and self.marks[0].index <= self.ring.read:
+            mark = self.marks.popleft()
+            if mark.kind == END:
+                self.ended = True
+                return None, None
+            self.mark = mark
+        if self.ended:
+            return None, None
+        frames = min(CHUNK, self.ring.available(), (self.marks[0].index if self.marks else self.ring.written)-self.ring.read)
+        if frames <= 0:
+            return None, None
+        chunk = Chunk(self.mark, self.ring.read-self.mark.index, frames)
+        return chunk, self.ring.take(frames)
+
+
+    def heard(self, chunk: Chunk, now: float) -> None:
+        """ The chunk started playing (called with the lock) """
+        before = self.playing[0].mark if self.playing is not None else None
+        self.playing = (chunk, now)
+        self.chunks += 1
+        if chunk.mark.kind == SWITCH and chunk.mark is not before:
+            # the queued song can be heard, so it is the loaded one now
+            self.loaded = chunk.mark.track
+            pygame.event.post(pygame.event.Event(self.endevent))
+        return None
+
+
+if __name__ == "__main__":
+    # play a song with both backends while a stand-in main loop runs, seeking every few seconds, and compare the CPU they use, the underruns and how long the seeks take
+    # usage (from the src folder): python audio_engine.py [seconds per run] [song (a tone is made if not given)]
+    import sys
+    import wave
+    import tempfile
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 8.0
+    pygame.init()
+    mixer.init()
+    rate, _, channels = mixer.get_init()
+
+    path = sys.argv[2] if len(sys.argv) > 2 else ""
+    if not path:
+        # a minute of a tone that gets louder and quieter
+        path = os.path.join(tempfile.mkdtemp(), "tone.wav")
+        t = np.arange(60*rate)/rate
+        tone = (np.sin(2*np.pi*440*t)*(0.3+0.2*np.sin(2*np.pi*t/7))*32767).astype(np.int16)
+        with wave.open(path, "wb") as file:
+            file.setnchannels(channels)
+            file.setsampwidth(2)
+            file.setframerate(rate)
+            file.writeframes(np.repeat(tone[:, None], channels, axis=1).tobytes())
+
+    def frame() -> None:
+        """ A frame of the stand-in main loop (about as long as the renderer comparing the elements' states) """
+        for i in range(3000):
+            (i, (i, i), (255, 255, 255), str(i)) == (i, (i, i), (255, 255, 255), str(i))
+        return None
+
+    length = mixer.Sound(path).get_length()
+    SONG_END = pygame.USEREVENT+10
+
+    def run(name: str, music, crossfade: bool) -> None:
+        """ Play for a while at 60 frames a second, seeking every second (10 seconds on or back, or somewhere else), or crossfading into the same song queued near its end """
+        music.set_endevent(SONG_END)
+        music.load(path)
+        start = max(length-seconds/2, 0) if crossfade else 0.0
+        if crossfade:
+            music.queue(path)
+            time.sleep(0.5) # let it decode both
+        music.play(start=start)
+        pygame.event.clear()
+        waits = {"10 s on/back": [], "elsewhere": []}
+        wall, cpu = time.perf_counter(), time.process_time()
+        second = 0
+        while time.perf_counter()-wall < seconds:
+            frame_start = time.perf_counter()
+            frame()
+            if int(time.perf_counter()-wall) > second and not crossfade:
+                second += 1
+                start = min(max(start+music.get_pos()/1000+(10, -10, 0)[second % 3], 0), length-1) if second % 3 else (length*second/7) % length
+                seek_start = time.perf_counter()
+                music.play(start=start)
+                # how long until it plays from there
+                while music.get_pos() <= 0 and time.perf_counter()-seek_start < 0.5:
+                    time.sleep(0.0005)
+                waits["10 s on/back" if second % 3 else "elsewhere"].append(time.perf_counter()-seek_start)
+            time.sleep(max(1/60-(time.perf_counter()-frame_start), 0))
+        wall, cpu = time.perf_counter()-wall, time.process_time()-cpu
+        ends = len(pygame.event.get(SONG_END))
+        music.stop()
+        stats = music.get_stats() if isinstance(music, AudioEngine) else {}
+        seeks = "  ".join(f"{kind} {sum(w)/len(w)*1000:.1f} ms" for kind, w in waits.items() if w) if not crossfade else f"{ends} song crossfaded into"
+        print(f"{name:<22}{cpu/wall*100:>7.1f}{stats.get('underruns', '-'):>11}   {seeks}")
+        return None
+
+    print(f"{'backend':<22}{'cpu %':>7}{'underruns':>11}   seeking until it plays from there")
+    run("mixer.music", mixer.music, False)
+    engine = AudioEngine()
+    run("engine", engine, False)
+    engine.set_crossfade(3.0)
+    engine.normalise = True
+    run("engine, crossfading", engine, True)
+    engine.close()
+    pygame.quit()
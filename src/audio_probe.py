@@ -0,0 +1,483 @@
+"""
+This file probes audio files for their duration (and some other info) without decoding them.
+
+MP3 files are read by their frame headers:
+- if the first frame has a Xing/Info or VBRI tag, the frame count in the tag gives the length straight away
+- if not, the first few frames are checked, and if they all share a bitrate (CBR) the length is worked out from the file size
+- if the bitrate changes (VBR without a tag), every frame header is walked through and counted
+
+Only a few KB of the file is read in the first two cases, compared to mixer.Sound which decodes the whole song into memory.
+
+Ogg files (Opus and Vorbis, e.g. downloaded songs) are read by their pages: the first page says the sample rate, and the last page says how many samples come before its end.
+WAV files are read by their chunks (the fmt chunk says how many bytes a second takes, the data chunk how many bytes there are),
+and FLAC files by their STREAMINFO block, which says the sample rate and how many samples there are.
+"""
+# imports
+import os
+import struct
+
+# bitrates (in kbps) indexed by [mpeg version 1 or 2][layer][bitrate index], MPEG 2.5 uses the MPEG 2 table
+BITRATES = {
+    1: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    2: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+
+# sample rates indexed by the version bits of the header (0 = MPEG 2.5, 2 = MPEG 2, 3 = MPEG 1)
+SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+# how many frames to check before assuming the file is CBR
+CBR_CHECK_FRAMES = 8
+# how much of the file to read to look for the first frame
+HEAD_SIZE = 16384
+# how much of the end of an Ogg file to read to find its last page (pages are at most about 64 KB)
+OGG_TAIL_SIZE = 65536
+
+
+class AudioInfo:
+    """
+    Holds information about an audio file (length in milliseconds, bitrate in kbps, sample rate in Hz)
+    """
+    def __init__(self, length: int = 0, bitrate: int = 0, sample_rate: int = 0) -> None:
+        self.length = length
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+
+
+class FrameHeader:
+    """
+    Holds the information decoded from the 4 byte header of an MPEG audio frame
+    """
+    def __init__(self, version: int, layer: int, bitrate: int, sample_rate: int, padding: int, mono: bool) -> None:
+        """
+        Arguments:
+        - version: (int) the version bits of the header (0 = MPEG 2.5, 2 = MPEG 2, 3 = MPEG 1)
+        - layer: (int) the layer (1, 2 or 3)
+        - bitrate: (int) the bitrate of the frame in kbps
+        - sample_rate: (int) the sample rate in Hz
+        - padding: (int) 1 if the frame is padded else 0
+        - mono: (bool) whether the frame is single channel or not
+        """
+        self.version = version
+        self.layer = layer
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.padding = padding
+        self.mono = mono
+
+        # samples per frame depend on the layer (and the version for layer 3)
+        if layer == 1:
+            self.samples = 384
+        elif layer == 3 and version != 3:
+            self.samples = 576
+        else:
+            self.samples = 1152
+
+        # the length of the whole frame in bytes (including the header)
+        if layer == 1:
+            self.size = (12*bitrate*1000//sample_rate + padding)*4
+        else:
+            self.size = self.samples//8*bitrate*1000//sample_rate + padding
+        return None
+
+
+def parse_header(data: bytes, offset: int = 0) -> FrameHeader | None:
+    """
+    Arguments:
+    - data: (bytes) the bytes to read the header from
+    - offset: (int) where the header starts in data
+
+    Returns the decoded frame header, or None if there is no valid frame header at offset
+    """
+    if offset+4 > len(data):
+        return None
+    b1, b2, b3 = data[offset+1], data[offset+2], data[offset+3]
+    # the first 11 bits are the frame sync and must all be set
+    if data[offset] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    # version 1 is reserved, layer 4 (bits 00) is reserved, and free/bad bitrates and reserved sample rates can't be used
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = BITRATES[1 if version == 3 else 2][layer][bitrate_index]
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    return FrameHeader(version, layer, bitrate, sample_rate, (b2 >> 1) & 0x01, (b3 >> 6) == 3)
+
+
+def skip_id3v2(data: bytes) -> int:
+    """ Returns the size of the ID3v2 tag at the start of data (0 if there isn't one) """
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    # the size is stored as a 4 byte syncsafe integer (7 bits per byte)
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    # a footer adds another 10 bytes
+    footer = 10 if data[5] & 0x10 else 0
+    return 10+size+footer
+
+
+def find_first_frame(data: bytes, start: int) -> tuple[int, FrameHeader] | tuple[int, None]:
+    """
+    Arguments:
+    - data: (bytes) the start of the file
+    - start: (int) where to start looking
+
+    Finds the first frame that is followed by another valid frame (to avoid false syncs in junk data)
+    """
+    pos = data.find(b"\xff", start)
+    while pos != -1 and pos+4 <= len(data):
+        header = parse_header(data, pos)
+        if header:
+            following = parse_header(data, pos+header.size)
+            # accept the frame if the next one lines up, or if the data ends before the next one
+            if following or pos+header.size+4 > len(data):
+                return pos, header
+        pos = data.find(b"\xff", pos+1)
+    return -1, None
+
+
+def read_vbr_frames(data: bytes, pos: int, header: FrameHeader) -> int | None:
+    """
+    Arguments:
+    - data: (bytes) the start of the file
+    - pos: (int) where the first frame starts
+    - header: (FrameHeader) the header of the first frame
+
+    Returns the frame count stored in a Xing/Info or VBRI tag in the first frame, or None if there is no tag
+    """
+    # the Xing/Info tag comes after the side information, which depends on the version and channels
+    if header.version == 3:
+        side_info = 17 if header.mono else 32
+    else:
+        side_info = 9 if header.mono else 17
+    xing = pos+4+side_info
+    if data[xing:xing+4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing+4:xing+8])[0]
+        if flags & 0x01: # the frame count is only there if the first flag is set
+            return struct.unpack(">I", data[xing+8:xing+12])[0]
+        return None
+    # the VBRI tag is always 32 bytes after the header
+    vbri = pos+36
+    if data[vbri:vbri+4] == b"VBRI":
+        return struct.unpack(">I", data[vbri+14:vbri+18])[0]
+    return None
+
+
+def walk_frames(file, pos: int, end: int) -> tuple[int, int]:
+    """
+    Arguments:
+    - file: an open binary file
+    - pos: (int) where the first frame starts
+    - end: (int) where the audio data ends
+
+    Walks through every frame header in the file and returns (frame count, total samples)
+    """
+    frames, samples = 0, 0
+    while pos+4 <= end:
+        file.seek(pos)
+        header = parse_header(file.read(4))
+        if not header:
+            break # stop at the first thing that isn't a frame (usually a tag at the end)
+        frames += 1
+        samples += header.samples
+        pos += header.size
+    return frames, samples
+
+
+def probe_ogg(file, data: bytes, file_size: int) -> AudioInfo:
+    """
+    Arguments:
+    - file: the open Ogg file
+    - data: (bytes) the start of the file
+    - file_size: (int) the size of the file in bytes
+
+    Returns the AudioInfo of an Ogg Opus or Vorbis file, with a length of 0 if it is neither
+    """
+    # the first page holds the identification header of the stream, after the 27 byte page header and its segment table
+    if len(data) < 27:
+        return AudioInfo()
+    packet = 27+data[26]
+    pre_skip = 0
+    if data[packet:packet+8] == b"OpusHead" and len(data) >= packet+12:
+        # Opus always counts samples at 48 kHz, and the first pre skip samples aren't played
+        sample_rate = 48000
+        pre_skip = struct.unpack_from("<H", data, packet+10)[0]
+    elif data[packet:packet+7] == b"\x01vorbis" and len(data) >= packet+16:
+        sample_rate = struct.unpack_from("<I", data, packet+12)[0]
+    else:
+        return AudioInfo()
+    # the granule position of the last page is the number of samples up to the end of the stream
+    file.seek(max(file_size-OGG_TAIL_SIZE, 0))
+    tail = file.read(OGG_TAIL_SIZE)
+    last = tail.rfind(b"OggS")
+    if last < 0 or last+14 > len(tail) or not sample_rate:
+        return AudioInfo()
+    samples = struct.unpack_from("<q", tail, last+6)[0]-pre_skip
+    length = max(samples, 0)*1000//sample_rate
+    return AudioInfo(length, file_size*8//length if length else 0, sample_rate)
+
+
+def probe_wav(file, file_size: int) -> AudioInfo:
+    """
+    Arguments:
+    - file: the open WAV file
+    - file_size: (int) the size of the file in bytes
+
+    Returns the AudioInfo of a WAV file, by walking through its chunks until the data chunk (length 0 if it has no fmt chunk before it)
+    """
+    pos = 12 # after "RIFF", the size and "WAVE"
+    byte_rate = sample_rate = 0
+    while pos+8 <= file_size:
+        file.seek(pos)
+        chunk_id, size = struct.unpack("<4sI", file.read(8))
+        if chunk_id == b"fmt " and size >= 16 and pos+20 <= file_size:
+            _, _, sample_rate, byte_rate = struct.unpack("<HHII", file.read(12))
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return AudioInfo()
+            # the size is sometimes left at the maximum by programs that write the file as they go
+            size = min(size, file_size-pos-8)
+            return AudioInfo(size*1000//byte_rate, byte_rate*8//1000, sample_rate)
+        # chunks are padded to an even size
+        pos += 8+size+(size & 1)
+    return AudioInfo()
+
+
+def probe_flac(data: bytes, start: int, file_size: int) -> AudioInfo:
+    """
+    Arguments:
+    - data: (bytes) the start of the file
+    - start: (int) where "fLaC" is in data
+    - file_size: (int) the size of the file in bytes
+
+    Returns the AudioInfo of a FLAC file from its STREAMINFO block (always the first metadata block), length 0 if it can't be read
+    """
+    block = start+4
+    # the 4 byte block header (type 0 is STREAMINFO), then the minimum and maximum block and frame sizes (10 bytes)
+    if len(data) < block+4+18 or data[block] & 0x7F != 0:
+        return AudioInfo()
+    # 20 bits of sample rate, 3 bits of channels, 5 bits of bits per sample and 36 bits of total samples
+    bits = int.from_bytes(data[block+14:block+22], "big")
+    sample_rate = bits >> 44
+    samples = bits & ((1 << 36)-1)
+    if not sample_rate:
+        return AudioInfo()
+    length = samples*1000//sample_rate
+    return AudioInfo(length, file_size*8//length if length else 0, sample_rate)
+
+
+def probe(path: str) -> AudioInfo:
+    """
+    Arguments:
+    - path: (str) the path of the audio file
+
+    Returns the AudioInfo of the file, with a length of 0 if the file isn't an MP3, Ogg, WAV or FLAC file it can read.
+    Raises OSError (usually FileNotFoundError) if the file can't be opened
+    """
+    with open(path, "rb") as file:
+        file_size = os.fstat(file.fileno()).st_size
+        data = file.read(HEAD_SIZE)
+        if data.startswith(b"OggS"):
+            return probe_ogg(file, data, file_size)
+        if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+            return probe_wav(file, file_size)
+        # skip the ID3v2 tag and read the start of the audio instead if the tag is bigger than what was read
+        start = skip_id3v2(data)
+        base = 0 # where data starts in the file
+        if start+512 > len(data):
+            file.seek(start)
+            data = file.read(HEAD_SIZE)
+            base, start = start, 0
+        if data[start:start+4] == b"fLaC":
+            return probe_flac(data, start, file_size)
+
+        pos, header = find_first_frame(data, start)
+        if not header:
+            return AudioInfo()
+
+        # the end of the audio is the end of the file minus the ID3v1 tag if there is one
+        end = file_size
+        if file_size >= 128:
+            file.seek(file_size-128)
+            if file.read(3) == b"TAG":
+                end -= 128
+
+        # 1. Xing/Info/VBRI tag with the frame count
+        frames = read_vbr_frames(data, pos, header)
+        if frames:
+            length = frames*header.samples*1000//header.sample_rate
+            audio_bytes = end-(base+pos+header.size)
+            bitrate = audio_bytes*8//length if length else header.bitrate
+            return AudioInfo(length, bitrate, header.sample_rate)
+
+        # 2. CBR, check that the first few frames have the same bitrate
+        cbr = True
+        check = pos
+        for _ in range(CBR_CHECK_FRAMES):
+            following = parse_header(data, check)
+            if not following:
+                break
+            if following.bitrate != header.bitrate:
+                cbr = False
+                break
+            check += following.size
+        if cbr:
+            length = (end-(base+pos))*8//header.bitrate
+            return AudioInfo(length, header.bitrate, header.sample_rate)
+
+        # 3. VBR without a tag, walk through every frame
+        frames, samples = walk_frames(file, base+pos, end)
+        length = samples*1000//header.sample_rate
+        bitrate = (end-(base+pos))*8//length if length else header.bitrate
+        return AudioInfo(length, bitrate, header.sample_rate)
+
+
+def get_length_ms(path: str) -> int:
+    """
+    Arguments:
+    - path: (str) the path of the audio file
+
+    Returns the length of the song in milliseconds without decoding it (0 if it can't be worked out)
+    """
+    try:
+        return probe(path).length
+    except OSError:
+        return 0
+
+
+# the ID3v2 frames holding the title, artist and album (v2.2 uses 3 letter ids)
+TAG_FRAMES = {
+    b"TIT2": "title", b"TPE1": "artist", b"TALB": "album",
+    b"TT2": "title", b"TP1": "artist", b"TAL": "album",
+}
+
+
+def decode_text(data: bytes) -> str:
+    """ Decodes the contents of an ID3v2 text frame, where the first byte says what encoding is used """
+    if not data:
+        return ""
+    encoding = ("latin-1", "utf-16", "utf-16-be", "utf-8")[data[0]] if data[0] < 4 else "latin-1"
+    return data[1:].decode(encoding, errors="replace").strip("\x00").strip()
+
+
+def read_tags(path: str) -> dict[str, str]:
+    """
+    Arguments:
+    - path: (str) the path of the audio file
+
+    Returns the title, artist and album from the ID3v2 tag (or the ID3v1 tag if there is no v2 tag), only including the ones that were found.
+    Raises OSError if the file can't be opened
+    """
+    tags: dict[str, str] = {}
+    with open(path, "rb") as file:
+        head = file.read(10)
+        tag_end = skip_id3v2(head)
+        if tag_end:
+            version = head[3]
+            if head[5] & 0x40 and version > 2: # skip the extended header
+                size = file.read(4)
+                ext = (size[0] << 21) | (size[1] << 14) | (size[2] << 7) | size[3] if version == 4 else struct.unpack(">I", size)[0]+4
+                file.seek(10+ext)
+            id_size = 3 if version == 2 else 4
+            header_size = 6 if version == 2 else 10
+            # go through every frame, only reading the ones that are needed (others can be large, like album art)
+            while file.tell()+header_size <= tag_end and len(tags) < 3:
+                frame = file.read(header_size)
+                frame_id = frame[:id_size]
+                if not frame_id.strip(b"\x00"):
+                    break # reached the padding at the end of the tag
+                if version == 2:
+                    size = int.from_bytes(frame[3:6], "big")
+                elif version == 4:
+                    size = (frame[4] << 21) | (frame[5] << 14) | (frame[6] << 7) | frame[7]
+                else:
+                    size = struct.unpack(">I", frame[4:8])[0]
+                if frame_id in TAG_FRAMES:
+                    text = decode_text(file.read(size))
+                    if text:
+                        tags[TAG_FRAMES[frame_id]] = text
+                else:
+                    file.seek(size, os.SEEK_CUR)
+            if tags:
+                return tags
+
+        # fall back to the ID3v1 tag at the end of the file
+        file.seek(0, os.SEEK_END)
+        if file.tell() >= 128:
+            file.seek(-128, os.SEEK_END)
+            data = file.read(128)
+            if data[:3] == b"TAG":
+                for name, start in (("title", 3), ("artist", 33), ("album", 63)):
+                    text = data[start:start+30].split(b"\x00")[0].decode("latin-1").strip()
+                    if text:
+                        tags[name] = text
+    return tags
+
+
+def make_synthetic_mp3(path: str, frames: int, vbr: bool = False, xing: bool = False) -> None:
+    """
+    Arguments:
+    - path: (str) where to write the file
+    - frames: (int) how many frames of silence to write
+    - vbr: (bool) whether to alternate the bitrate of the frames
+    - xing: (bool) whether to put a Xing tag in the first frame
+
+    Writes an MP3 of silent MPEG 1 layer 3 frames (44.1kHz, joint stereo), used by the benchmark below
+    """
+    # bitrate index 9 = 128kbps, 11 = 192kbps
+    indexes = [9, 11] if vbr else [9]
+    with open(path, "wb") as file:
+        if xing:
+            # the tag frame is a 128kbps frame with the Xing tag after the 32 byte side info
+            frame = bytearray(417)
+            frame[:4] = bytes((0xFF, 0xFB, 0x90, 0x44))
+            frame[36:48] = b"Xing"+struct.pack(">II", 0x01, frames)
+            file.write(frame)
+        for i in range(frames):
+            index = indexes[i%len(indexes)]
+            header = parse_header(bytes((0xFF, 0xFB, index << 4, 0x44)))
+            file.write(bytes((0xFF, 0xFB, index << 4, 0x44))+bytes(header.size-4)) # type: ignore
+    return None
+
+
+if __name__ == "__main__":
+    # benchmark the header probe against decoding the whole song with mixer.Sound
+    # usage: python audio_probe.py [minutes per track]
+    import sys
+    import tempfile
+    import time
+    from pygame import mixer
+
+    mixer.init()
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    frames = int(minutes*60*44100/1152)
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = {
+            "cbr": dict(vbr=False, xing=False),
+            "vbr + xing": dict(vbr=True, xing=True),
+            "vbr, no tag": dict(vbr=True, xing=False),
+        }
+        print(f"{'corpus':<12}{'probe (ms)':>12}{'decode (ms)':>13}{'probe len':>11}{'decode len':>12}")
+        for name, options in corpus.items():
+            path = os.path.join(folder, name.replace(" ", "_").replace(",", "")+".mp3")
+            make_synthetic_mp3(path, frames, **options)
+            start = time.perf_counter()
+            length = get_length_ms(path)
+            probe_time = time.perf_counter()-start
+            start = time.perf_counter()
+            decoded = mixer.Sound(path).get_length()
+            decode_time = time.perf_counter()-start
+            print(f"{name:<12}{probe_time*1000:>12.2f}{decode_time*1000:>13.2f}{length:>11}{int(decoded*1000):>12}")
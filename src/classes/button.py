@@ -5,7 +5,9 @@ This file contains the base button class, which is inherited by the ImageButton
 import pygame
 
 import theme
-import image_editor
+import assets
+import text_cache
+import icon_atlas
 
 class Button:
     def __init__(self, on_click, position: tuple, size: tuple) -> None:
@@ -35,6 +37,11 @@ class Button:
         return pygame.Rect(self.pos, self.size)
     
 
+    def get_state(self) -> tuple:
+        """returns everything that affects how the button looks, so the renderer can tell when it needs redrawing"""
+        return (self.pos, self.size, self.colour)
+    
+
     def check_hover(self, mouse: tuple, m_down: bool) -> None:
         """
         Arguments:
@@ -107,40 +114,36 @@ class Button:
         self.on_click()
         return None
     
+
+    def handle_mouse(self, mouse: tuple, m_down: bool) -> None:
+        """
+        Arguments:
+        - mouse: tuple with the x, y coords of the mouse
+        - m_down: bool showing whether the user is right-clicking or not
+
+        Check for hover/click, called by the input dispatcher (or the widget holding the button) when the mouse moves or is pressed/lifted
+        """
+        self.update(True, mouse, m_down)
+        return None
+    
     
 class ImageButton(Button):
-    def __init__(self, on_click, n_str: str, normal_image: str, hover_image: str, click_image: str, position: tuple, size: tuple, flip: bool = False) -> None:
+    def __init__(self, on_click, icon: str, position: tuple, size: tuple, flip: bool = False) -> None:
         """
         Arguments:
         - on_click: (function) to execute when clicked
-        - n_str: (str) the normal name of the image in the button (e.g. stop.png)
-        - normal_image: (str) the path to the normal image (e.g. Assets_PROG2/Icons/default_stop.png)
-        - hover_image: (str) the path to the hover image (e.g. Assets_PROG2/Icons/default_stop_hover.png)
-        - click_image: (str) the path to the click image (e.g. Assets_PROG2/Icons/default_stop_click.png)
+        - icon: (str) the name of the icon in the button (e.g. stop), the image for the current theme and state is taken from the icon atlas
         - position: (tuple[int, int]) the position of the button
         - size: (tuple[int, int]) the size of the image
         - flip: bool whether the flip the image horizontally or not
         """
         # call the parent constructor
         super().__init__(on_click, position, size)
-        # try load the normal image, if not possible then genereate it
-        try:
-            self.norm_img = pygame.image.load(normal_image)
-        except FileNotFoundError:
-            self.norm_img = image_editor.change_colour(f"./Assets_PROG2/Icons/default_{n_str}", theme.current.norm_col, normal_image)
-        try: # try load the hov image, if not possible then generate it
-            self.hov_img = pygame.image.load(hover_image)
-        except FileNotFoundError:
-            self.hov_img = image_editor.change_colour(f"./Assets_PROG2/Icons/default_{n_str}", theme.current.hov_col, normal_image[:len(normal_image)-4]+"_hov.png")
-        try: # try load the click image, if not possible then generate it
-            self.click_img = pygame.image.load(click_image)
-        except FileNotFoundError:
-            self.click_img = image_editor.change_colour(f"./Assets_PROG2/Icons/default_{n_str}", theme.current.click_col, normal_image[:len(normal_image)-4]+"_click.png")
-        
         # set other variable to be available to the class
+        self.icon = icon
         self.size = size
         self.flip = flip
-        self.image: pygame.Surface = self.norm_img
+        self.state = "norm" # which image to show: norm, hov or click
         return None
     
 
@@ -159,9 +162,9 @@ class ImageButton(Button):
             return
         if mouse[0] > self.pos[0] and mouse[0] < self.pos[0]+self.size[0] and mouse[1] > self.pos[1] and mouse[1] < self.pos[1]+self.size[1]:
             self.hover = True
-            self.image = self.hov_img
+            self.state = "hov"
         else:
-            self.image = self.norm_img
+            self.state = "norm"
             self.hover = False
         return None
     
@@ -182,44 +185,77 @@ class ImageButton(Button):
         if self.click:
             if not m_down and self.hover:
                 self.click = False
-                self.image = self.hov_img
+                self.state = "hov"
                 self.on_click()
             elif not self.hover:
                 self.hover = False
                 self.click = False
-                self.image = self.norm_img
+                self.state = "norm"
         elif m_down and self.hover:
             self.click = True
-            self.image = self.click_img
+            self.state = "click"
         return None
     
+
+    def update_colors(self) -> None:
+        """ Reset the button, the images of the new theme are picked up from its atlas when it is rendered """
+        super().update_colors()
+        self.state = "norm"
+        return None
+
         
     def get_img(self) -> pygame.Surface:
-        """ return the scaled image of the current loaded image"""
-        return pygame.transform.scale(pygame.transform.flip(self.image, True, False), self.size) if self.flip else pygame.transform.scale(self.image, self.size)
+        """ return the scaled image of the current state (a view into the icon atlas, don't draw on it)"""
+        atlas = icon_atlas.get_atlas(theme.current_name)
+        return atlas.surface.subsurface(atlas.get(self.icon, self.size, self.flip, self.state))
     
 
-    def draw(self, screen: pygame.Surface, check: bool, mouse: tuple, r_click: bool) -> None:
+    def get_state(self) -> tuple:
+        """returns everything that affects how the button looks, so the renderer can tell when it needs redrawing"""
+        return (self.pos, self.size, self.icon, self.state, self.flip, theme.current_name)
+    
+
+    def update(self, check: bool, mouse: tuple, r_click: bool) -> None:
         """
         Arguments:
-        - screen: the pygame surface to draw the elements on [passed by reference]
         - check: a boolean indicating whether the elements should check for hover and clicks or not
         - mouse: a tuple with the x, y coords of the mouse on the screen.
         - r_click: a bool indicating whether the user is right clicking or not
         
-        Check for hover/click if allowed, render the button
+        Check for hover/click if allowed
         """
         if check:
             self.check_hover(mouse, r_click)
             self.check_click(r_click)
-        screen.blit(self.get_img(), self.pos)
+        return None
+    
+
+    def render(self, screen: pygame.Surface) -> None:
+        """ Render the button on screen, straight from the icon atlas of the current theme """
+        atlas = icon_atlas.get_atlas(theme.current_name)
+        area = atlas.get(self.icon, self.size, self.flip, self.state)
+        screen.blit(atlas.surface, self.pos, area)
+        return None
+    
+
+    def draw(self, screen: pygame.Surface, check: bool, mouse: tuple, r_click: bool) -> None:
+        """
+        Arguments:
+        - screen: the pygame surface to draw the elements on [passed by reference]
+        - check: a boolean indicating whether the elements should check for hover and clicks or not
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - r_click: a bool indicating whether the user is right clicking or not
+        
+        Check for hover/click if allowed, render the button
+        """
+        self.update(check, mouse, r_click)
+        self.render(screen)
         return None
 
-# initialise pygame before initialising some fonts    
-pygame.init()
-title = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Bold.ttf", 40)
-subtitle = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Medium.ttf", 30)
-small = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Thin.ttf", 16)
+# the fonts of the text sizes 1, 2 and 3
+title = assets.get_font(assets.BOLD, 40)
+subtitle = assets.get_font(assets.MEDIUM, 30)
+small = assets.get_font(assets.THIN, 16)
 
 class TextButton(Button):
     def __init__(self, on_click, position: tuple, size: tuple, text: str, text_size: int = 1, id: int = -1, trailing: None | ImageButton = None) -> None:
@@ -246,21 +282,21 @@ class TextButton(Button):
         elif text_size == 3:
             self.font = title
         elif int(text_size) > 0:
-            self.font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Medium.ttf", int(text_size))
+            self.font = assets.get_font(assets.MEDIUM, int(text_size)) # shared by every button with this size
         else:
             print("error")
         
         self.id = id # id of the song linked to the button (not always used) (only valid if it is > 0)
 
         # set the size and the text_surface according to text_size
-        self.text_surf = self.font.render(text, True, self.colour)
+        self.text_surf = text_cache.render(self.font, text, self.colour)
         self.size = self.text_surf.get_size() if size == (0, 0) else size
         return None
     
     
     def get_text(self) -> pygame.Surface:
         """ Returns the text surface when prompted to"""
-        return self.font.render(self.text, True, self.colour)
+        return text_cache.render(self.font, self.text, self.colour)
     
 
     def update_text(self, text):
@@ -268,6 +304,19 @@ class TextButton(Button):
         self.text = text
 
 
+    def get_rect(self) -> pygame.Rect:
+        """returns the rect of the button (including the trailing image if there is one)"""
+        rect = pygame.Rect(self.pos, self.size)
+        if self.trailing:
+            rect.union_ip(self.trailing.get_rect())
+        return rect
+
+
+    def get_state(self) -> tuple:
+        """returns everything that affects how the button looks, so the renderer can tell when it needs redrawing"""
+        return (self.pos, self.size, self.colour, self.text, self.trailing.get_state() if self.hover and self.trailing else None)
+
+
     def execute(self): 
         """
         Execute the relevant function on clicking
@@ -287,15 +336,33 @@ class TextButton(Button):
         
         If allowed, check for hover and click, and then render the buttons
         """
+        self.update(check, mouse, r_click)
+        self.render(screen)
+        return None
+    
+
+    def update(self, check: bool, mouse: tuple, r_click: bool) -> None:
+        """
+        Arguments:
+        - check: a boolean indicating whether the elements should check for hover and clicks or not
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - r_click: a bool indicating whether the user is right clicking or not
+        
+        If allowed, check for hover and click on the button and the trailing if it is showing
+        """
         # check for hover and click
         if check:
             self.check_hover(mouse, r_click)
             if not self.trailing or not self.trailing.hover: # type: ignore
                 self.check_click(r_click)
-        
-        # draw the button and the trailing if it exists
-        screen.blit(self.get_text(), self.pos)
         if self.hover and self.trailing:
-            self.trailing.draw(screen, check, mouse, r_click)
+            self.trailing.update(check, mouse, r_click)
+        return None
+    
 
+    def render(self, screen: pygame.Surface) -> None:
+        """ Render the button and the trailing if it exists """
+        screen.blit(self.get_text(), self.pos)
+        if self.hover and self.trailing:
+            self.trailing.render(screen)
         return None
\ No newline at end of file
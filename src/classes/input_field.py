@@ -4,10 +4,11 @@ This file contains the class of Input Fields, used as the primary input system t
 # imports
 import pygame
 import theme
+import assets
+import text_cache
 
-# initialising pygame and creating a font
-pygame.init()
-font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Medium.ttf", 22)
+# the font of the text typed in
+font = assets.get_font(assets.MEDIUM, 22)
 
 class InputField:
     def __init__(self, pos: tuple, size: tuple = (300, 35)) -> None:
@@ -99,27 +100,48 @@ class InputField:
         return None
     
         
-    def draw(self, screen: pygame.Surface, check = False, mouse = (0, 0), m_down = False) -> None:
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the input field looks, so the renderer can tell when it needs redrawing """
+        return (self.pos, self.size, self.colour, self.text, self.is_active and self.blink_cool > 0)
+
+
+    def update(self, check = False, mouse = (0, 0), m_down = False) -> None:
         """
         Arguments:
-        - screen: the pygame surface to draw the elements on [passed by reference]
         - check: a boolean indicating whether the elements should check for hover and clicks or not
         - mouse: a tuple with the x, y coords of the mouse on the screen.
         - m_down: a bool indicating whether the user is right clicking or not
-        
-        Check for hover/click if allowed, render the input field stuff
+
+        Update the cursor blinking and check for hover/click if allowed
         """
         # update the blink cooldown
         self.blink_cool -= 1
         if self.blink_cool < -40:
             self.blink_cool = 40
-        
-        a = pygame.Surface(self.size)
 
         if check:
             # check for hover/click
             self.check_hover(mouse, m_down)
             self.check_click(m_down)
+        return None
+
+
+    def handle_mouse(self, mouse: tuple, m_down: bool) -> None:
+        """
+        Arguments:
+        - mouse: tuple with the x, y coords of the mouse
+        - m_down: bool showing whether the user is right-clicking or not
+
+        Check for hover/click, called by the input dispatcher (or the widget holding the field) when the mouse moves or is pressed/lifted
+        """
+        self.check_hover(mouse, m_down)
+        self.check_click(m_down)
+        return None
+
+
+    def render(self, screen: pygame.Surface) -> None:
+        """ Render the input field stuff on screen """
+        a = pygame.Surface(self.size)
 
         # create the border and the text field
         border = pygame.rect.Rect((0, 0), self.size)
@@ -129,12 +151,12 @@ class InputField:
         pygame.draw.rect(a, theme.current.text_field_bg, text_field)
 
         if self.is_active: # if the field is active, continue blinking
-            current_text = font.render(self.text+"|" if self.blink_cool>0 else self.text, True, theme.current.text_field_text)
+            current_text = text_cache.render(font, self.text+"|" if self.blink_cool>0 else self.text, theme.current.text_field_text)
         else: # else render item aynywas
-            current_text = font.render(self.text, True, theme.current.text_field_text)
+            current_text = text_cache.render(font, self.text, theme.current.text_field_text)
 
         # update the font stuff
-        text_size = font.render(self.text, True, (0, 0, 0)).get_rect().size[0]
+        text_size = font.size(self.text)[0]
         if text_size > self.display_limit:
             text_surf = pygame.Surface((self.size[0]-8, self.size[1]-8))
             text_surf.fill(theme.current.text_field_bg)
@@ -147,6 +169,21 @@ class InputField:
         return None
 
 
+    def draw(self, screen: pygame.Surface, check = False, mouse = (0, 0), m_down = False) -> None:
+        """
+        Arguments:
+        - screen: the pygame surface to draw the elements on [passed by reference]
+        - check: a boolean indicating whether the elements should check for hover and clicks or not
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - m_down: a bool indicating whether the user is right clicking or not
+        
+        Check for hover/click if allowed, render the input field stuff
+        """
+        self.update(check, mouse, m_down)
+        self.render(screen)
+        return None
+
+
     def update_text(self, event, shift) -> None:
         """ Updates the text by checking each event and whether it is a valid key press or not """
         try:
@@ -1,4 +1,5 @@
 """A file to keep track of playlist stuff"""
+import uuid
 
 class Song:
     """
@@ -8,11 +9,13 @@ class Song:
         self.name = name
         self.path = path
         self.artist = artist
+        self.missing = False # set by the watcher when the file is removed, so the song is skipped without touching the disk
 
 
 class Playlist:
-    def __init__(self, name: str, songs: list) -> None:
-        self.id = id(self) # id(self) returns a value that is guaranteed to be unique from other objects
+    def __init__(self, name: str, songs: list, key: str | None = None) -> None:
+        self.key = key or uuid.uuid4().hex # identifies the playlist in the playlist store
+        self.id = self.key # the id stays the same between launches and when the playlists are checked, so nothing holding it needs to be rebuilt
         self.name = name
         self.songs: list[Song] = songs
     
@@ -30,7 +33,7 @@ class Playlist:
 # temporary class to keep track of all playlists
 class PlaylistManager:
     # a general manager to hold all the playlists.
-    playlists: dict[int, Playlist] = {}
+    playlists: dict[str, Playlist] = {}
     sample: Playlist
 
     def add(self, id, playlist):
@@ -6,12 +6,17 @@ This file holds the Sidebar class
 import pygame
 
 import theme
+import assets
+import text_cache
+import compositor
+from tween import Tween
 from classes.button import TextButton, ImageButton
 from screen_elements.playlist_view import create_pages
 
-# initialise pygame and create a font
-pygame.init()
-small = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Thin.ttf", 16)
+# the font of the page navigator
+small = assets.get_font(assets.THIN, 16)
+# how long the sidebars take to open or close (seconds)
+ANIM_TIME = 0.2
 
 # get a function to pass as an argument in a for loop (the functions requiring arguments of the for loop elements behave weirdly, so this is a work around)
 def get_on_click(func, argument) -> object:
@@ -29,7 +34,7 @@ class Sidebar:
             - function is the onclick
         - anim_dir: (int) what direction it opens in (1 for open to the left, -1 for open to the right)
         - overlay: (bool) create a translucent surface before rendering the sidebar or not
-        - shift: (function) function to shift screen elements (used for one of the sidebars)
+        - shift: (function) function to move the screen elements next to the sidebar, given how far it is open (used for one of the sidebars)
         - edit_pl: (function) function to open a playlist for editing (done by the trailing icon in the Options)
         - ids: (list) a list of the ids of the playlists (to pass into the edit_pl function)
 
@@ -51,22 +56,22 @@ class Sidebar:
         self.options: list[TextButton] = []
         if anim_dir == -1: # if it is a playlistbar
             for i, opt in enumerate(options): # the options will have a trailing Image Button that allows users to edit the playlist
-                self.options.append(TextButton(opt[1], (location[0]+20, location[1]+70+i*40), (dimensions[0]-20, 40), opt[0], text_size=2, trailing=ImageButton(get_on_click(edit_pl, ids[i]), "edit.png", f"./Assets_PROG2/Icons/{theme.current_name}_edit.png", f"./Assets_PROG2/Icons/{theme.current_name}_edit_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_edit_click.png", (location[0]+dimensions[0]-30, location[1]+70+i*40+7), (20, 20)))) # type: ignore
+                self.options.append(TextButton(opt[1], (location[0]+20, location[1]+70+i*40), (dimensions[0]-20, 40), opt[0], text_size=2, trailing=ImageButton(get_on_click(edit_pl, ids[i]), "edit", (location[0]+dimensions[0]-30, location[1]+70+i*40+7), (20, 20)))) # type: ignore
         else: # if it is a themebar
             for i, opt in enumerate(options): # theoptions will be normal
                 self.options.append(TextButton(opt[1], (location[0]+20, location[1]+70+i*40), (dimensions[0]-20, 40), opt[0], text_size=2))
         
         # initialie some animation variables
         self.animate = False
-        self.anim_delta = 0
-        self.anim_speed = 0.1
+        self.anim_delta = 0 # how far the sidebar is from where it is when open
+        self.tween: Tween | None = None # moves anim_delta while it opens or closes
         self.opening = False
         self.closing = False
         self.anim_dir = anim_dir
-        self.moved = 0
 
         self.shift = shift # function to shift the screen elements
         self.overlay = overlay # bool indicating whether or not to have a translucent screen below the bar
+        self.checking = False # whether the options can be used (not animating and allowed in the last update), they are drawn differently if not
 
         # initialise page variables
         self.pages: list[list[TextButton]] = []
@@ -75,17 +80,17 @@ class Sidebar:
         self.page_num = 0
 
         # page navigator stuff
-        self.next_page_button = ImageButton(self.next_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (self.location[0]+(self.dimensions[0])/2+35, self.location[1]+75+40*self.optionspp), (10, 10))
-        self.prev_page_button = ImageButton(self.prev_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (self.location[0]+(self.dimensions[0])/2-45, self.location[1]+75+40*self.optionspp), (10, 10), flip=True)
-        self.prev_page_button.image = self.prev_page_button.hov_img
-        self.next_page_button.image = self.next_page_button.hov_img
-        self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+        self.next_page_button = ImageButton(self.next_page, "play", (self.location[0]+(self.dimensions[0])/2+35, self.location[1]+75+40*self.optionspp), (10, 10))
+        self.prev_page_button = ImageButton(self.prev_page, "play", (self.location[0]+(self.dimensions[0])/2-45, self.location[1]+75+40*self.optionspp), (10, 10), flip=True)
+        self.prev_page_button.state = "hov"
+        self.next_page_button.state = "hov"
+        self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
         
         self.show_pages: bool = False
         
         # more page variables
-        self.prev_page_button.image = self.prev_page_button.hov_img
-        self.next_page_button.image = self.next_page_button.hov_img
+        self.prev_page_button.state = "hov"
+        self.next_page_button.state = "hov"
         self.show_pages = len(self.pages)>1
         self.page_num = 0
 
@@ -96,7 +101,7 @@ class Sidebar:
         """ Go to the next page if possible and update the page number"""
         if self.page_num < len(self.pages):
             self.page_num += 1
-            self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+            self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
         return None
     
 
@@ -104,39 +109,47 @@ class Sidebar:
         """ Go to the previous pagei s possible and update the page number """
         if self.page_num > 0:
             self.page_num -= 1
-            self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+            self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
         return None
     
 
     def open(self) -> None:
-        """ Open the sidebar and start the animation """
+        """ Open the sidebar and start the animation (from wherever it is if it was closing) """
+        if not self.closing:
+            self.anim_delta = self.anim_dir*self.dimensions[0]
         self.is_open = True
         self.opening = True
-        self.anim_delta = self.anim_dir*self.dimensions[0]
+        self.closing = False
+        self.tween = Tween(self.anim_delta, 0, ANIM_TIME)
         return None
     
     
     def close(self) -> None:
-        """ Reset the animation delta (where to move to) and start the closing animation"""
+        """ Start the closing animation (from wherever it is if it was opening) """
         self.closing = True
-        self.anim_delta = 0
+        self.opening = False
+        self.tween = Tween(self.anim_delta, self.anim_dir*self.dimensions[0], ANIM_TIME)
         return None
+
+
+    def get_offset(self) -> float:
+        """ Returns how far the sidebar is open (0 when it is closed, its width when it is open) """
+        if not self.is_open:
+            return 0
+        return self.dimensions[0]-abs(self.anim_delta)
     
     
     def load_theme(self) -> None:
-        """ update the options (reinitalise the trailing icons if necessary) and reinitialies other variables to load the new theme """
-        if self.anim_dir == -1: # if it is a playlist bar, the trailing icons also need to be reinitialised
-            for i, opt in enumerate(self.options):
-                opt.update_colors()
-                opt.trailing = ImageButton(get_on_click(self.edit_pl, self.ids[i]), "edit.png", f"./Assets_PROG2/Icons/{theme.current_name}_edit.png", f"./Assets_PROG2/Icons/{theme.current_name}_edit_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_edit_click.png", (self.location[0]+self.dimensions[0]-30, self.location[1]+70+i*40+7), (20, 20)) # type: ignore
-        else: # else just do the options (TextButtons)
-            for opt in self.options:
-                opt.update_colors()
+        """ update the options (and their trailing icons if there are any) and reinitialies other variables to load the new theme """
+        for opt in self.options:
+            opt.update_colors()
+            if opt.trailing: # if it is a playlist bar, the trailing icons also need to be reset
+                opt.trailing.update_colors()
         
-        # reinit page navigator stuff
-        self.next_page_button = ImageButton(self.next_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (self.location[0]+(self.dimensions[0])/2+35, self.location[1]+75+40*self.optionspp), (10, 10))
-        self.prev_page_button = ImageButton(self.prev_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (self.location[0]+(self.dimensions[0])/2-45, self.location[1]+75+40*self.optionspp), (10, 10), flip=True)
-        self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+        # reset page navigator stuff
+        self.next_page_button.update_colors()
+        self.prev_page_button.update_colors()
+        self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
         # finish it with a titular update
         self.title.update_colors()
         return None
@@ -166,69 +179,114 @@ class Sidebar:
 
         This method draws the screen elements of the sidebar, animates them if necessary and checks for relevant hover/clicking in the options
         """
-        if self.is_open: # only draw it if it is open
-            if self.overlay: # if overlay is enabled
-                # draw a layer of less transparency
-                opaque = pygame.Surface(screen.get_size())
-                opaque.fill((50, 50, 50))
-                opaque.set_alpha(153)
-                screen.blit(opaque, (0, 0))
-
-            if self.opening: # if the opening animation is on
-                # move it by a constant amount every frame
-                self.moved = self.dimensions[0]*self.anim_speed
-                # change the amount remaining
-                self.anim_delta -= self.moved*self.anim_dir
-                if self.shift: # if shift is given as a function (happens only in the playlist bar), shift the screen elements by the amount the side bar was moved
-                    self.shift(self.moved)
-                if self.anim_dir*self.anim_delta < 1: # check if the opening animation is complete
-                    self.anim_delta = 0
+        self.update(check)
+        self.handle_mouse(mouse, m_down)
+        self.render(screen)
+        return None
+    
+
+    def update(self, check: bool = True) -> None:
+        """
+        Arguments:
+        - check: a boolean indicating whether the options can be used (they are shown as inactive if not)
+
+        This method animates the sidebar if necessary and positions the options, without drawing anything
+        """
+        if self.is_open: # only update it if it is open
+            if self.opening or self.closing: # if an animation is on, move to where the tween has got to (it takes the same time whatever the frame rate)
+                done = self.tween.is_done() # type: ignore
+                self.anim_delta = self.tween.get() # type: ignore (exactly where it ends once it is done)
+                if done and self.opening: # the opening animation is complete
                     self.opening = False
-            if self.closing: # if the closing animation is on
-                # move it by a constant amount every frame
-                self.moved = self.dimensions[0]*self.anim_speed
-                # change the amount remaining
-                self.anim_delta += self.moved*self.anim_dir
-                if self.shift:# if shift is given as a function (happens only in the playlist bar), shift the screen elements by the amount the side bar was moved
-                    self.shift(-self.moved)
-                if self.anim_dir*self.anim_delta > self.dimensions[0]-1: # check if the opening animation is complete
+                if done and self.closing: # the closing animation is complete
                     self.anim_delta = 0
                     self.closing = False
                     self.is_open = False
-                    return None # leave is method as the sidebar is on longer open, meaning no point of drawing anything anymore
+                if self.shift: # if shift is given as a function (happens only in the playlist bar), move the screen elements to how far the side bar is open
+                    self.shift(self.get_offset())
+                if not self.is_open:
+                    return None # leave is method as the sidebar is on longer open, meaning no point of checking anything anymore
             
-            # create the sidebar rectangle/bottom surface and render that on the screen could (could've also used rect)
-            a = pygame.Surface(self.dimensions)
-            a.fill(theme.current.sidebar)
-            a.set_alpha(255)
-            screen.blit(a, (self.location[0]+self.anim_delta, self.location[1]))
-            
-            # render all the options on the current page
+            # position all the options on the current page
+            self.checking = not self.opening and not self.closing and check
             for i, opt in enumerate(self.pages[self.page_num]):
                 opt.pos = (opt.pos[0], self.location[1]+70+i*40)
-                if not self.opening and not self.closing and check:
-                    # draw the options normally and check them if no animation is playing and check is True
-                    opt.draw(screen, check, mouse, m_down)
-                else:
-                    # else show them with an inactive colour and render their text
+                if not self.checking:
+                    # show them with an inactive colour if an animation is playing or check is False
                     opt.colour = opt.hov_col
-                    screen.blit(opt.get_text(), (opt.pos[0]+self.anim_delta, opt.pos[1]))
-            # finally, render the title
-            screen.blit(self.title.get_text(), (self.title.pos[0]+self.anim_delta, self.title.pos[1]))
-
-            # if there's more than one page and it's not animating
-            if self.show_pages and not self.opening and not self.closing:
-                # draw the next page button as active if there is a next page, else inactive
-                check = True
-                if self.page_num == len(self.pages)-1:
-                    check = False
-                self.next_page_button.draw(screen, check, mouse, m_down)
-                # draw the previous page button as active if there is a previous page, else inactive
-                check = True
-                if self.page_num == 0:
-                    check = False
-                self.prev_page_button.draw(screen, check, mouse, m_down)
-                # draw the page text
-                screen.blit(self.page_text, (self.location[0]+(self.dimensions[0])/2-32, self.location[1]+73+40*self.optionspp))
         return None
+    
+
+    def handle_mouse(self, mouse: tuple[int, int], m_down: bool) -> None:
+        """
+        Arguments:
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - m_down: a bool indicating whether the user is right clicking or not
+
+        Checks for hover/click in the options and the page navigator if the sidebar is open and not animating (called by the input dispatcher when the mouse moves or is pressed/lifted)
+        """
+        if not self.is_open or self.opening or self.closing:
+            return None
+        if self.checking:
+            for opt in self.pages[self.page_num]:
+                opt.handle_mouse(mouse, m_down)
+        # if there's more than one page
+        if self.show_pages:
+            # the next page button is active if there is a next page, else inactive
+            self.next_page_button.update(self.page_num != len(self.pages)-1, mouse, m_down)
+            # the previous page button is active if there is a previous page, else inactive
+            self.prev_page_button.update(self.page_num != 0, mouse, m_down)
+        return None
+    
+
+    def render(self, screen: pygame.Surface) -> None:
+        """ Draws the overlay (if enabled), the sidebar and its options on screen if it is open """
+        if not self.is_open:
+            return None
+        if self.overlay: # if overlay is enabled
+            # draw a layer of less transparency (made once and kept by the compositor)
+            screen.blit(compositor.get_overlay(screen.get_size(), (50, 50, 50), 153), (0, 0))
+
+        # fill the sidebar rectangle/bottom surface on the screen
+        screen.fill(theme.current.sidebar, (self.location[0]+self.anim_delta, self.location[1], *self.dimensions))
+        
+        # render all the options on the current page
+        for opt in self.pages[self.page_num]:
+            if self.checking:
+                # draw the options normally if they are being checked
+                opt.render(screen)
+            else:
+                # else render their text where the animation has got to
+                screen.blit(opt.get_text(), (opt.pos[0]+self.anim_delta, opt.pos[1]))
+        # finally, render the title
+        screen.blit(self.title.get_text(), (self.title.pos[0]+self.anim_delta, self.title.pos[1]))
+
+        # if there's more than one page and it's not animating
+        if self.show_pages and not self.opening and not self.closing:
+            self.next_page_button.render(screen)
+            self.prev_page_button.render(screen)
+            # draw the page text
+            screen.blit(self.page_text, (self.location[0]+(self.dimensions[0])/2-32, self.location[1]+73+40*self.optionspp))
+        return None
+    
+
+    def get_rect(self, screen_size: tuple[int, int]) -> pygame.Rect:
+        """
+        Arguments:
+        - screen_size: (tuple[int, int]) the size of the screen
+
+        Returns the rect the sidebar draws over (the whole screen if it has an overlay)
+        """
+        if self.overlay:
+            return pygame.Rect((0, 0), screen_size)
+        return pygame.Rect((self.location[0]+self.anim_delta, self.location[1]), self.dimensions)
+    
+
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the sidebar looks, so the renderer can tell when it needs redrawing """
+        if not self.is_open:
+            return (False,)
+        options = tuple(opt.get_state() for opt in self.pages[self.page_num])
+        pages = (self.next_page_button.get_state(), self.prev_page_button.get_state(), id(self.page_text)) if self.show_pages else None
+        return (True, self.anim_delta, self.checking, self.page_num, options, pages)
 
@@ -0,0 +1,136 @@
+"""
+This file holds the Compositor, which keeps the translucent layers drawn under the sidebars and dialogs so they aren't made again every frame.
+
+Overlays (plain surfaces with a colour and an alpha) are stored by (size, colour, alpha), and are shared between everyone that asks for the same one, so they must not be drawn on.
+Snapshots keep what is under a modal (e.g. the playlist dialog): the screen is saved once with the modal's overlay already blended on it,
+so while the modal is open only its own content needs drawing on top of the snapshot.
+Changing the theme clears everything, and a snapshot of a different size than the screen (the window was resized) is never used.
+
+Run this file (python compositor.py) to compare making the overlays every frame with using the cached ones.
+"""
+# imports
+import pygame
+
+
+class Compositor:
+    def __init__(self) -> None:
+        self.overlays: dict[tuple, pygame.Surface] = {}
+        self.snapshots: dict[str, pygame.Surface] = {}
+        return None
+
+
+    def get_overlay(self, size: tuple[int, int], colour, alpha: int) -> pygame.Surface:
+        """
+        Arguments:
+        - size: (tuple[int, int]) the size of the overlay
+        - colour: the colour it is filled with
+        - alpha: (int) how opaque it is (0-255)
+
+        Returns the overlay, only making it if it isn't cached yet
+        """
+        key = (tuple(size), tuple(colour), alpha)
+        overlay = self.overlays.get(key)
+        if overlay is None:
+            overlay = pygame.Surface(key[0])
+            overlay.fill(colour)
+            overlay.set_alpha(alpha)
+            self.overlays[key] = overlay
+        return overlay
+
+
+    def snapshot(self, key: str, screen: pygame.Surface) -> None:
+        """
+        Arguments:
+        - key: (str) the name of the modal the snapshot is under
+        - screen: (pygame.Surface) the screen, with everything under the modal drawn on it
+
+        Keep a copy of the screen, but only if all of it was just drawn (the renderer clips it to the parts that changed)
+        """
+        if screen.get_clip() == screen.get_rect():
+            self.snapshots[key] = screen.copy()
+        return None
+
+
+    def get_snapshot(self, key: str, size: tuple[int, int]) -> pygame.Surface | None:
+        """
+        Arguments:
+        - key: (str) the name of the modal
+        - size: (tuple[int, int]) the size of the screen
+
+        Returns the snapshot under the modal, None if there isn't one (or it was taken at a different size)
+        """
+        snapshot = self.snapshots.get(key)
+        if snapshot is None or snapshot.get_size() != tuple(size):
+            return None
+        return snapshot
+
+
+    def drop(self, key: str) -> None:
+        """ Forget the snapshot under a modal (e.g. it closed, or something under it changed) """
+        self.snapshots.pop(key, None)
+        return None
+
+
+    def clear(self) -> None:
+        """ Forget every overlay and snapshot (e.g. when the theme changes) """
+        self.overlays.clear()
+        self.snapshots.clear()
+        return None
+
+
+# the compositor shared by every widget
+layers = Compositor()
+
+
+def get_overlay(size: tuple[int, int], colour, alpha: int) -> pygame.Surface:
+    """ Get an overlay through the shared compositor, see Compositor.get_overlay """
+    return layers.get_overlay(size, colour, alpha)
+
+
+if __name__ == "__main__":
+    import os
+    import time
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((1080, 720))
+    FRAMES = 200
+
+    def made(screen: pygame.Surface) -> None:
+        """ What the sidebar and the playlist dialog did every frame: make both overlays and the sidebar's panel """
+        for colour, alpha in (((50, 50, 50), 153), ((30, 30, 30), 220)):
+            a = pygame.Surface(screen.get_size())
+            a.fill(colour)
+            a.set_alpha(alpha)
+            screen.blit(a, (0, 0))
+        a = pygame.Surface((270, 720))
+        a.fill((40, 40, 40))
+        a.set_alpha(255)
+        screen.blit(a, (810, 0))
+        return None
+
+    def cached(screen: pygame.Surface) -> None:
+        """ The same, with the cached overlays and the panel filled straight on the screen """
+        for colour, alpha in (((50, 50, 50), 153), ((30, 30, 30), 220)):
+            screen.blit(get_overlay(screen.get_size(), colour, alpha), (0, 0))
+        screen.fill((40, 40, 40), (810, 0, 270, 720))
+        return None
+
+    def under_modal(screen: pygame.Surface) -> None:
+        """ A frame of the playlist dialog once the snapshot is taken: nothing is blended, the snapshot is copied """
+        snapshot = layers.get_snapshot("dialog", screen.get_size())
+        if snapshot is None:
+            cached(screen)
+            layers.snapshot("dialog", screen)
+        else:
+            screen.blit(snapshot, (0, 0))
+        return None
+
+    times = {}
+    for name, frame in (("made every frame", made), ("cached", cached), ("snapshot", under_modal)):
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            frame(screen)
+        times[name] = (time.perf_counter()-start)/FRAMES*1000
+        print(f"{name:<18}{times[name]:>7.3f} ms per frame")
+    print(f"cached is {times['made every frame']/times['cached']:.1f}x and the snapshot {times['made every frame']/times['snapshot']:.1f}x faster")
+    pygame.quit()
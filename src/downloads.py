@@ -0,0 +1,516 @@
+"""
+This file holds the download manager, which downloads songs from YouTube and converts them to mp3 on worker threads, so the More Music window keeps running while it does.
+
+Downloads wait in a queue and a few of them run at a time. The bytes of each one are passed to the encoder (ffmpeg, reading from a pipe) as they arrive,
+so the song is converted while it downloads instead of after, and nothing has to be stored and deleted again.
+Songs are saved in the Target codec (Opus in an Ogg file, .opus, by default). The audio of a video is only decoded and encoded again (transcoded) if it is in another codec:
+if it is already in the right codec it is copied into the right kind of file (remuxed), which takes almost no time, and if it is already in the right kind of file it is stored as it is.
+Each download posts a DOWNLOAD_PROGRESS event when it gets further, and can be cancelled at any time (before or while it runs).
+
+Where the bytes come from (the source) and what is done with them (the encoder) are passed to the manager, so it can be run without the internet or ffmpeg.
+It can be run to time it with a local source that imitates a slow connection (usage from the src folder): python downloads.py [number of songs]
+or to time remuxing and transcoding some audio files with ffmpeg: python downloads.py convert [files...]
+"""
+# imports
+import os
+import re
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import pygame
+
+import services
+
+# event posted when a download gets further (or finishes), with the Download as download
+DOWNLOAD_PROGRESS = pygame.USEREVENT+4
+# the least time between two progress events of a download, in seconds
+PROGRESS_INTERVAL = 0.1
+
+# the states a download goes through
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# the codecs songs can be saved in (pygame can play all of them): the ffmpeg encoder, the kind of file (container) and its extension
+CODECS = {
+    "opus": ("libopus", "ogg", ".opus"), # pygame only plays Opus from .opus files (it reads .ogg files as Vorbis)
+    "vorbis": ("libvorbis", "ogg", ".ogg"),
+    "mp3": ("libmp3lame", "mp3", ".mp3"),
+    "flac": ("flac", "flac", ".flac"),
+}
+# what is done to a stream to save it in the target codec
+STORE = "store" # it is already in the right codec and container
+REMUX = "remux" # the audio is copied into another container
+TRANSCODE = "transcode" # the audio is decoded and encoded again
+
+
+class DownloadError(Exception):
+    """ Raised when a song can't be downloaded or converted """
+
+
+def safe_name(text: str) -> str:
+    """ Returns the text without the characters that can't be in a file name """
+    return re.sub(r"[\\/:*?\"<>|\x00-\x1f]", "", text).strip(" .")
+
+
+def get_codec(name: str) -> str:
+    """ Returns the short name of a codec from the name in a stream's description (e.g. "mp4a.40.2" is "aac") """
+    name = name.lower()
+    return "aac" if name.startswith("mp4a") else name.split(".")[0]
+
+
+class Target:
+    """
+    Holds the codec and bitrate songs are saved in, and works out what has to be done to a stream to get there
+    """
+    def __init__(self, codec: str = "opus", bitrate: str = "160k") -> None:
+        """
+        Arguments:
+        - codec: (str) one of CODECS
+        - bitrate: (str) the bitrate to encode at if the stream has to be transcoded (e.g. "192k"), ignored for flac
+        """
+        if codec not in CODECS:
+            raise ValueError(f"can't save songs as {codec}, use one of {', '.join(CODECS)}")
+        self.codec = codec
+        self.bitrate = bitrate
+        self.encoder, self.container, self.extension = CODECS[codec]
+        return None
+
+
+    def get_plan(self, codec: str, container: str) -> str:
+        """
+        Arguments:
+        - codec: (str) the codec of the stream (e.g. "opus", "aac")
+        - container: (str) the kind of file the stream is in (e.g. "webm", "mp4")
+
+        Returns STORE, REMUX or TRANSCODE
+        """
+        if codec != self.codec:
+            return TRANSCODE
+        return STORE if container == self.container else REMUX
+
+
+    def get_args(self, plan: str) -> list[str] | None:
+        """ Returns the ffmpeg output options to carry out the plan (None to store the stream as it is) """
+        if plan == STORE:
+            return None
+        if plan == REMUX:
+            return ["-c:a", "copy", "-f", self.container]
+        bitrate = [] if self.codec == "flac" else ["-b:a", self.bitrate]
+        return ["-c:a", self.encoder, *bitrate, "-f", self.container]
+
+
+class SourceStream:
+    """
+    Holds the audio of a video as it is downloaded
+    """
+    def __init__(self, size: int | None, chunks, codec: str, container: str) -> None:
+        """
+        Arguments:
+        - size: (int or None) the size of the stream in bytes, if known
+        - chunks: (iterator of bytes) the bytes of the stream, in chunks as they arrive
+        - codec: (str) the codec of the audio (see get_codec)
+        - container: (str) the kind of file it is in
+        """
+        self.size = size
+        self.chunks = chunks
+        self.codec = codec
+        self.container = container
+        return None
+
+
+def youtube_source(link: str, target: Target) -> SourceStream:
+    """
+    Arguments:
+    - link: (str) the link of the video
+    - target: (Target) what the song is saved as, the audio in that codec is picked if the video has it (so it doesn't have to be transcoded)
+
+    Returns the audio stream of the video with the best bitrate
+    """
+    # only loaded when something is downloaded
+    pytube = services.downloader.get()
+
+    streams = list(pytube.YouTube(link).streams.filter(only_audio=True))
+    if not streams:
+        raise DownloadError(f"{link} has no audio")
+    stream = max(streams, key=lambda s: (get_codec(s.audio_codec) == target.codec, int((s.abr or "0").rstrip("kbps") or 0)))
+    return SourceStream(stream.filesize, pytube.request.stream(stream.url), get_codec(stream.audio_codec), stream.subtype)
+
+
+def find_ffmpeg() -> str:
+    """ Returns the path of ffmpeg (looked for the first time it is needed, see services.load_transcoder) """
+    try:
+        return services.transcoder.get()
+    except FileNotFoundError as error:
+        raise DownloadError(str(error)) from None
+
+
+class StoreEncoder:
+    """
+    Stores the bytes as they are (for streams that are already in the right format, and to run the manager without ffmpeg)
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Arguments:
+        - path: (str) the file to write to
+        """
+        self.path = path
+        self.file = open(path, "wb")
+        return None
+
+
+    def write(self, chunk: bytes) -> None:
+        """ Add the next chunk of the stream """
+        self.file.write(chunk)
+        return None
+
+
+    def finish(self) -> None:
+        """ Called after the last chunk, raises DownloadError if the file couldn't be made """
+        self.file.close()
+        return None
+
+
+    def abort(self) -> None:
+        """ Stop and delete what was written """
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        return None
+
+
+class FFmpegEncoder(StoreEncoder):
+    """
+    Remuxes or transcodes the stream with ffmpeg, which reads it from a pipe while it is still downloading
+    """
+    def __init__(self, path: str, args: list[str]) -> None:
+        """
+        Arguments:
+        - path: (str) the file to write to
+        - args: (list[str]) the ffmpeg output options (see Target.get_args)
+        """
+        self.path = path
+        # -xerror makes ffmpeg fail instead of saving what it could read if the stream is broken
+        self.process = subprocess.Popen([find_ffmpeg(), "-xerror", "-loglevel", "error", "-y", "-i", "pipe:0", "-vn", *args, path],
+                                        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        self.file = self.process.stdin
+        return None
+
+
+    def write(self, chunk: bytes) -> None:
+        """ Pass the next chunk of the stream to ffmpeg """
+        try:
+            self.file.write(chunk)
+        except BrokenPipeError:
+            raise DownloadError(f"ffmpeg stopped: {self.process.stderr.read().decode(errors='replace').strip()}")
+        return None
+
+
+    def finish(self) -> None:
+        """ Wait for ffmpeg to convert the rest """
+        try:
+            self.file.close()
+        except BrokenPipeError:
+            pass
+        error = self.process.stderr.read().decode(errors="replace").strip()
+        if self.process.wait() != 0:
+            raise DownloadError(f"ffmpeg failed: {error}")
+        return None
+
+
+    def abort(self) -> None:
+        """ Stop ffmpeg and delete what it wrote """
+        self.process.kill()
+        self.process.wait()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        return None
+
+
+def make_encoder(path: str, args: list[str] | None) -> StoreEncoder:
+    """ Returns the encoder that writes to path, ffmpeg with the options or a StoreEncoder if the stream is stored as it is """
+    return StoreEncoder(path) if args is None else FFmpegEncoder(path, args)
+
+
+class Download:
+    """
+    Holds a song that is being (or will be) downloaded, and how far it has got
+    """
+    def __init__(self, link: str, path: str) -> None:
+        """
+        Arguments:
+        - link: (str) the link of the video
+        - path: (str) where the song is saved
+        """
+        self.link = link
+        self.path = path
+        self.state = QUEUED
+        self.received = 0 # how many bytes have been downloaded
+        self.size: int | None = None # how many bytes there are, if known
+        self.error: Exception | None = None
+        self.plan: str | None = None # how the stream is saved (STORE, REMUX or TRANSCODE), once it is known
+        self.cancelled = threading.Event()
+        self.future: Future | None = None
+        return None
+
+
+    def get_progress(self) -> float | None:
+        """ Returns how much has been downloaded, between 0 and 1 (None if the size isn't known) """
+        if self.state == DONE:
+            return 1
+        return min(self.received/self.size, 1) if self.size else None
+
+
+    def is_finished(self) -> bool:
+        """ Returns whether the download has stopped (it was done, failed or cancelled) """
+        return self.state in (DONE, FAILED, CANCELLED)
+
+
+class DownloadManager:
+    def __init__(self, workers: int = 2, source = youtube_source, encoder = make_encoder, target: Target | None = None) -> None:
+        """
+        Arguments:
+        - workers: (int) how many songs are downloaded at the same time, the rest wait in the queue
+        - source: (function) called with a link and the target, returns its SourceStream
+        - encoder: (function) called with the path to save to and the ffmpeg options (see make_encoder), returns an encoder that is given the bytes as they arrive
+        - target: (Target) what songs are saved as (Opus by default)
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download")
+        self.source = source
+        self.encoder = encoder
+        self.target = target or Target()
+        self.queue: list[Download] = [] # every download, in the order they were added
+        return None
+
+
+    def add(self, link: str, path: str) -> Download:
+        """
+        Arguments:
+        - link: (str) the link of the video
+        - path: (str) where to save the song
+
+        Queues the song to be downloaded, returns its Download
+        """
+        download = Download(link, path)
+        self.queue.append(download)
+        download.future = self.pool.submit(self.run, download)
+        self.post(download)
+        return download
+
+
+    def cancel(self, download: Download) -> None:
+        """ Cancel a download, if it is waiting it never starts, if it is running it stops at the next chunk """
+        download.cancelled.set()
+        if download.future and download.future.cancel():
+            download.state = CANCELLED
+            self.post(download)
+        return None
+
+
+    def get_active(self) -> list[Download]:
+        """ Returns the downloads that are waiting or running """
+        return [download for download in self.queue if not download.is_finished()]
+
+
+    def post(self, download: Download) -> None:
+        """ Tell the main loop the download got further """
+        if pygame.display.get_init():
+            pygame.event.post(pygame.event.Event(DOWNLOAD_PROGRESS, download=download))
+        return None
+
+
+    def run(self, download: Download) -> None:
+        """ Download and convert a song (on a worker thread), the bytes go to the encoder as they arrive """
+        download.state = DOWNLOADING
+        self.post(download)
+        # the song is written next to where it goes and only moved there once it is complete, so a half done song is never in the music folder
+        part = download.path+".part"
+        encoder = None
+        try:
+            stream = self.source(download.link, self.target)
+            download.size = stream.size
+            download.plan = self.target.get_plan(stream.codec, stream.container)
+            encoder = self.encoder(part, self.target.get_args(download.plan))
+            posted = time.perf_counter()
+            for chunk in stream.chunks:
+                if download.cancelled.is_set():
+                    break
+                encoder.write(chunk)
+                download.received += len(chunk)
+                if time.perf_counter()-posted >= PROGRESS_INTERVAL:
+                    posted = time.perf_counter()
+                    self.post(download)
+            if download.cancelled.is_set():
+                encoder.abort()
+                download.state = CANCELLED
+            else:
+                encoder.finish()
+                os.replace(part, download.path)
+                download.state = DONE
+        except Exception as error:
+            # anything can go wrong while downloading (no internet, the video is private, ...), the download fails but the app carries on
+            if encoder:
+                encoder.abort()
+            download.error = error
+            download.state = FAILED
+            print(f"Download of {download.link} failed: {error!r}")
+        self.post(download)
+        return None
+
+
+    def shutdown(self) -> None:
+        """ Cancel every download and wait for the running ones to stop """
+        for download in self.get_active():
+            self.cancel(download)
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        return None
+
+
+if __name__ == "__main__":
+    import sys
+    import queue
+    import tempfile
+
+    if sys.argv[1:2] == ["convert"]:
+        # time saving audio files (e.g. downloaded with pytube) as each target, the way the manager does (piped into ffmpeg),
+        # and compare the time and CPU time of remuxing or storing a file to transcoding it
+        import resource
+
+        # the codec and container of the files YouTube gives, by extension
+        FILES = {".webm": ("opus", "webm"), ".m4a": ("aac", "mp4"), ".mp4": ("aac", "mp4"), ".ogg": ("vorbis", "ogg"), ".opus": ("opus", "ogg"), ".mp3": ("mp3", "mp3")}
+
+        def convert(path: str, target: Target, plan: str, folder: str) -> tuple[float, float]:
+            """ Returns the time and CPU time (of this process and ffmpeg) it takes to save the file as the target with the plan """
+            start, cpu = time.perf_counter(), resource.getrusage(resource.RUSAGE_SELF).ru_utime+resource.getrusage(resource.RUSAGE_CHILDREN).ru_utime
+            encoder = make_encoder(os.path.join(folder, plan+target.extension), target.get_args(plan))
+            with open(path, "rb") as file:
+                while chunk := file.read(64*1024):
+                    encoder.write(chunk)
+            encoder.finish()
+            used = resource.getrusage(resource.RUSAGE_SELF).ru_utime+resource.getrusage(resource.RUSAGE_CHILDREN).ru_utime-cpu
+            return time.perf_counter()-start, used
+
+        try:
+            find_ffmpeg()
+        except DownloadError as error:
+            sys.exit(f"{error}, it is needed to remux and transcode")
+        with tempfile.TemporaryDirectory() as folder:
+            paths = sys.argv[2:]
+            if not paths:
+                # make a 3 minute song in each format YouTube gives (its mp4 audio is fragmented, so it can be read from a pipe)
+                for name, codec in (("song.webm", ["libopus"]), ("song.m4a", ["aac", "-movflags", "+frag_keyframe+empty_moov"])):
+                    paths.append(os.path.join(folder, name))
+                    subprocess.run([find_ffmpeg(), "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=180", "-b:a", "128k", "-c:a", *codec, paths[-1]], check=True)
+            total_time = total_cpu = 0
+            for path in paths:
+                codec, container = FILES[os.path.splitext(path)[1].lower()]
+                for target in (Target("opus"), Target("mp3", "192k")):
+                    plan = target.get_plan(codec, container)
+                    seconds, cpu = convert(path, target, plan, folder)
+                    line = f"{os.path.basename(path)} -> {target.codec}: {plan} {seconds*1000:.0f} ms ({cpu*1000:.0f} ms CPU)"
+                    if plan != TRANSCODE:
+                        # what it would cost if it was always transcoded, like moviepy did
+                        full, full_cpu = convert(path, target, TRANSCODE, folder)
+                        total_time += full-seconds
+                        total_cpu += full_cpu-cpu
+                        line += f", transcoding takes {full*1000:.0f} ms ({full_cpu*1000:.0f} ms CPU), saved {(full-seconds)*1000:.0f} ms ({(full_cpu-cpu)*1000:.0f} ms CPU)"
+                    print(line)
+            print(f"saved {total_time:.2f} s and {total_cpu:.2f} s of CPU in total")
+        sys.exit()
+
+    # compare downloading and converting songs one after the other (like clicking each result used to) to the manager, with a local source and encoder
+    # that take as long as a slow connection and ffmpeg would, and measure the worst frame of a loop running while the manager works,
+    # exits with 1 if a cancelled download ends done, a part file is left behind or the wrong number of downloads are done
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    SIZE = 4*1024*1024 # bytes per song
+    CHUNK = 64*1024
+    RATE = 16*1024*1024 # bytes per second the connection gives each download
+    ENCODE_RATE = 24*1024*1024 # bytes per second the encoder converts
+
+    def local_source(link: str, target: Target) -> SourceStream:
+        """ A stand-in for youtube_source that makes up the bytes at the speed of the connection """
+        def chunks():
+            for _ in range(SIZE//CHUNK):
+                time.sleep(CHUNK/RATE)
+                yield bytes(CHUNK)
+        return SourceStream(SIZE, chunks(), "aac", "mp4")
+
+    class SlowEncoder(StoreEncoder):
+        """ A stand-in for FFmpegEncoder that takes as long as converting would, on its own thread behind a small buffer like ffmpeg behind its pipe """
+        def __init__(self, path: str, args: list[str] | None = None) -> None:
+            super().__init__(path)
+            self.pipe = queue.Queue(maxsize=16)
+            self.thread = threading.Thread(target=self.convert)
+            self.thread.start()
+
+        def convert(self) -> None:
+            while (chunk := self.pipe.get()) is not None:
+                time.sleep(len(chunk)/ENCODE_RATE)
+                self.file.write(chunk)
+
+        def write(self, chunk: bytes) -> None:
+            self.pipe.put(chunk)
+
+        def finish(self) -> None:
+            self.pipe.put(None)
+            self.thread.join()
+            super().finish()
+
+        def abort(self) -> None:
+            self.pipe.put(None)
+            self.thread.join()
+            super().abort()
+
+    pygame.display.init()
+    pygame.display.set_mode((200, 200))
+    failures = []
+    with tempfile.TemporaryDirectory() as folder:
+        # before: download the whole file, then convert it, then the next one
+        start = time.perf_counter()
+        for i in range(count):
+            data = b"".join(local_source(str(i), Target()).chunks)
+            encoder = SlowEncoder(os.path.join(folder, f"before {i}.mp3"))
+            for j in range(0, len(data), CHUNK):
+                encoder.write(data[j:j+CHUNK])
+            encoder.finish()
+        before = time.perf_counter()-start
+        print(f"one after the other: {before:.2f} s (the window is frozen for {before/count:.2f} s per song)")
+
+        for workers, cancel in ((1, False), (3, False), (3, True)):
+            manager = DownloadManager(workers, local_source, SlowEncoder)
+            start = time.perf_counter()
+            downloads = [manager.add(str(i), os.path.join(folder, f"{workers}{cancel} {i}.mp3")) for i in range(count)]
+            if cancel:
+                # cancel one that is still queued, and the first one once it is running
+                manager.cancel(downloads[-1])
+            frames = []
+            events = 0
+            while manager.get_active():
+                frame = time.perf_counter()
+                events += len(pygame.event.get(DOWNLOAD_PROGRESS))
+                frames.append(time.perf_counter()-frame)
+                if cancel and downloads[0].received and not downloads[0].cancelled.is_set():
+                    manager.cancel(downloads[0])
+                time.sleep(1/60)
+            seconds = time.perf_counter()-start
+            states = [download.state for download in downloads]
+            leftover = [f for f in os.listdir(folder) if f.startswith(f"{workers}{cancel}") and not f.endswith(".mp3")]
+            print(f"manager, {workers} worker(s){', cancelling 2' if cancel else ''}: {seconds:.2f} s, {states.count(DONE)} done, {states.count(CANCELLED)} cancelled, "
+                  f"{events} progress events, worst frame {max(frames)*1000:.2f} ms, leftover part files: {len(leftover)}")
+            manager.shutdown()
+            run = f"{workers} worker(s){', cancelling 2' if cancel else ''}"
+            if any(download.cancelled.is_set() and download.state == DONE for download in downloads):
+                failures.append(f"{run}: a cancelled download ended done")
+            if leftover:
+                failures.append(f"{run}: part files left behind: {leftover}")
+            if states.count(DONE) != count-(2 if cancel else 0):
+                failures.append(f"{run}: {states.count(DONE)} downloads done instead of {count-(2 if cancel else 0)}")
+    pygame.quit()
+    for failure in failures:
+        print("failed:", failure)
+    if failures:
+        sys.exit(1)
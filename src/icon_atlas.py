@@ -0,0 +1,114 @@
+"""
+This file holds the icon atlases, which keep every icon the buttons use ready to be drawn.
+
+There is one atlas per theme. The first time a button asks for an icon at some size, its normal, hover and click images are loaded (or generated with image_editor if they don't exist yet),
+scaled (and flipped if needed) once, and packed into the atlas surface. Buttons then blit their part of the atlas, so drawing an icon never scales or flips anything.
+Changing the theme just means the buttons read from a different atlas.
+"""
+# imports
+import time
+
+import pygame
+
+import theme
+import assets
+import image_editor
+
+# the width of the atlas surfaces, icons are packed in rows (shelves) from left to right
+ATLAS_WIDTH = 512
+# the states of a button, each with its own image
+STATES = ("norm", "hov", "click")
+
+
+def load_icon(theme_name: str, icon: str, state: str) -> pygame.Surface:
+    """
+    Arguments:
+    - theme_name: (str) the name of the theme (e.g. mint)
+    - icon: (str) the name of the icon (e.g. play)
+    - state: (str) norm, hov or click
+
+    Loads the image of the icon for the theme and state, generating it from the default icon if it doesn't exist
+    """
+    path = f"./Assets_PROG2/Icons/{theme_name}_{icon}{'' if state == 'norm' else '_'+state}.png"
+    try:
+        return pygame.image.load(path).convert_alpha()
+    except FileNotFoundError:
+        colour = getattr(theme.themes[theme_name], f"{state}_col")
+        return image_editor.change_colour(f"./Assets_PROG2/Icons/default_{icon}.png", colour, path)
+
+
+class IconAtlas:
+    def __init__(self, theme_name: str) -> None:
+        """
+        Arguments:
+        - theme_name: (str) the name of the theme the icons are loaded for
+        """
+        self.theme_name = theme_name
+        self.surface = pygame.Surface((ATLAS_WIDTH, 64), pygame.SRCALPHA).convert_alpha()
+        self.rects: dict[tuple, pygame.Rect] = {} # where each (icon, size, flip, state) is in the atlas
+        # the packing position: the current shelf starts at shelf_y and is shelf_h tall, the next icon goes at shelf_x
+        self.shelf_x = 0
+        self.shelf_y = 0
+        self.shelf_h = 0
+        return None
+
+
+    def get(self, icon: str, size: tuple, flip: bool, state: str) -> pygame.Rect:
+        """
+        Arguments:
+        - icon: (str) the name of the icon (e.g. play)
+        - size: (tuple[int, int]) the size to draw the icon at
+        - flip: (bool) whether the icon is flipped horizontally
+        - state: (str) norm, hov or click
+
+        Returns the part of the atlas surface holding the icon, adding it to the atlas if it isn't there yet
+        """
+        key = (icon, size, flip, state)
+        if key not in self.rects:
+            self.add(icon, size, flip)
+        return self.rects[key]
+
+
+    def add(self, icon: str, size: tuple, flip: bool) -> None:
+        """ Scale (and flip) every state of an icon and pack them into the atlas """
+        start = time.perf_counter()
+        for state in STATES:
+            image = load_icon(self.theme_name, icon, state)
+            if flip:
+                image = pygame.transform.flip(image, True, False)
+            image = pygame.transform.scale(image, size)
+            rect = self.place(image.get_size())
+            # the atlas is transparent where nothing has been packed, so the max blend copies the pixels exactly (a normal blit would blend them)
+            self.surface.blit(image, rect, special_flags=pygame.BLEND_RGBA_MAX)
+            self.rects[(icon, size, flip, state)] = rect
+        assets.record("icons", time.perf_counter()-start)
+        return None
+
+
+    def place(self, size: tuple[int, int]) -> pygame.Rect:
+        """ Find room for an image of the given size, making the atlas taller if it is full """
+        if self.shelf_x+size[0] > ATLAS_WIDTH:
+            # start a new shelf below the current one
+            self.shelf_x = 0
+            self.shelf_y += self.shelf_h
+            self.shelf_h = 0
+        rect = pygame.Rect((self.shelf_x, self.shelf_y), size)
+        self.shelf_x += size[0]
+        self.shelf_h = max(self.shelf_h, size[1])
+        if rect.bottom > self.surface.get_height():
+            # double the height (the rects already handed out stay where they are)
+            bigger = pygame.Surface((ATLAS_WIDTH, max(2*self.surface.get_height(), rect.bottom)), pygame.SRCALPHA).convert_alpha()
+            bigger.blit(self.surface, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.surface = bigger
+        return rect
+
+
+# an atlas for each theme, made the first time the theme is used
+atlases: dict[str, IconAtlas] = {}
+
+
+def get_atlas(theme_name: str) -> IconAtlas:
+    """ Returns the atlas of a theme, making it if it doesn't exist yet """
+    if theme_name not in atlases:
+        atlases[theme_name] = IconAtlas(theme_name)
+    return atlases[theme_name]
@@ -0,0 +1,333 @@
+"""
+This file holds the library, an index of every song file in the music folders.
+
+Scanning reads the folders with os.scandir on a pool of threads. Every folder is stored with its modification time (which changes when files are added, removed or renamed in it),
+so the next scan only has to stat a folder that hasn't changed instead of reading it again.
+The index is stored in Assets_PROG2/library.db (an SQLite database next to metadata.db) and loaded into memory on startup.
+Each scan works out which files were added, removed or renamed since the last one, and passes them to Library.on_change (the watcher uses this to update the playlists).
+Files are looked up by their canonical path (Library.canonical), so a song can be asked for however its path is spelled, and files outside the music folders are stat'ed instead.
+"""
+# imports
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# the song formats the library looks for
+FORMATS = (".mp3", ".ogg", ".opus", ".flac", ".wav")
+
+
+class Folder:
+    """
+    Holds what the library knows about a folder
+    """
+    def __init__(self, path: str, mtime: float, subdirs: list[str], files: dict[str, tuple[int, float]]) -> None:
+        """
+        Arguments:
+        - path: (str) the path of the folder
+        - mtime: (float) the modification time of the folder when it was read
+        - subdirs: (list[str]) the paths of the folders in it
+        - files: (dict[str, tuple[int, float]]) the size and modification time of each song file in it, by path
+        """
+        self.path = path
+        self.mtime = mtime
+        self.subdirs = subdirs
+        self.files = files
+
+
+class Changes:
+    """
+    Holds the song files that changed between two scans
+    """
+    def __init__(self, added: list[str], removed: list[str], renamed: list[tuple[str, str]]) -> None:
+        """
+        Arguments:
+        - added: (list[str]) the paths of the new files
+        - removed: (list[str]) the paths of the files that are gone
+        - renamed: (list[tuple[str, str]]) the old and new path of each file that was renamed or moved
+        """
+        self.added = added
+        self.removed = removed
+        self.renamed = renamed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.renamed)
+
+
+def diff(old: dict[str, tuple[int, float]], new: dict[str, tuple[int, float]]) -> Changes:
+    """
+    Arguments:
+    - old: (dict[str, tuple[int, float]]) the size and modification time of each file before, by path
+    - new: (dict[str, tuple[int, float]]) the same after
+
+    Returns what changed. A renamed (or moved) file keeps its size and modification time, so removed and added files with the same ones are paired up as renames
+    (preferring files with the same name, for when a file was moved to another folder)
+    """
+    added = {path: info for path, info in new.items() if path not in old}
+    removed = {path: info for path, info in old.items() if path not in new}
+    candidates: dict[tuple, list[str]] = {}
+    for path, info in removed.items():
+        candidates.setdefault(info, []).append(path)
+    renamed = []
+    for path, info in list(added.items()):
+        same = candidates.get(info)
+        if not same:
+            continue
+        old_path = next((p for p in same if os.path.basename(p) == os.path.basename(path)), same[0])
+        same.remove(old_path)
+        renamed.append((old_path, path))
+        del added[path], removed[old_path]
+    return Changes(sorted(added), sorted(removed), renamed)
+
+
+class ScanStats:
+    """
+    Holds how a scan went
+    """
+    def __init__(self, files: int, folders: int, skipped: int, seconds: float, changes: Changes) -> None:
+        """
+        Arguments:
+        - files: (int) how many song files are in the library after the scan
+        - folders: (int) how many folders were checked
+        - skipped: (int) how many of them hadn't changed, so weren't read
+        - seconds: (float) how long the scan took
+        - changes: (Changes) the files that changed since the last scan
+        """
+        self.files = files
+        self.folders = folders
+        self.skipped = skipped
+        self.seconds = seconds
+        self.changes = changes
+
+    def __str__(self) -> str:
+        return f"{self.files} files in {self.folders} folders ({self.skipped} unchanged) in {self.seconds*1000:.1f} ms, {self.files/max(self.seconds, 1e-9):.0f} files/s"
+
+
+def read_folder(path: str) -> Folder:
+    """
+    Arguments:
+    - path: (str) the path of the folder
+
+    Lists the folders and song files in a folder (symlinked folders aren't followed, so they can't loop)
+    """
+    mtime = os.stat(path).st_mtime
+    subdirs = []
+    files = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name.lower().endswith(FORMATS) and entry.is_file():
+                stat = entry.stat()
+                files[entry.path] = (stat.st_size, stat.st_mtime)
+    return Folder(path, mtime, subdirs, files)
+
+
+class Library:
+    """
+    In memory index of the song files in the music folders, backed by an SQLite database.
+    It can be used from the Loader's worker threads, as changes are made while holding a lock
+    """
+    def __init__(self, roots: list[str], db_path: str = "Assets_PROG2/library.db", workers: int = 4) -> None:
+        """
+        Arguments:
+        - roots: (list[str]) the folders the music is in (their subfolders are included)
+        - db_path: (str) where the index is stored
+        - workers: (int) how many threads read folders at the same time
+        """
+        self.roots = roots
+        self.workers = workers
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.scanning = threading.Lock() # only one scan runs at a time
+        self.db.execute("CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY, mtime REAL, subdirs TEXT, files TEXT)")
+        # load the index into memory
+        self.folders: dict[str, Folder] = {}
+        for path, mtime, subdirs, files in self.db.execute("SELECT * FROM folders"):
+            self.folders[path] = Folder(path, mtime, json.loads(subdirs), {p: tuple(info) for p, info in json.loads(files).items()})
+        self.real_roots = [os.path.normcase(os.path.realpath(root)) for root in roots]
+        self.real_folders: dict[str, str] = {} # the real path of every folder a song file was looked up in, so each is only resolved once
+        self.paths: dict[str, tuple[int, float]] = {} # the size and modification time of every song file, by path
+        self.keys: dict[str, str] = {} # the canonical path of every song file, by path
+        self.files: dict[str, str] = {} # the path of every song file, by its canonical path
+        self.stats: dict[str, tuple[int, float]] = {} # the size and modification time of every song file, by its canonical path
+        self.index_files()
+        self.on_change = lambda changes: None # called (on the scanning thread) with the Changes of every scan that changed something
+        return None
+
+
+    def canonical(self, path: str) -> str:
+        """
+        Arguments:
+        - path: (str) the path of a file, spelled any way (relative, absolute, through a symlinked folder...)
+
+        Returns the one way the library spells it: the real path of its folder (resolved once per folder) with its name, in the case the system compares paths in
+        """
+        folder, name = os.path.split(os.path.abspath(path))
+        real = self.real_folders.get(folder)
+        if real is None:
+            real = self.real_folders[folder] = os.path.realpath(folder)
+        return os.path.normcase(os.path.join(real, name))
+
+
+    def in_roots(self, key: str) -> bool:
+        """ Returns whether the file (by its canonical path) is in one of the music folders """
+        return any(key.startswith(os.path.join(root, "")) for root in self.real_roots)
+
+
+    def index_files(self) -> None:
+        """ Build the lookups of song files from the folders """
+        for folder in self.folders.values():
+            self.add_files(folder.files)
+        return None
+
+
+    def add_files(self, files: dict[str, tuple[int, float]]) -> None:
+        """ Add song files (size and modification time by path) to the lookups """
+        for path, info in files.items():
+            key = self.canonical(path)
+            self.paths[path] = info
+            self.keys[path] = key
+            self.files[key] = path
+            self.stats[key] = info
+        return None
+
+
+    def remove_files(self, files: dict[str, tuple[int, float]]) -> None:
+        """ Remove song files from the lookups """
+        for path in files:
+            self.paths.pop(path, None)
+            key = self.keys.pop(path, None)
+            if key is not None:
+                self.files.pop(key, None)
+                self.stats.pop(key, None)
+        return None
+
+
+    def visit(self, path: str, force: bool) -> tuple[Folder, bool]:
+        """
+        Arguments:
+        - path: (str) the path of the folder
+        - force: (bool) read the folder even if its modification time is the same
+
+        Returns the folder and whether it is unchanged (then it comes from the index, otherwise it is read again)
+        """
+        known = self.folders.get(path)
+        if known and not force and known.mtime == os.stat(path).st_mtime:
+            return known, True
+        return read_folder(path), False
+
+
+    def scan(self, force: set[str] = frozenset()) -> ScanStats:
+        """
+        Arguments:
+        - force: (set[str]) folders to read even if their modification time is the same (the watcher knows they changed, but two changes can happen within one tick of the clock)
+
+        Brings the index up to date with the music folders, reading only the folders that changed, and stores the changes.
+        Returns how the scan went
+        """
+        with self.scanning:
+            start = time.perf_counter()
+            visited: dict[str, Folder] = {}
+            changed: list[Folder] = []
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="library") as pool:
+                pending = {pool.submit(self.visit, root, root in force) for root in self.roots if os.path.isdir(root)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            folder, unchanged = future.result()
+                        except OSError:
+                            continue # the folder was removed (or can't be read) while scanning
+                        visited[folder.path] = folder
+                        if not unchanged:
+                            changed.append(folder)
+                        # read the folders inside it too
+                        for subdir in folder.subdirs:
+                            pending.add(pool.submit(self.visit, subdir, subdir in force))
+            removed = [path for path in self.folders if path not in visited]
+            changes = Changes([], [], [])
+            # only the files in the folders that changed can have changed, so only those are compared and updated in the lookups
+            if changed or removed:
+                old: dict[str, tuple[int, float]] = {}
+                new: dict[str, tuple[int, float]] = {}
+                for folder in [self.folders[path] for path in removed]+[self.folders[f.path] for f in changed if f.path in self.folders]:
+                    old.update(folder.files)
+                for folder in changed:
+                    new.update(folder.files)
+                with self.lock:
+                    # folders may have been moved or (re)linked, so resolve them again from now on
+                    self.real_folders.clear()
+                    self.remove_files(old)
+                    self.add_files(new)
+                    self.folders = visited
+                    self.db.executemany("INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?)", [(f.path, f.mtime, json.dumps(f.subdirs), json.dumps(f.files)) for f in changed])
+                    self.db.executemany("DELETE FROM folders WHERE path = ?", [(path,) for path in removed])
+                    self.db.commit()
+                changes = diff(old, new)
+            if changes:
+                self.on_change(changes)
+            return ScanStats(len(self.files), len(visited), len(visited)-len(changed), time.perf_counter()-start, changes)
+
+
+    def contains(self, path: str) -> bool:
+        """ Returns whether the song file is in the library (as of the last scan), or exists if it is outside the music folders """
+        return self.stat(path) is not None
+
+
+    def stat(self, path: str) -> tuple[int, float] | None:
+        """
+        Arguments:
+        - path: (str) the path of the song file, spelled any way
+
+        Returns the size and modification time of the song file (as of the last scan), or None if it isn't in the library.
+        A file outside the music folders (e.g. picked with the file dialog) isn't scanned, so it is stat'ed instead (None if it doesn't exist)
+        """
+        info = self.paths.get(path) # most paths are written the same way as the library's, so try that before resolving
+        if info is not None:
+            return info
+        key = self.canonical(path)
+        info = self.stats.get(key)
+        if info is not None or self.in_roots(key):
+            return info
+        try:
+            result = os.stat(path)
+        except OSError:
+            return None
+        return (result.st_size, result.st_mtime)
+
+
+    def get_paths(self) -> list[str]:
+        """ Returns the path of every song file in the library, sorted """
+        with self.lock:
+            return sorted(self.files.values())
+
+
+if __name__ == "__main__":
+    # measure the scan throughput on a made up library, first from nothing and then when nothing has changed
+    # usage (from the src folder): python library.py [number of folders] [files per folder]
+    import sys
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as folder:
+        root = os.path.join(folder, "Music")
+        for i in range(count):
+            # artist/album folders like a real library
+            album = os.path.join(root, f"Artist {i//10}", f"Album {i}")
+            os.makedirs(album)
+            for j in range(size):
+                open(os.path.join(album, f"{j:02} Song{FORMATS[j%len(FORMATS)]}"), "w").close()
+            open(os.path.join(album, "cover.jpg"), "w").close()
+        library = Library([root], os.path.join(folder, "library.db"))
+        print("first scan:    ", library.scan())
+        print("nothing changed:", library.scan())
+        open(os.path.join(root, "Artist 0", "Album 0", "new.mp3"), "w").close()
+        print("one new file:  ", library.scan())
+        os.rename(os.path.join(root, "Artist 0", "Album 0", "new.mp3"), os.path.join(root, "Artist 0", "Album 1", "moved.mp3"))
+        stats = library.scan()
+        print("one moved file: ", stats, stats.changes.renamed)
+        print("after a restart:", Library([root], os.path.join(folder, "library.db")).scan())
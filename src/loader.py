@@ -0,0 +1,167 @@
+"""
+This file holds the Loader, which runs slow work (file I/O, probing, validating playlists) on worker threads so the main loop never has to wait for it.
+
+Work is submitted on a channel (e.g. "song"), and submitting new work on a channel cancels whatever was still waiting on it.
+When a job finishes, a LOAD_DONE event is posted, and the main loop passes it to Loader.finish, which runs the job's callback on the main thread.
+"""
+# imports
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import pygame
+
+# event posted when a job finishes, handled in the main loop by calling Loader.finish
+LOAD_DONE = pygame.USEREVENT+2
+
+
+class Job:
+    """
+    Holds what to do with the result of some work once it is done
+    """
+    def __init__(self, channel: str, ticket: int, on_done, on_error) -> None:
+        """
+        Arguments:
+        - channel: (str) the channel the job was submitted on
+        - ticket: (int) unique number of the job, newer jobs have bigger tickets
+        - on_done: (function) called on the main thread with the result of the work
+        - on_error: (function or None) called on the main thread with the exception if the work raised one
+        """
+        self.channel = channel
+        self.ticket = ticket
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future: Future | None = None
+        return None
+
+
+class Loader:
+    def __init__(self, workers: int = 2) -> None:
+        """
+        Arguments:
+        - workers: (int) how many worker threads to run the work on
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loader")
+        self.lock = threading.Lock()
+        self.jobs: dict[int, Job] = {} # jobs that haven't been finished on the main thread yet, by ticket
+        self.latest: dict[str, int] = {} # the ticket of the newest job on each channel
+        self.tickets = 0
+        return None
+
+
+    def submit(self, channel: str, work, args: tuple = (), on_done = lambda *_: None, on_error = None) -> int:
+        """
+        Arguments:
+        - channel: (str) the channel to submit the work on, older work on the same channel is cancelled
+        - work: (function) what to run on the worker thread
+        - args: (tuple) the arguments to call work with
+        - on_done: (function) called on the main thread with the result
+        - on_error: (function) called on the main thread with the exception if work raised one (it is printed if this is None)
+
+        Returns the ticket of the job
+        """
+        with self.lock:
+            self.tickets += 1
+            job = Job(channel, self.tickets, on_done, on_error)
+            # cancel anything still waiting on this channel (work that has already started just gets ignored when it is done)
+            previous = self.jobs.get(self.latest.get(channel, -1))
+            if previous and previous.future and previous.future.cancel():
+                self.jobs.pop(previous.ticket)
+            self.latest[channel] = job.ticket
+            self.jobs[job.ticket] = job
+        job.future = self.pool.submit(work, *args)
+        job.future.add_done_callback(lambda _: pygame.event.post(pygame.event.Event(LOAD_DONE, ticket=job.ticket)))
+        return job.ticket
+
+
+    def cancel(self, channel: str) -> None:
+        """ Cancel the work on a channel (its callbacks won't be called) """
+        with self.lock:
+            job = self.jobs.get(self.latest.pop(channel, -1))
+        if job and job.future:
+            job.future.cancel()
+        return None
+
+
+    def is_busy(self, channel: str) -> bool:
+        """ Returns whether there is unfinished work on a channel """
+        with self.lock:
+            return self.latest.get(channel, -1) in self.jobs
+
+
+    def finish(self, event: pygame.event.Event) -> None:
+        """
+        Arguments:
+        - event: the LOAD_DONE event
+
+        Runs the callback of the finished job, unless newer work has been submitted on its channel since
+        """
+        with self.lock:
+            job = self.jobs.pop(event.ticket, None)
+            if not job or self.latest.get(job.channel) != job.ticket:
+                return None # cancelled or replaced
+            self.latest.pop(job.channel)
+        if not job.future or job.future.cancelled():
+            return None
+        error = job.future.exception()
+        if error:
+            if job.on_error:
+                job.on_error(error)
+            else:
+                print(f"Loader: {job.channel} failed: {error!r}")
+        else:
+            job.on_done(job.future.result())
+        return None
+
+
+    def shutdown(self) -> None:
+        """ Stop the worker threads, dropping anything that hasn't started """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        return None
+
+
+if __name__ == "__main__":
+    # measure the worst frame time while skipping through songs every frame, with next() and with next_async(),
+    # and check no frame of next_async() goes over the budget of a frame at 60 fps (it does if songs are loaded on the main thread again)
+    # usage (from the src folder): python loader.py [number of songs]
+    import os
+    import sys
+    import tempfile
+    import time
+
+    import audio_probe
+    from classes.playlist import Playlist, Song
+    from metadata_cache import MetadataCache
+    from music_player import MusicPlayer
+
+    pygame.display.set_mode((200, 200))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    budget = 1/60
+    worst = {}
+    with tempfile.TemporaryDirectory() as folder:
+        player = MusicPlayer("./Music/", lambda *_: None, (1080, 720))
+        for name, skip in (("next()", player.next), ("next_async()", player.next_async)):
+            # fresh (uncached) VBR songs without a tag, the slowest kind to probe
+            songs = []
+            for i in range(count):
+                path = os.path.join(folder, f"{name}_{i}.mp3")
+                audio_probe.make_synthetic_mp3(path, 10000, vbr=True)
+                songs.append(Song(str(i), path))
+            player.metadata = MetadataCache(os.path.join(folder, f"{name}.db"))
+            player.current_playlist = Playlist(name, songs)
+            frames = []
+            for _ in range(count):
+                start = time.perf_counter()
+                for e in pygame.event.get():
+                    if e.type == LOAD_DONE:
+                        player.loader.finish(e)
+                skip()
+                pygame.display.update()
+                frames.append(time.perf_counter()-start)
+                time.sleep(1/60)
+            worst[name] = max(frames)
+            print(f"{name:<14} worst frame {max(frames)*1000:7.2f} ms, average {sum(frames)/len(frames)*1000:6.2f} ms")
+        player.loader.shutdown()
+    pygame.quit()
+    if worst["next_async()"] >= budget:
+        print(f"next_async() took longer than a frame ({budget*1000:.1f} ms)")
+        sys.exit(1)
@@ -5,7 +5,7 @@ Main file, renders the main window and runs the program
 import os
 import pygame
 import time
-# to check the performance
+# to check the performance (the startup profiler counts from here)
 start = time.perf_counter()
 
 # Temporary measure (to ensure the correct directory is used)
@@ -18,14 +18,27 @@ if __name__ == "__main__":
 
 # more imports
 import theme
-from music_player import MusicPlayer
+from music_player import MusicPlayer, SONG_END, SONG_ERROR, MIXER
+from loader import LOAD_DONE
+from watcher import LIBRARY_CHANGED
 from classes.sidebar import Sidebar
 from classes.button import Button, ImageButton, TextButton
 from screen_elements.controls_tray import ControlsTray
+from screen_elements.search_box import SearchBox
 from screen_elements.progress_bar import ProgressBar
 from classes.playlist import PlaylistManager
 from screen_elements.playlist_view import PlaylistView
 from screen_elements.playlist_dialog import PlaylistDialog
+from renderer import Renderer
+from dispatcher import InputDispatcher
+from pacing import FramePacer, FAST, IDLE, ASLEEP
+import text_cache
+import compositor
+import assets
+
+# measure how long each part of starting up takes (printed after the first frame)
+profiler = assets.StartupProfiler(start)
+profiler.mark("imports")
 
 # initialise pygame
 pygame.init()
@@ -36,32 +49,38 @@ L, H = 1080, 720
 # create the window and set it's title
 screen: pygame.Surface = pygame.display.set_mode((L, H))
 pygame.display.set_caption("More Music")
-# set a constant FRAMERATE
+# the full frame rate, used while something is moving
 FRAMERATE = 60
-# clock to to implement the frame rate
-clock: pygame.time.Clock = pygame.time.Clock()
+# decides how often the main loop runs (the full frame rate only while something is moving)
+pacer = FramePacer(FRAMERATE)
+# print how long the frames took and how the library scan went when the app closes
+DEBUG = False
 
 # initialise some fonts
-title_font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Bold.ttf", 40)
-subtitle_font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Medium.ttf", 24)
-small_font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Thin.ttf", 16)
+title_font = assets.get_font(assets.BOLD, 40)
+subtitle_font = assets.get_font(assets.MEDIUM, 24)
+small_font = assets.get_font(assets.THIN, 16)
 
 # quick loading screen to not give the user a heart attack when the app is loading
 screen.fill(theme.current.bg)
 screen.blit(title_font.render("Loading...", True, theme.current.norm_col), (L/2-100, H/2-10))
 pygame.display.update()
+profiler.mark("window")
 
 rootpath = "./Music/" # rootpath of where the music will normally be located
+# what plays the songs (MIXER, or ENGINE for the audio engine, which can crossfade), and how long songs crossfade for with the engine (seconds)
+AUDIO_BACKEND = MIXER
+CROSSFADE = 0.0
 
 def update_playlist(id) -> None:
     """
     Arguments:
-    - id: (int) the id of the playlist to be loaded in
+    - id: (str) the id of the playlist to be loaded in
 
     Loads a playlist in and updates the info in relevant places
     """
     global player, p_view
-    player.change_playlist(id, L/4) # use the music player to load it in
+    player.change_playlist(id) # use the music player to load it in
     p_view.load_playlist() # update the info in the playlist view
     return None
 
@@ -78,13 +97,15 @@ def refresh_playlists(id=None) -> None:
     # reinitialising the playlist bar to refresh the playlists in the bar
     playlistbar = Sidebar((L/4, H), (0, 0), "Playlists", [(PlaylistManager.playlists[id].name[:13]+"..." if len(PlaylistManager.playlists[id].name)>16 else PlaylistManager.playlists[id].name, get_id(id)) for id in PlaylistManager.playlists.keys()], -1, False, shift_screen_elements, open_playlist, list(PlaylistManager.playlists.keys()))
     playlistbar.is_open = open # set it's state to open/close based on the previous stuff
+    dispatcher.add("playlistbar", playlistbar, 2, lambda: playlistbar.is_open, rect=lambda: playlistbar.get_rect((L, H)))
     p_view.load_playlist()
     if id:
         update_playlist(id) # also start a new playlist if required
     return None
 
 # music Player
-player = MusicPlayer(rootpath, refresh_playlists, (L, H))
+player = MusicPlayer(rootpath, refresh_playlists, (L, H), backend=AUDIO_BACKEND, crossfade=CROSSFADE)
+profiler.mark("playlist load")
 
 # controls Tray (for playing, pausing, stopping, skipping, sound controls, etc.)
 tray = ControlsTray(player, (L/2-185, H-70), 60, (28, 28))
@@ -92,26 +113,38 @@ tray = ControlsTray(player, (L/2-185, H-70), 60, (28, 28))
 # the progress bar
 progress_bar = ProgressBar(player, (100, 0.85*H), (L-200, 10), player.skip_to)
 
-# temp var to keep track of where the song title should be positioned
-song_title_pos = (100, 0.85*H-55)
+# where the song title is when the playlistbar is closed, and where it is now
+SONG_TITLE_POS = (100, 0.85*H-55)
+song_title_pos = SONG_TITLE_POS
+# how far the screen elements next to the playlistbar are moved (it is open by this much)
+content_offset = 0
 
-def shift_screen_elements(val) -> None:
+def shift_screen_elements(offset) -> None:
     """
     Arguments:
-    val: (int/float) the amount to shift the screen elements by
+    offset: (float) how far the playlistbar is open (0 when it is closed)
 
-    Shifts the screen elements by val, called by the playlistbar to adjust the position of the screen elements as requied
+    Moves the screen elements next to the playlistbar to follow it, called by the playlistbar while it animates.
+    Everything follows the one offset (the playlist view only places the tiles in view), so this costs the same however long the playlist is
     """
-    global tray, progress_bar, song_title_pos, player, p_view, playlist_button, themebar_button, add_playlist_button
+    global content_offset, song_title_pos
+    # move by whole pixels, so the elements are back exactly where they started once it closes
+    offset = round(offset)
+    val = offset-content_offset
+    if not val:
+        return None
+    content_offset = offset
     # shift all screen elements
     tray.shift(val)
     progress_bar.shift(val)
     p_view.shift(val)
-    song_title_pos = song_title_pos[0]+val, song_title_pos[1]
-    playlist_button.pos = playlist_button.pos[0]+(val-5*(val/abs(val))), playlist_button.pos[1]
-    add_playlist_button.pos = add_playlist_button.pos[0]+(val-5*(val/abs(val))), add_playlist_button.pos[1]
-    for s in player.playlist_texts: # shift each playlist view text
-        s.pos = (s.pos[0]+val, s.pos[1])
+    song_title_pos = SONG_TITLE_POS[0]+offset, SONG_TITLE_POS[1]
+    # the buttons stop 50 pixels short of the sidebar's edge, next to its title
+    button_offset = offset*(1-50/playlistbar.dimensions[0])
+    playlist_button.pos = PLAYLIST_BUTTON_POS[0]+button_offset, PLAYLIST_BUTTON_POS[1]
+    add_playlist_button.pos = ADD_PLAYLIST_BUTTON_POS[0]+button_offset, ADD_PLAYLIST_BUTTON_POS[1]
+    # the elements moved, so the input dispatcher has to find them again
+    dispatcher.moved()
     return None
 
 
@@ -131,23 +164,31 @@ def change_theme(id) -> None:
     Changes the global theme of the application by refreshing objects,
     usually called by the theme options in the themebar
     """
-    global playlist_button, themebar_button, add_playlist_button
+    global add_playlist_button
+    # everything changes colour, so the whole screen has to be redrawn (and the overlays made again)
+    renderer.mark_all()
+    compositor.layers.clear()
+    # forget the text rendered in colours the new theme doesn't use
+    old, new = theme.current, theme.themes[id]
+    text_cache.cache.invalidate({old.norm_col, old.hov_col, old.click_col, old.text_field_text}-{new.norm_col, new.hov_col, new.click_col, new.text_field_text})
     # change the theme in the Theme module
     theme.current_name = id
-    theme.current = theme.themes[id]
+    theme.current = new
 
     # load the theme in screen elements
     tray.load_theme()
     themebar.load_theme()
     playlistbar.load_theme()
     p_view.load_theme()
+    search_box.load_theme()
     progress_bar.load_theme()
     player.set_song_title()
     p_dialog.load_theme()
-    # redefine some elements with the new theme
+    # redefine some elements with the new theme (the image buttons just switch to the new theme's icon atlas)
     add_playlist_button = TextButton(p_dialog.open, add_playlist_button.pos, add_playlist_button.size, "+", 3)
-    playlist_button = ImageButton(playlistbar.open, "playlist.png", f"./Assets_PROG2/Icons/{theme.current_name}_playlist.png", f"./Assets_PROG2/Icons/{theme.current_name}_playlist_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_playlist_click.png", playlist_button.pos, playlist_button.size)
-    themebar_button = ImageButton(themebar.open, "settings.png", f"./Assets_PROG2/Icons/{theme.current_name}_settings.png", f"./Assets_PROG2/Icons/{theme.current_name}_settings_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_settings_click.png", themebar_button.pos, themebar_button.size)
+    dispatcher.add("add_playlist_button", add_playlist_button, 3)
+    playlist_button.update_colors()
+    themebar_button.update_colors()
     return None
 
 
@@ -172,36 +213,105 @@ playlistbar = Sidebar((L/4, H), (0, 0), "Playlists", [(PlaylistManager.playlists
 p_view = PlaylistView((100, 50), player.current_playlist, player, length=L-200)
 p_dialog = PlaylistDialog(playlistbar, player, update_playlist, refresh_playlists)
 # buttons to trigger the opening of the playlistbar, playlist dialog and the themebar
-playlist_button = ImageButton(playlistbar.open, "playlist.png", f"./Assets_PROG2/Icons/{theme.current_name}_playlist.png", f"./Assets_PROG2/Icons/{theme.current_name}_playlist_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_playlist_click.png", (5, 5), (40, 40))
-add_playlist_button = TextButton(p_dialog.open, (55, 5), (0, 0), "+", 3)
-themebar_button = ImageButton(themebar.open, "settings.png", f"./Assets_PROG2/Icons/{theme.current_name}_settings.png", f"./Assets_PROG2/Icons/{theme.current_name}_settings_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_settings_click.png", (L-50, 10), (40, 40))
+PLAYLIST_BUTTON_POS, ADD_PLAYLIST_BUTTON_POS = (5, 5), (55, 5) # where they are when the playlistbar is closed
+playlist_button = ImageButton(playlistbar.open, "playlist", PLAYLIST_BUTTON_POS, (40, 40))
+add_playlist_button = TextButton(p_dialog.open, ADD_PLAYLIST_BUTTON_POS, (0, 0), "+", 3)
+themebar_button = ImageButton(themebar.open, "settings", (L-50, 10), (40, 40))
+
+
+def play_search_result(path: str) -> None:
+    """ Play a song picked in the search box and show its playlist in the playlist view """
+    player.play_path(path)
+    p_view.load_playlist()
+    p_view.scroll_to(player.pending*p_view.tile_height if player.pending is not None else 0)
+    return None
+
+# the search box, next to the themebar button (typing in it searches every song)
+search_box = SearchBox((L-370, 10), player.search, play_search_result)
+
+# the renderer only redraws the parts of the screen that changed
+renderer = Renderer(screen)
 
-# printing how long it takes to load the Assets_PROG2
-print(f"Execution starts. Time taken = {time.perf_counter()-start}")
+# the input dispatcher gives the mouse and the keys to the elements they are for, from the top layer down:
+# the playlist dialog covers everything while it is open, then the themebar (and its button), the playlist bar (and its buttons), the search box and the rest
+dispatcher = InputDispatcher()
+dispatcher.add("tray", tray)
+dispatcher.add("progress_bar", progress_bar, check=lambda: not player.stopped)
+dispatcher.add("p_view", p_view)
+dispatcher.add("search_box", search_box, 1, lambda: not playlistbar.is_open, rect=search_box.get_area)
+dispatcher.add("playlistbar", playlistbar, 2, lambda: playlistbar.is_open, rect=lambda: playlistbar.get_rect((L, H)))
+dispatcher.add("playlist_button", playlist_button, 3)
+dispatcher.add("add_playlist_button", add_playlist_button, 3)
+dispatcher.add("themebar", themebar, 4, lambda: themebar.is_open, modal=True, rect=lambda: themebar.get_rect((L, H)))
+dispatcher.add("themebar_button", themebar_button, 5)
+dispatcher.add("p_dialog", p_dialog, 6, lambda: p_dialog.is_open, modal=True, rect=screen.get_rect)
 
-# whether the shift key has been pressed
-shift_key = False
+
+def draw_screen(screen: pygame.Surface) -> None:
+    """
+    Arguments:
+    - screen: the pygame surface to draw the elements on [passed by reference]
+
+    Draws every screen element in order (called by the renderer, which clips it to the parts that changed)
+    """
+    # while the playlist dialog is open, what is under it is kept in a snapshot, so only the dialog itself is drawn
+    if p_dialog.is_open:
+        background = compositor.layers.get_snapshot("p_dialog", screen.get_size())
+        if background:
+            screen.blit(background, (0, 0))
+            p_dialog.render(screen)
+            return None
+    tray.render(screen)
+    progress_bar.render(screen)
+    screen.blit(player.song_title_text, song_title_pos)
+    p_view.render(screen)
+    search_box.render(screen)
+    playlistbar.render(screen)
+    playlist_button.render(screen)
+    add_playlist_button.render(screen)
+    # this is drawn almost last because it can potentially overlay everything
+    themebar.render(screen)
+    themebar_button.render(screen)
+    # last screen element is the p_dialog, as if it is open, it overlays everything else
+    if p_dialog.is_open:
+        p_dialog.render_overlay(screen)
+        compositor.layers.snapshot("p_dialog", screen)
+        p_dialog.render(screen)
+    return None
+
+
+profiler.mark("widgets")
 
 running = True
 while running: # main loop
-    # fill with bg every frame
-    screen.fill(theme.current.bg)
-    # get the events that occured in this frame
-    events = pygame.event.get()
+    # get the events that occured in this frame (or woke the loop up)
+    events = pacer.get_events()
     for e in events:
         if e.type == pygame.QUIT: # if the user wants to quit, stop running the main loop
             running = False
-        if e.type == pygame.KEYUP:
-            if e.key in [pygame.K_LSHIFT, pygame.K_RSHIFT]: # check if the shift key was lifted
-                shift_key = False
-        if e.type == pygame.KEYDOWN:
-            if e.key in [pygame.K_LSHIFT, pygame.K_RSHIFT]: # check if the shift key was pressed
-                shift_key = True
-            if p_dialog.is_open: continue # don't check anything else if we are in playlist editing mode
-            if e.key == pygame.K_n: # next song
-                player.next()
+        if e.type == SONG_END: # the mixer finished a song, move on to the next one (already playing if it was queued)
+            player.song_ended()
+        if e.type == SONG_ERROR: # the audio engine couldn't decode a song, skip it like one the mixer can't load
+            player.song_failed(e.path)
+        if e.type == LOAD_DONE: # a background job (loading a song, checking playlists) finished, run its callback
+            player.loader.finish(e)
+        if e.type == LIBRARY_CHANGED: # songs were added, removed or renamed in the music folders (or the playlists file was edited)
+            player.apply_library_changes(e.changes, e.files_changed)
+        if e.type == pygame.MOUSEWHEEL and not themebar.is_open and not p_dialog.is_open: # scroll the playlist view
+            p_view.scroll_by(-e.y)
+        if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1 and dispatcher.get_widget(e.pos) is not search_box: # clicking anywhere else stops typing in the search box
+            search_box.field.is_active = False
+        # give the mouse to the elements under it, and the keys to the playlist dialog or the search box if they are typing in them
+        used = dispatcher.dispatch(e)
+        if e.type == pygame.KEYDOWN and not used: # the rest of the keys are shortcuts
+            if e.key == pygame.K_SLASH: # start searching
+                search_box.open()
+            if e.key == pygame.K_n: # next song (loaded in the background so holding the key down doesn't freeze the window)
+                player.next_async()
             if e.key == pygame.K_p: # previous song
-                player.prev()
+                player.prev_async()
+            if e.key == pygame.K_j: # jump to the song that is playing in the playlist view
+                p_view.jump_to_current()
             if e.key == pygame.K_SPACE: # pause or unpause
                 player.pause()
             if e.key == pygame.K_s: # stop the song
@@ -220,43 +330,81 @@ while running: # main loop
                 player.change_volume(0.05)
             if e.key == pygame.K_DOWN: # decrease the volume by an increment of 0.05
                 player.change_volume(-0.05)
-    
-    # get the mouse position and whether the right moueskey was pressed or not
-    mouse = pygame.mouse.get_pos()
-    r_click = pygame.mouse.get_pressed(3)[0]
-    
-    # draw the controls tray and only check if neither the themebar nor the playlist dialog are open
-    tray.draw(screen, not themebar.is_open and not p_dialog.is_open, mouse, r_click)
-
-    # only draw the progress bar if the player music hasn't stopped and the playlist_dialog isn't open
-    progress_bar.draw(screen, not player.stopped and not p_dialog.is_open, mouse, r_click)
-    
-    # draw the song title
-    screen.blit(player.song_title_text, song_title_pos)
 
-    # draw the playlist view and the playlist bar (playlistbar.draw will know whether to draw or not)
-    # don't check for element clicking/hovering if the themebar or the playlist dialog is open
-    p_view.draw(screen, mouse, r_click, not themebar.is_open and not p_dialog.is_open)
-    playlistbar.draw(screen, mouse, r_click, not themebar.is_open and not p_dialog.is_open)
-
-    # set the playlist button to close if it is open else open
+    # update the elements that change by themselves (the hover and click checks are done by the input dispatcher when the mouse moves or is pressed)
+    tray.update()
+    # the progress bar shows nothing if the music has stopped or the playlist dialog is open
+    progress_bar.update(not player.stopped and not p_dialog.is_open)
+    # scroll the playlist view (the tiles move under the mouse, so the dispatcher gives it the mouse again)
+    p_view.update()
+    if p_view.is_scrolling():
+        dispatcher.moved()
+    search_box.update()
+    # the sidebars show their options as inactive if something is over them
+    animating = (playlistbar.opening, playlistbar.closing, themebar.opening, themebar.closing)
+    playlistbar.update(not themebar.is_open and not p_dialog.is_open)
+    themebar.update(not p_dialog.is_open)
+    if animating != (playlistbar.opening, playlistbar.closing, themebar.opening, themebar.closing):
+        # the sidebars only take the mouse once they stop animating, so give it to them again
+        dispatcher.moved()
+    if p_dialog.is_open:
+        p_dialog.update()
+
+    # set the playlist and themebar buttons to close their bars if they are open else open them
     playlist_button.on_click = playlistbar.close if playlistbar.is_open else playlistbar.open
-    # draw the playlist buttons, same check rules apply
-    playlist_button.draw(screen, not themebar.is_open and not p_dialog.is_open, mouse, r_click)
-    add_playlist_button.draw(screen, not themebar.is_open and not p_dialog.is_open, mouse, r_click)
-    
-    # draw the themebar and the themebar button and change it's on click appropriately
-    # this is drawn almost last because it can potentially overlay everything
-    themebar.draw(screen, mouse, r_click, not p_dialog.is_open)
-    themebar_button.draw(screen, not p_dialog.is_open, mouse, r_click)
     themebar_button.on_click = themebar.close if themebar.is_open else themebar.open
-
-    # last screen element is the p_dialog, as if it is open, it overlays everything else
-    if p_dialog.is_open: p_dialog.draw(screen, events, shift_key, mouse, r_click)
-
-    # update the display with the drawn elements and move to the next frame
-    pygame.display.update()
-    clock.tick(FRAMERATE)
-
-# once out of the loop quit pygame so as to not cause any errors
+    # give the mouse to the elements again if they changed under it
+    dispatcher.update()
+
+    # tell the renderer what every element looks like, so it knows which parts of the screen changed
+    renderer.watch("tray", tray.get_rect(), tray.get_state())
+    renderer.watch("progress_bar", progress_bar.get_rect(), progress_bar.get_state())
+    renderer.watch("song_title", pygame.Rect(song_title_pos, player.song_title_text.get_size()), (song_title_pos, id(player.song_title_text)))
+    renderer.watch("p_view", p_view.get_rect(), p_view.get_state())
+    renderer.watch("search_box", search_box.get_rect(), search_box.get_state())
+    renderer.watch("playlistbar", playlistbar.get_rect((L, H)), playlistbar.get_state())
+    renderer.watch("playlist_button", playlist_button.get_rect(), playlist_button.get_state())
+    renderer.watch("add_playlist_button", add_playlist_button.get_rect(), add_playlist_button.get_state())
+    renderer.watch("themebar", themebar.get_rect((L, H)), themebar.get_state())
+    renderer.watch("themebar_button", themebar_button.get_rect(), themebar_button.get_state())
+    if p_dialog.is_open and renderer.is_dirty():
+        # something under the dialog changed (e.g. the next song started), so draw everything again and take a new snapshot
+        compositor.layers.drop("p_dialog")
+        renderer.mark_all()
+    elif not p_dialog.is_open:
+        # the snapshot is only used while the dialog stays open
+        compositor.layers.drop("p_dialog")
+    # the dialog covers everything, so all of it is redrawn (from the snapshot) when it changes
+    renderer.watch("p_dialog", pygame.Rect(0, 0, L, H), p_dialog.get_state() if p_dialog.is_open else (False,))
+
+    # redraw (and update the display with) only the parts that changed and move to the next frame
+    renderer.render(draw_screen)
+    # printing how long it took to start, once the first frame is on screen
+    if profiler:
+        profiler.mark("first frame")
+        print(profiler.report())
+        profiler = None
+
+    # run at the full frame rate only while something moves, a few times a second while only the progress bar's clock does,
+    # and wait for the next event while nothing changes by itself (paused, stopped or minimised)
+    if not pygame.display.get_active():
+        pacer.tick(ASLEEP)
+    elif playlistbar.opening or playlistbar.closing or themebar.opening or themebar.closing or p_view.is_scrolling() or progress_bar.click or tray.click or search_box.field.is_active or p_dialog.is_open or dispatcher.resend:
+        pacer.tick(FAST)
+    elif not player.stopped and not player.paused:
+        pacer.tick(IDLE)
+    else:
+        pacer.tick(ASLEEP)
+
+# once out of the loop stop the background loader and quit pygame so as to not cause any errors
+player.loader.shutdown()
+player.watcher.stop()
+player.search.save()
+player.metadata.flush()
+if player.engine is not None:
+    player.engine.close()
+if DEBUG:
+    # how long the frames took, and how long it took to bring the library up to date
+    print(pacer.report())
+    print(f"Library scanned: {player.watcher.scanned}")
 pygame.quit()
\ No newline at end of file
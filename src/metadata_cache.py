@@ -0,0 +1,193 @@
+"""
+This file holds the metadata cache, which remembers information about songs between launches so the audio files don't need to be read again.
+
+The cache is stored in Assets_PROG2/metadata.db (an SQLite database next to playlists.json) and is loaded into memory on startup.
+Every entry stores the size and modification time of the file it was made from, so it only needs to be remade when the file changes.
+Changes are written to the database in batches (see MetadataCache.flush), as committing every entry on its own takes most of the time of checking new songs.
+"""
+# imports
+import os
+import hashlib
+import time
+import sqlite3
+import threading
+
+import audio_probe
+
+# how much of the start and end of the file goes into the content hash
+HASH_CHUNK = 65536
+# how many changed entries, or how long (seconds) since the last write, before the changes are written to the database
+FLUSH_SIZE = 500
+FLUSH_INTERVAL = 2.0
+
+
+class TrackInfo:
+    """
+    Holds the cached information about a song file
+    """
+    def __init__(self, path: str, size: int, mtime: float, length: int = 0, bitrate: int = 0, sample_rate: int = 0, title: str = "", artist: str = "", album: str = "", content_hash: str = "") -> None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+        - size: (int) the size of the file in bytes when it was cached
+        - mtime: (float) the modification time of the file when it was cached
+        - length: (int) the length of the song in milliseconds (0 if unknown)
+        - bitrate: (int) the bitrate in kbps
+        - sample_rate: (int) the sample rate in Hz
+        - title, artist, album: (str) the ID3 tags of the song (empty if there were none)
+        - content_hash: (str) hash of the size and the first and last 64KB of the file
+        """
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.length = length
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.content_hash = content_hash
+
+
+def hash_file(path: str, size: int) -> str:
+    """
+    Arguments:
+    - path: (str) the path of the file
+    - size: (int) the size of the file
+
+    Returns a hash of the size and the first and last 64KB of the file (enough to tell songs apart without reading all of them)
+    """
+    sha = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as file:
+        sha.update(file.read(HASH_CHUNK))
+        if size > 2*HASH_CHUNK:
+            file.seek(-HASH_CHUNK, os.SEEK_END)
+            sha.update(file.read(HASH_CHUNK))
+    return sha.hexdigest()
+
+
+class MetadataCache:
+    """
+    In memory cache of TrackInfo (by path), backed by an SQLite database.
+    It can be used from the Loader's worker threads, as changes are made while holding a lock
+    """
+    def __init__(self, db_path: str = "Assets_PROG2/metadata.db") -> None:
+        """
+        Arguments:
+        - db_path: (str) where the database is stored
+        """
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock() # held while changing the entries, never while writing to the database
+        self.writing = threading.Lock() # held while writing to the database, so batches are written in order
+        self.db.execute("""CREATE TABLE IF NOT EXISTS tracks (
+            path TEXT PRIMARY KEY, size INTEGER, mtime REAL, length INTEGER, bitrate INTEGER,
+            sample_rate INTEGER, title TEXT, artist TEXT, album TEXT, hash TEXT)""")
+        # load every entry into memory so lookups don't need the database (or the audio files)
+        self.entries: dict[str, TrackInfo] = {}
+        for row in self.db.execute("SELECT * FROM tracks"):
+            self.entries[row[0]] = TrackInfo(*row)
+        self.unsaved: dict[str, TrackInfo | None] = {} # the entries changed since the last write (None for the ones that were forgotten), by path
+        self.flushed_at = time.monotonic()
+        return None
+
+
+    def get(self, path: str) -> TrackInfo | None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+
+        Returns the cached info of the song, reading the file only if it hasn't been cached yet (None if the file doesn't exist).
+        The entry isn't checked against the file, use validate for that
+        """
+        info = self.entries.get(path)
+        if info:
+            return info
+        return self.validate(path)
+
+
+    def validate(self, path: str, stat: tuple[int, float] | None = None) -> TrackInfo | None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+        - stat: (tuple[int, float]) the size and modification time of the file if they are already known (e.g. from the library), so it doesn't need to be stat'ed
+
+        Checks the cached entry against the file's size and modification time and remakes it if the file has changed.
+        Returns the up to date info, or None (and forgets the entry) if the file doesn't exist
+        """
+        if stat is None:
+            try:
+                result = os.stat(path)
+            except OSError:
+                self.forget(path)
+                return None
+            stat = (result.st_size, result.st_mtime)
+        size, mtime = stat
+        info = self.entries.get(path)
+        if info and info.size == size and info.mtime == mtime:
+            return info # nothing has changed
+        return self.update(path, size, mtime)
+
+
+    def update(self, path: str, size: int, mtime: float) -> TrackInfo | None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+        - size: (int) the current size of the file
+        - mtime: (float) the current modification time of the file
+
+        Reads the file to make a new entry, and stores it in memory and in the database
+        """
+        try:
+            audio = audio_probe.probe(path)
+            tags = audio_probe.read_tags(path)
+            content_hash = hash_file(path, size)
+        except OSError:
+            self.forget(path)
+            return None
+        info = TrackInfo(path, size, mtime, audio.length, audio.bitrate, audio.sample_rate, tags.get("title", ""), tags.get("artist", ""), tags.get("album", ""), content_hash)
+        with self.lock:
+            self.entries[path] = info
+            self.unsaved[path] = info
+            due = len(self.unsaved) >= FLUSH_SIZE or time.monotonic()-self.flushed_at >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+        return info
+
+
+    def set_length(self, path: str, length: int) -> None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+        - length: (int) the length of the song in milliseconds, worked out some other way than probing (e.g. by decoding it)
+
+        Stores the length in the song's entry (if it has one), so it isn't worked out again until the file changes
+        """
+        with self.lock:
+            info = self.entries.get(path)
+            if info:
+                info.length = length
+                self.unsaved[path] = info
+        return None
+
+
+    def forget(self, path: str) -> None:
+        """ Removes the entry for path (if there is one) """
+        with self.lock:
+            if self.entries.pop(path, None):
+                self.unsaved[path] = None
+        return None
+
+
+    def flush(self) -> None:
+        """ Write the entries changed since the last write to the database, in one transaction """
+        with self.writing:
+            with self.lock:
+                changed, self.unsaved = self.unsaved, {}
+                self.flushed_at = time.monotonic()
+            if not changed:
+                return None
+            self.db.executemany("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(i.path, i.size, i.mtime, i.length, i.bitrate, i.sample_rate, i.title, i.artist, i.album, i.content_hash) for i in changed.values() if i is not None])
+            self.db.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path, i in changed.items() if i is None])
+            self.db.commit()
+        return None
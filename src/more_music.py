@@ -1,21 +1,26 @@
 import os
 
 import pygame
-from youtubesearchpython import VideosSearch, ResultMode
 
 import theme
+import assets
 from search_result import SearchResult
+from downloads import DownloadManager, DOWNLOAD_PROGRESS
+from loader import Loader, LOAD_DONE
+from search_service import SearchService
 from classes.input_field import InputField
 from classes.button import TextButton
+from pacing import FramePacer, FAST, ASLEEP
 
 pygame.init()
-clock: pygame.time.Clock = pygame.time.Clock()
 
 BG = theme.current.bg
 L, H = 1080, 600
 FRAMERATE = 24
+# runs the loop at the frame rate only while something moves
+pacer = FramePacer(FRAMERATE)
 
-subtitle_font = pygame.font.Font("./Assets/Fonts/Roboto-Medium.ttf", 24)
+subtitle_font = assets.get_font(assets.MEDIUM, 24)
 
 screen: pygame.Surface = pygame.display.set_mode((L, H))
 pygame.display.set_caption("More Music")
@@ -23,33 +28,61 @@ pygame.display.set_caption("More Music")
 query_text = subtitle_font.render("Enter Query:", True, theme.current.norm_col)
 search_field = InputField((180, 100))
 search_field.text = "Never Gonna Give You Up"
-search_button = TextButton(lambda: fetch_results(search_field.text), (500, 100), (0, 0), "Search", 24)
+search_button = TextButton(lambda: service.search(search_field.text), (500, 100), (0, 0), "Search", 24)
 
 display_results = []
+# downloads run in the background, so the window keeps going while songs download
+downloads = DownloadManager()
 
-search_limit = 6
-no_internet = None
+# the results are shown in a list under the search field, scrolled with the mouse wheel
+RESULTS_TOP = 180
+ROW_HEIGHT = 50
+scroll = 0
 
-def fetch_results(query):
-    global display_results, no_internet
+no_internet = None
+loading_text = subtitle_font.render("Loading...", True, theme.current.hov_col)
+
+def show_results(query, results, done):
+    """ Show the results of the query (called by the search service whenever they change) """
+    global display_results, no_internet, scroll
+    no_internet = None
+    # keep the results that were already shown (they may be downloading), so more pages don't reset them
+    shown = {r.link: r for r in display_results if r.query == query}
+    if not shown:
+        scroll = 0
+    display_results = [shown.get(r["link"]) or SearchResult(query, (30, RESULTS_TOP), r["title"], r["link"], r["duration"], downloads) for r in results]
+
+def show_error(query, message):
+    """ Show why the search failed (called by the search service) """
+    global no_internet
     display_results.clear()
-    try:
-        vs = VideosSearch(query, limit = search_limit)
-        search_results = vs.result(ResultMode.dict)["result"] # type: ignore
-        for i, r in enumerate(search_results):
-            display_results.append(SearchResult(query, (30, 180+i*50), f"{r['title']}, by {r['channel']['name']}", f"youtube.com/watch?v={r['id']}", r["duration"])) # type: ignore
-    except:
-        no_internet = subtitle_font.render("An error occured. Please close this window and try again later.", True, theme.current.norm_col)
+    no_internet = subtitle_font.render(message, True, theme.current.norm_col)
+
+def get_max_scroll():
+    """ Returns how far the results can be scrolled """
+    return max(len(display_results)*ROW_HEIGHT-(H-RESULTS_TOP), 0)
+
+# searches run on worker threads, and are only made once the user stops typing
+loader = Loader()
+service = SearchService(loader, show_results, show_error)
 
 running: bool = True
 shift = False
 while running:
     screen.fill(BG)
-    events = pygame.event.get()
+    events = pacer.get_events()
 
     for e in events:
         if e.type == pygame.QUIT:
             running = False
+        if e.type == LOAD_DONE:
+            loader.finish(e)
+        if e.type == pygame.MOUSEWHEEL:
+            scroll = min(max(scroll-e.y*ROW_HEIGHT, 0), get_max_scroll())
+        if e.type == DOWNLOAD_PROGRESS:
+            for r in display_results:
+                if r.download is e.download:
+                    r.update_status()
         if e.type == pygame.KEYUP:
             if e.key in [pygame.K_LSHIFT, pygame.K_RSHIFT]:
                 shift = False
@@ -66,9 +99,20 @@ while running:
     if no_internet:
         screen.blit(no_internet, (30, H/2-10))
 
-    for r in display_results:
-        r.draw(screen, True, mouse, m_down)
-    
+    # only the results in the list area are drawn, and the next page is fetched once the end of the list is shown
+    for i, r in enumerate(display_results):
+        y = RESULTS_TOP+i*ROW_HEIGHT-scroll
+        if RESULTS_TOP-ROW_HEIGHT//2 <= y < H:
+            r.set_y(y)
+            r.draw(screen, True, mouse, m_down)
+    if display_results and scroll >= get_max_scroll()-ROW_HEIGHT:
+        service.more()
+    if service.is_loading():
+        screen.blit(loading_text, (30, min(RESULTS_TOP+len(display_results)*ROW_HEIGHT-scroll, H-30)))
+    service.update()
+
+    # cover the results scrolled up under the search field
+    pygame.draw.rect(screen, BG, (0, 0, L, RESULTS_TOP-ROW_HEIGHT//2))
     search_field.draw(screen, True, mouse, m_down)
     search_button.draw(screen, True, mouse, m_down)
     screen.blit(query_text, (30, 100))
@@ -76,10 +120,19 @@ while running:
     if search_field.is_active:
         for e in events:
             if e.type == pygame.KEYDOWN:
+                text = search_field.text
                 search_field.update_text(e, shift)
                 if e.key == pygame.K_RETURN:
-                    fetch_results(search_field.text)
+                    service.search(search_field.text)
+                elif search_field.text != text:
+                    service.type(search_field.text)
 
-    clock.tick(FRAMERATE)
     pygame.display.flip()
+    # the cursor blinks while typing and the search waits for the user to stop typing, everything else (results, downloads, the mouse) wakes the loop up with an event
+    if search_field.is_active or service.is_typing() or m_down:
+        pacer.tick(FAST)
+    else:
+        pacer.tick(ASLEEP)
+downloads.shutdown()
+loader.shutdown()
 pygame.quit()
\ No newline at end of file
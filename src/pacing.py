@@ -0,0 +1,164 @@
+"""
+This file holds the FramePacer, which decides how often the main loop runs instead of always ticking at the full frame rate.
+Every frame the loop tells it how much is going on:
+- FAST: something moves every frame (a sidebar animating, the progress bar being dragged, a text cursor blinking), so it runs at the full frame rate
+- IDLE: only the progress bar's clock is moving (a song is playing), so a few frames a second are enough
+- ASLEEP: nothing changes by itself (paused, stopped or minimised), so it waits for the next event (at most SLEEP_TIMEOUT)
+
+While idle or asleep it waits with pygame.event.wait, so input and background work (songs loading or ending, downloads, library changes) wake it up straight away.
+It also keeps statistics of how long the frames take, which can be printed with report.
+
+Run this file (python pacing.py) to measure how much CPU the main loop uses while idle, playing and animating, with and without the pacer.
+"""
+# imports
+import time
+from collections import deque
+
+import pygame
+
+# how busy the frame was
+FAST = "fast"
+IDLE = "idle"
+ASLEEP = "asleep"
+MODES = (FAST, IDLE, ASLEEP)
+
+# frames per second while something moves
+FAST_RATE = 60
+# frames per second while only the progress bar's clock moves
+IDLE_RATE = 4
+# the longest it waits for an event while asleep (seconds)
+SLEEP_TIMEOUT = 1.0
+# how many of the latest frames are kept for the statistics
+HISTORY = 600
+
+class FramePacer:
+    def __init__(self, fast_rate: int = FAST_RATE, idle_rate: int = IDLE_RATE, sleep_timeout: float = SLEEP_TIMEOUT) -> None:
+        """
+        Arguments:
+        - fast_rate: (int) the frames per second while something moves
+        - idle_rate: (int) the frames per second while only the progress bar's clock moves
+        - sleep_timeout: (float) the longest it waits for an event while asleep (seconds)
+        """
+        self.periods = {FAST: 1/fast_rate, IDLE: 1/idle_rate, ASLEEP: sleep_timeout}
+        self.pending: list[pygame.event.Event] = [] # the event that woke it up, given to the loop with the rest next frame
+        self.frame_start = time.perf_counter()
+        self.finished: tuple[str, float] | None = None # the mode of the last frame and the time spent working in it
+        # (mode, time spent working, time until the next frame started) of the latest frames
+        self.frames: deque[tuple[str, float, float]] = deque(maxlen=HISTORY)
+        return None
+
+
+    def get_events(self) -> list[pygame.event.Event]:
+        """ Start a frame, returns the events that occured since the last one (including the one that woke it up) """
+        now = time.perf_counter()
+        if self.finished:
+            self.frames.append(self.finished+(now-self.frame_start,))
+            self.finished = None
+        self.frame_start = now
+        events = self.pending + pygame.event.get()
+        self.pending = []
+        return events
+
+
+    def tick(self, mode: str) -> None:
+        """
+        Arguments:
+        - mode: (str) FAST, IDLE or ASLEEP, how much is going on in the frame that just finished
+
+        Finish the frame, and wait until the next one should start
+        """
+        now = time.perf_counter()
+        self.finished = (mode, now-self.frame_start)
+
+        if mode != FAST:
+            # wait for an event, or until the clock needs redrawing
+            timeout = self.frame_start+self.periods[mode]-now
+            if timeout > 0:
+                event = pygame.event.wait(max(1, int(timeout*1000)))
+                if event.type != pygame.NOEVENT:
+                    self.pending.append(event)
+        # never run faster than the full frame rate, even when events keep waking it up (e.g. the mouse moving)
+        remaining = self.frame_start+self.periods[FAST]-time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        return None
+
+
+    def get_stats(self) -> dict:
+        """ Returns the frames per second and the time spent working per frame (average, 95th percentile and worst, in ms) of the latest frames, overall and for every mode """
+        stats = {}
+        for mode in (None,)+MODES:
+            frames = [f for f in self.frames if mode is None or f[0] == mode]
+            if not frames:
+                continue
+            work = sorted(f[1] for f in frames)
+            interval = sum(f[2] for f in frames)
+            stats[mode or "all"] = {
+                "frames": len(frames),
+                "fps": len(frames)/interval if interval else 0.0,
+                "mean_ms": sum(work)/len(work)*1000,
+                "p95_ms": work[min(len(work)-1, int(len(work)*0.95))]*1000,
+                "max_ms": work[-1]*1000,
+            }
+        return stats
+
+
+    def report(self) -> str:
+        """ Returns the frame statistics as readable text """
+        lines = [f"{'frames':<8}{'count':>7}{'fps':>8}{'mean ms':>9}{'p95 ms':>8}{'max ms':>8}"]
+        for mode, s in self.get_stats().items():
+            lines.append(f"{mode:<8}{s['frames']:>7}{s['fps']:>8.1f}{s['mean_ms']:>9.2f}{s['p95_ms']:>8.2f}{s['max_ms']:>8.2f}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # a stand-in for the main loop: the same window, the elements' states compared every frame and the parts that changed redrawn
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((1080, 720))
+    overlay = pygame.Surface(screen.get_size())
+    overlay.fill((50, 50, 50))
+    overlay.set_alpha(153)
+    SECONDS = 2.0
+
+    def frame(state: str, step: int) -> None:
+        """ One frame of the stand-in: compare the states, redraw the progress bar while playing and the sidebar while animating """
+        # the renderer compares the state of every element with the one in the last frame (about as long as it takes in the main loop)
+        for i in range(3000):
+            (i, (i, i), (255, 255, 255), str(i)) == (i, (i, i), (255, 255, 255), str(i))
+        # and redraws the ones that changed
+        if state == "playing":
+            pygame.draw.rect(screen, (30, 30, 30), (100, 630, 880, 40))
+            pygame.draw.rect(screen, (200, 200, 200), (100, 645, step % 880, 10))
+            pygame.display.update(pygame.Rect(100, 630, 880, 40))
+        if state == "animating":
+            screen.blit(overlay, (0, 0))
+            pygame.draw.rect(screen, (40, 40, 40), (810-step % 270, 0, 270, 720))
+            pygame.display.update(screen.get_rect())
+        return None
+
+    # what the pacer is told in every state
+    modes = {"idle": ASLEEP, "playing": IDLE, "animating": FAST}
+    print(f"{'state':<10}{'loop':<10}{'frames':>7}{'cpu %':>8}")
+    for state, mode in modes.items():
+        for loop in ("fixed", "adaptive"):
+            clock = pygame.time.Clock()
+            pacer = FramePacer()
+            frames = 0
+            wall, cpu = time.perf_counter(), time.process_time()
+            while time.perf_counter()-wall < SECONDS:
+                if loop == "fixed":
+                    pygame.event.get()
+                    frame(state, frames)
+                    clock.tick(FAST_RATE)
+                else:
+                    pacer.get_events()
+                    frame(state, frames)
+                    pacer.tick(mode)
+                frames += 1
+            wall, cpu = time.perf_counter()-wall, time.process_time()-cpu
+            print(f"{state:<10}{loop:<10}{frames:>7}{cpu/wall*100:>8.1f}")
+    print()
+    print(pacer.report())
+    pygame.quit()
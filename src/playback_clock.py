@@ -0,0 +1,289 @@
+"""
+This file holds the PlaybackClock, which keeps track of where the song that is playing is, to within a few milliseconds.
+
+The mixer only tells how much music it has mixed since it was last told to play (get_pos, which starts again from 0 on every play(start=...) and when a queued song starts).
+That counter is ahead of what can be heard by the audio waiting in the sound card's buffers (LATENCY), and straight after unpausing it also counts the time it was paused until the next buffer is mixed.
+So the clock remembers where in the song the mixer was (re)started and takes the latency off the counter, and counts on smoothly from there with a monotonic clock,
+only following the counter again when they are more than TOLERANCE apart (so it can't drift, and doesn't jitter with it).
+After a seek (or unpausing) it stays where it was until the new audio can really be heard, instead of counting the time it takes to get there.
+
+Run this file (python playback_clock.py) to check the drift against a fake mixer over an hour of seeking, skipping and pausing.
+"""
+# imports
+import time
+
+# how far the mixer's counter is ahead of what can be heard: the buffer being mixed and the one the sound card is playing (2 buffers of 512 samples at 44.1 kHz, in seconds)
+LATENCY = 2*512/44100
+# how far the smooth position can be from the counter before it follows the counter again (seconds)
+TOLERANCE = 0.004
+
+
+class PlaybackClock:
+    def __init__(self, music, clock = time.monotonic, latency: float = LATENCY, tolerance: float = TOLERANCE) -> None:
+        """
+        Arguments:
+        - music: the mixer's music (pygame.mixer.music), only its counter (get_pos) is read
+        - clock: (function) returns the time in seconds
+        - latency: (float) how far the mixer's counter is ahead of what can be heard (seconds)
+        - tolerance: (float) how far the position can be from the counter before it follows the counter again (seconds)
+        """
+        self.music = music
+        self.clock = clock
+        self.latency = latency
+        self.tolerance = tolerance
+        self.duration = 0.0 # the length of the song (seconds)
+        self.offset = 0.0 # where in the song the mixer was last told to play from, its counter counts from there
+        self.position = 0.0 # where the song is while it is paused or waiting for the mixer to start
+        self.anchor = (0.0, clock()) # (position, time) the smooth position counts on from
+        self.started_at = self.anchor[1] # when the mixer was last (re)started
+        self.waiting = True # whether nothing has been heard since the mixer was (re)started
+        self.resumed = False # whether it is waiting after unpausing (when the counter can't be trusted yet)
+        self.paused = False
+        return None
+
+
+    def start(self, duration: float, position: float = 0.0) -> None:
+        """
+        Arguments:
+        - duration: (float) the length of the song (seconds)
+        - position: (float) where in the song the mixer was told to play from (seconds)
+
+        Called once the mixer was told to play a song (or seek in it), or a queued song started (the mixer's counter starts again from 0 either way)
+        """
+        self.duration = duration
+        self.offset = position
+        self.position = position
+        self.started_at = self.clock()
+        self.waiting = True
+        self.resumed = False
+        self.paused = False
+        return None
+
+
+    def pause(self) -> None:
+        """ Stop the clock, once the mixer was paused """
+        if not self.paused:
+            count = self.music.get_pos()
+            if count >= 0:
+                # the audio that was already mixed still plays, so it stops where the mixer's counter stopped
+                self.position = min(max(self.offset+count/1000, self.position), self.duration)
+            else:
+                self.position = self.get_position()
+            self.paused = True
+        return None
+
+
+    def resume(self) -> None:
+        """ Start the clock again, once the mixer was unpaused """
+        if self.paused:
+            self.paused = False
+            self.waiting = True
+            self.resumed = True
+            self.started_at = self.clock()
+        return None
+
+
+    def read(self, now: float) -> None:
+        """ Read the mixer's counter, and follow it if the smooth position is too far from it """
+        count = self.music.get_pos()
+        if count < 0:
+            return None
+        heard = self.offset+count/1000-self.latency
+        if self.waiting:
+            if heard <= self.position:
+                return None # nothing new can be heard yet
+            if self.resumed and heard > self.position+now-self.started_at+self.latency+self.tolerance:
+                return None # the counter is still counting the time it was paused (until the next buffer is mixed)
+            self.anchor = (heard, now)
+            self.waiting = False
+            return None
+        if abs(self.anchor[0]+now-self.anchor[1]-heard) > self.tolerance:
+            self.anchor = (heard, now)
+        return None
+
+
+    def get_position(self) -> float:
+        """ Returns where the song is (seconds) """
+        if self.paused or self.duration <= 0:
+            return min(self.position, max(self.duration, 0))
+        now = self.clock()
+        self.read(now)
+        if self.waiting:
+            return min(self.position, self.duration)
+        return min(max(self.anchor[0]+now-self.anchor[1], 0), self.duration)
+
+
+    def get_duration(self) -> float:
+        """ Returns the length of the song (seconds) """
+        return self.duration
+
+
+    def get_remaining(self) -> float:
+        """ Returns how much of the song is left (seconds) """
+        return max(self.duration-self.get_position(), 0)
+
+
+    def get_progress(self) -> float:
+        """ Returns how far through the song it is, as a decimal out of 1 (0 if there is no song) """
+        if self.duration <= 0:
+            return 0
+        return self.get_position()/self.duration
+
+
+if __name__ == "__main__":
+    # play an hour of a song on a fake mixer (seeking, skipping and pausing every few seconds) and check the clock never drifts 10 ms from what can really be heard
+    # usage (from the src folder): python playback_clock.py [seed]
+    import sys
+    import random
+
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    rng = random.Random(seed)
+    # the fake time, moved on by hand
+    now = [0.0]
+
+    class FakeMusic:
+        """
+        A mixer that plays by itself as the fake time moves on, the way pygame's does:
+        the sound card asks for a buffer at a time (its clock running slightly fast), a buffer is heard once the one before it has played,
+        and get_pos is the music mixed since play plus the milliseconds since the last buffer was mixed (which keeps counting while paused until the next one after unpausing)
+        """
+        def __init__(self, rate: int = 44100, buffer: int = 512, drift: float = 50e-6) -> None:
+            self.buffer = buffer/rate # seconds of music per buffer
+            self.period = self.buffer/(1+drift) # seconds between the sound card asking for buffers
+            self.next_callback = rng.uniform(0, self.period)
+            self.play_id = 0
+            self.start_pos = 0.0 # where it was told to play from
+            self.mixed = 0 # buffers mixed since play
+            self.mixed_at = 0 # when the last one was mixed (ms)
+            self.paused = False
+            self.heard: tuple[int, float, float] | None = None # (play, when it starts being heard, where in the song) of the last buffer of music mixed
+            return None
+
+        def run(self) -> None:
+            """ Mix the buffers the sound card asked for until now """
+            while self.next_callback <= now[0]:
+                if not self.paused:
+                    # heard after the buffer the sound card is playing
+                    self.heard = (self.play_id, self.next_callback+self.period, self.start_pos+self.mixed*self.buffer)
+                    self.mixed += 1
+                    self.mixed_at = int(self.next_callback*1000)
+                self.next_callback += self.period
+            return None
+
+        def play(self, loops: int = 0, start: float = 0.0) -> None:
+            self.run()
+            self.play_id += 1
+            self.start_pos, self.mixed, self.mixed_at, self.paused = start, 0, int(now[0]*1000), False
+            return None
+
+        def pause(self) -> None:
+            self.run()
+            self.paused = True
+            return None
+
+        def unpause(self) -> None:
+            self.run()
+            self.paused = False
+            return None
+
+        def get_pos(self) -> int:
+            self.run()
+            ticks = int(self.mixed*self.buffer*1000)
+            if not self.paused:
+                ticks += int(now[0]*1000)-self.mixed_at
+            return ticks
+
+        def true_position(self) -> float:
+            """ Returns where the song that can be heard is (where it was told to play from until its first buffer is heard) """
+            self.run()
+            if self.heard is None or self.heard[0] != self.play_id:
+                return self.start_pos
+            play_id, heard_from, position = self.heard
+            if heard_from > now[0]:
+                # the buffer before it is still being heard
+                return max(position-self.buffer+(now[0]-heard_from+self.period)*self.buffer/self.period, self.start_pos)
+            return position+min(now[0]-heard_from, self.period)*self.buffer/self.period
+
+    class HandKept:
+        """ The old way: where the mixer was last told to play from, kept by hand, plus its counter (read once a frame) """
+        def __init__(self, music) -> None:
+            self.music = music
+            self.start_time = 0.0
+            self.length_done = 0.0
+            return None
+
+        def start(self, duration: float, position: float = 0.0) -> None:
+            self.start_time, self.length_done = position, 0.0
+            return None
+
+        def pause(self) -> None:
+            return None
+
+        def resume(self) -> None:
+            return None
+
+        def get_position(self) -> float:
+            self.length_done = self.music.get_pos()/1000
+            return self.start_time+self.length_done
+
+    DURATION = 300.0
+
+    def simulate(track) -> tuple[int, float, float]:
+        """
+        Arguments:
+        - track: (class) PlaybackClock or HandKept
+
+        Play an hour on a fake mixer, seeking from where the tracker says the song is,
+        returns the number of seeks, the furthest the tracker was from what could be heard and the furthest a skip or rewind landed from 10 seconds away (seconds)
+        """
+        rng.seed(seed)
+        now[0] = 0.0
+        music = FakeMusic()
+        tracker = track(music) if track is HandKept else track(music, lambda: now[0])
+        music.play()
+        tracker.start(DURATION)
+        worst = worst_seek = 0.0
+        seeks = 0
+        next_action = rng.uniform(2, 20)
+        while now[0] < 3600:
+            # frames at the full rate or, more often, the idle rate of the frame pacer
+            now[0] += rng.choice((1/60, 1/60, 1/4))
+            if next_action <= now[0]:
+                next_action = now[0]+rng.uniform(2, 20)
+                action = rng.choice(("skip10", "rewind10", "skip_to", "pause"))
+                if action == "pause":
+                    music.pause()
+                    tracker.pause()
+                    for _ in range(rng.randint(1, 20)):
+                        now[0] += 1/4
+                        worst = max(worst, abs(tracker.get_position()-music.true_position()))
+                    music.unpause()
+                    tracker.resume()
+                    continue
+                # seek the way the music player does, from where the tracker says it is (the old way used the counter read in the last frame)
+                position = tracker.start_time+tracker.length_done if track is HandKept else tracker.get_position()
+                target = {"skip10": position+10, "rewind10": position-10, "skip_to": rng.uniform(0, DURATION)}[action]
+                if action != "skip_to" and 0 <= target <= DURATION-15:
+                    worst_seek = max(worst_seek, abs(target-music.true_position()-(10 if action == "skip10" else -10)))
+                target = min(max(target, 0), DURATION-15)
+                music.play(start=target)
+                tracker.start(DURATION, target)
+                seeks += 1
+                continue
+            if music.true_position() >= DURATION-1:
+                # the song ended and the same one was queued, the tracker is told a moment later
+                music.play()
+                now[0] += rng.uniform(0, 0.02)
+                tracker.start(DURATION)
+                continue
+            worst = max(worst, abs(tracker.get_position()-music.true_position()))
+        return seeks, worst, worst_seek
+
+    seeks, worst, worst_seek = simulate(PlaybackClock)
+    _, worst_old, worst_seek_old = simulate(HandKept)
+    print(f"{seeks} seeks in an hour (furthest from what could be heard / furthest a skip landed from 10 s away)")
+    print(f"{'clock':<14}{worst*1000:>9.2f} ms{worst_seek*1000:>9.2f} ms")
+    print(f"{'kept by hand':<14}{worst_old*1000:>9.2f} ms{worst_seek_old*1000:>9.2f} ms")
+    if max(worst, worst_seek) >= 0.010:
+        print("the clock drifted 10 ms or more")
+        sys.exit(1)
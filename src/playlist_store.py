@@ -0,0 +1,189 @@
+"""
+This file holds the playlist store, which saves the playlists without rewriting all of them on every edit.
+
+The playlists are kept in Assets_PROG2/playlists.json (the same format as before, each playlist just has an extra "key" to identify it),
+and every change since the file was last written is appended to Assets_PROG2/playlists.json.journal as one JSON line.
+Saving a playlist only appends that playlist to the journal. Once the journal is long enough, it is compacted:
+playlists.json is rewritten with every change applied (to a temporary file that then replaces it, so a crash can't leave it half written), and the journal is emptied.
+"""
+# imports
+import os
+import json
+
+# how many changes the journal can hold before it is compacted into the playlists file
+COMPACT_AFTER = 64
+
+
+def write_atomic(path: str, text: str) -> None:
+    """
+    Arguments:
+    - path: (str) the file to write
+    - text: (str) what to write in it
+
+    Writes the text to a temporary file next to path, then moves it over path, so path is always either the old or the new file
+    """
+    temp = path+".tmp"
+    with open(temp, "w") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+    return None
+
+
+def file_stamp(path: str) -> tuple | None:
+    """ Returns what is needed to notice a file being changed or replaced (inode, size and modification time), or None if it doesn't exist """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class PlaylistStore:
+    def __init__(self, path: str = "Assets_PROG2/playlists.json", compact_after: int = COMPACT_AFTER) -> None:
+        """
+        Arguments:
+        - path: (str) where the playlists are stored (the journal is stored next to it)
+        - compact_after: (int) how many changes the journal can hold before it is compacted
+        """
+        self.path = path
+        self.journal_path = path+".journal"
+        self.compact_after = compact_after
+        self.records: dict[str, dict] = {} # every playlist by its key, in order, as stored in the file ({"key", "name", "songs"})
+        self.changes = 0 # how many changes are in the journal
+        self.stamp = None # the file_stamp of the playlists file when it was last read or written, to tell other programs' edits from ours
+        return None
+
+
+    def load(self) -> list[dict]:
+        """
+        Reads the playlists file and applies the changes in the journal to it.
+        Playlists saved without a key (by older versions) get one from their position, which stays the same until the file is rewritten.
+        Returns the playlists in order, as dictionaries with a key, name and songs
+        """
+        self.stamp = file_stamp(self.path)
+        with open(self.path, "r") as file:
+            loaded_object = json.load(file)
+        self.records = {}
+        for i, p in enumerate(loaded_object):
+            key = p.get("key", f"legacy-{i}")
+            self.records[key] = {"key": key, "name": p["name"], "songs": p["songs"]}
+        # replay the journal, stopping at a line that wasn't finished (if the app was closed while writing it)
+        self.changes = 0
+        try:
+            with open(self.journal_path, "r") as journal:
+                for line in journal:
+                    try:
+                        change = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    self.apply(change)
+                    self.changes += 1
+        except FileNotFoundError:
+            pass
+        if self.changes >= self.compact_after:
+            self.compact()
+        return list(self.records.values())
+
+
+    def changed_on_disk(self) -> bool:
+        """ Returns whether the playlists file was changed by something else since it was last read or written """
+        return file_stamp(self.path) != self.stamp
+
+
+    def apply(self, change: dict) -> None:
+        """ Apply a change from the journal to the records """
+        if change["op"] == "put":
+            self.records[change["key"]] = {"key": change["key"], "name": change["name"], "songs": change["songs"]}
+        elif change["op"] == "delete":
+            self.records.pop(change["key"], None)
+        return None
+
+
+    def append(self, change: dict) -> None:
+        """ Apply a change and add it to the end of the journal, compacting the journal if it is long enough """
+        self.apply(change)
+        with open(self.journal_path, "a") as journal:
+            journal.write(json.dumps(change)+"\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        self.changes += 1
+        if self.changes >= self.compact_after:
+            self.compact()
+        return None
+
+
+    def put(self, key: str, name: str, songs: list[dict]) -> None:
+        """
+        Arguments:
+        - key: (str) the key of the playlist
+        - name: (str) the name of the playlist
+        - songs: (list[dict]) the songs of the playlist, each as a dictionary with a name, path and artist
+
+        Saves a new or edited playlist
+        """
+        self.append({"op": "put", "key": key, "name": name, "songs": songs})
+        return None
+
+
+    def delete(self, key: str) -> None:
+        """ Removes the playlist with the key """
+        self.append({"op": "delete", "key": key})
+        return None
+
+
+    def replace_all(self, records: list[dict]) -> None:
+        """
+        Arguments:
+        - records: (list[dict]) every playlist, as dictionaries with a key, name and songs
+
+        Replaces every playlist at once (rewriting the file instead of journaling each one)
+        """
+        self.records = {r["key"]: r for r in records}
+        self.compact()
+        return None
+
+
+    def compact(self) -> None:
+        """ Rewrite the playlists file with every change applied, and empty the journal """
+        write_atomic(self.path, json.dumps(list(self.records.values())))
+        self.stamp = file_stamp(self.path)
+        # the changes are in the playlists file now, so if the app is closed before this, replaying them again is harmless
+        write_atomic(self.journal_path, "")
+        self.changes = 0
+        return None
+
+
+if __name__ == "__main__":
+    # compare the time to save one edit with the journal and by rewriting every playlist
+    # usage (from the src folder): python playlist_store.py [number of playlists] [songs per playlist]
+    import sys
+    import tempfile
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "playlists.json")
+        records = [{"key": str(i), "name": f"Playlist {i}", "songs": [{"name": f"Song {j}", "path": f"./Music/song_{j}.mp3", "artist": "Artist"} for j in range(size)]} for i in range(count)]
+        with open(path, "w") as file:
+            json.dump(records, file)
+        store = PlaylistStore(path, compact_after=10**9)
+        store.load()
+        edit = records[count//2]
+        start = time.perf_counter()
+        for _ in range(20):
+            store.put(edit["key"], edit["name"], edit["songs"])
+        journaled = (time.perf_counter()-start)/20
+        start = time.perf_counter()
+        for _ in range(20):
+            store.compact()
+        rewritten = (time.perf_counter()-start)/20
+        print(f"{count} playlists of {size} songs: journaled edit {journaled*1000:.2f} ms, full rewrite {rewritten*1000:.2f} ms")
+        # check the journal and the rewrite give the same playlists
+        store.put(edit["key"], "Renamed", edit["songs"][:10])
+        store.delete("0")
+        journal_view = PlaylistStore(path).load()
+        store.compact()
+        print("journal replay matches rewrite:", journal_view == PlaylistStore(path).load())
@@ -0,0 +1,84 @@
+"""
+This file holds the Renderer, which only redraws the parts of the screen that changed since the last frame.
+
+Every frame, each widget is watched with its rect and its state (a tuple of everything that affects how it looks).
+If the state is different from last frame, the old and new rects are marked as dirty.
+Only the dirty parts are then filled with the background, redrawn and pushed to the display, so a frame where nothing changed costs (almost) nothing.
+"""
+# imports
+import pygame
+
+import theme
+
+
+class Renderer:
+    def __init__(self, screen: pygame.Surface) -> None:
+        """
+        Arguments:
+        - screen: (pygame.Surface) the display surface [passed by reference]
+        """
+        self.screen = screen
+        self.states: dict[str, tuple[tuple, pygame.Rect]] = {} # the last state and rect of each widget
+        self.dirty: list[pygame.Rect] = []
+        self.full = True # redraw the whole screen on the first frame
+        return None
+
+
+    def watch(self, key: str, rect: pygame.Rect, state: tuple) -> None:
+        """
+        Arguments:
+        - key: (str) a name for the widget
+        - rect: (pygame.Rect) the area of the screen the widget draws on
+        - state: (tuple) everything that affects how the widget looks
+
+        Compare the widget's state to last frame, and mark its old and new rects as dirty if it changed
+        """
+        previous = self.states.get(key)
+        if previous is None or previous[0] != state or previous[1] != rect:
+            if previous:
+                self.mark(previous[1])
+            self.mark(rect)
+            self.states[key] = (state, rect.copy())
+        return None
+
+
+    def mark(self, rect: pygame.Rect) -> None:
+        """ Mark part of the screen as needing a redraw """
+        rect = rect.clip(self.screen.get_rect())
+        if rect.width > 0 and rect.height > 0:
+            self.dirty.append(rect)
+        return None
+
+
+    def is_dirty(self) -> bool:
+        """ Returns whether part of the screen was marked as needing a redraw this frame """
+        return self.full or bool(self.dirty)
+
+
+    def mark_all(self) -> None:
+        """ Mark the whole screen as needing a redraw (e.g. when the theme changes) """
+        self.full = True
+        return None
+
+
+    def render(self, draw) -> None:
+        """
+        Arguments:
+        - draw: (function) takes the screen and draws every widget on it in order
+
+        Redraw the dirty parts of the screen (if there are any) and update only those parts of the display
+        """
+        if self.full:
+            self.dirty = [self.screen.get_rect()]
+            self.full = False
+        if not self.dirty:
+            return None # nothing changed, so there's nothing to draw
+        # draw once, clipped to the area covering every dirty rect, then only push the dirty rects to the display
+        area = self.dirty[0].unionall(self.dirty[1:])
+        self.screen.set_clip(area)
+        self.screen.fill(theme.current.bg)
+        draw(self.screen)
+        self.screen.set_clip(None)
+        pygame.display.update(self.dirty)
+        self.dirty = []
+        return None
@@ -7,13 +7,12 @@ This file contains the controls tray: the lower tray on the default screen that
 
 all structured in the ControlsTray class
 
-It changes its colours and themes when prompted to in the load_theme function and utilises the module image_editor to generate images if it is unable to find the desired image.
+It changes its colours and themes when prompted to in the load_theme function, and its buttons draw their icons from the icon atlas of the current theme.
 """
 
 # imports
 import pygame
 
-import image_editor
 import theme
 from classes.button import ImageButton, TextButton
 from music_player import MusicPlayer
@@ -44,8 +43,8 @@ class ControlsTray:
         # these methods can also be accessed using self.player, however they have been assigned to make it easier to access within the class
         self.pause = player.pause
         self.stop = player.stop
-        self.next = player.next
-        self.prev = player.prev
+        self.next = player.next_async
+        self.prev = player.prev_async
         self.mute = player.mute
         self.skip10 = player.skip10
         self.rewind10 = player.rewind10
@@ -61,10 +60,25 @@ class ControlsTray:
         self.current_sound = pygame.Rect(
             self.sound_bar_pos, (0, self.bar_size[1]))
 
+        # how far the tray has been shifted in total
+        self.shifted = 0
+
         # these keep track of whether the mouse is hovering over the sound slider or not.
         self.hover = False
         self.click = False
 
+        # initialise the control buttons at their default positions
+        # the use of ImageButton is described in the file button.py, the images for the current theme come from the icon atlas
+        self.prev_button = ImageButton(self.prev, "prev", (self.pos[0]+1*self.spacing+12, self.pos[1]), self.size)
+        self.play_button = ImageButton(self.pause, "play", (self.pos[0]+2*self.spacing+12, self.pos[1]), self.size)
+        self.stop_button = ImageButton(self.stop, "stop", (self.pos[0]+3*self.spacing+12, self.pos[1]), self.size)
+        self.next_button = ImageButton(self.next, "next", (self.pos[0]+4*self.spacing+12, self.pos[1]), self.size)
+        self.sound_button = ImageButton(self.mute, "soundon", (self.pos[0]-4.5*self.spacing+12, self.pos[1]), self.size)
+        self.rewind10_button = TextButton(
+            self.rewind10, (self.pos[0]+0*self.spacing-4, self.pos[1]-3), (0, 0), "-10s", 2)
+        self.skip10_button = TextButton(
+            self.skip10, (self.pos[0]+5*self.spacing, self.pos[1]-3), (0, 0), "+10s", 2)
+
         # load the theme to initialise other variables
         self.load_theme()
         return None
@@ -72,12 +86,9 @@ class ControlsTray:
 
     def load_theme(self) -> None:
         """
-        This method reinitialises the control buttons:
+        This method loads the current theme:
         - loads the necessary colours for the sound slider
-        - tries to load the control buttons and position them at their previous positions
-        - if they haven't been intialised yet, it positions them at their default positions
-        - tries to load in different variations of the play/pause buttons and the sound buttons
-        - if those files with the variations are not found, it generates them
+        - resets the control buttons, which then draw the icons from the current theme's atlas (the play/pause and sound icons are picked in update)
         """
         # load the three colours of the background rectangle for the sound slider
         self.bar_norm_col = theme.current.norm_col
@@ -93,145 +104,8 @@ class ControlsTray:
         self.bar_colour = self.bar_norm_col
         self.done_colour = self.done_norm_col
 
-        try:
-            # try to position the new buttons where they previously were (this runs is the buttons are reinitialising, ie: a new theme has been loaded)
-            # the use of ImageButton is described in the file button.py
-            self.prev_button = ImageButton(self.prev, "prev.png", f"./Assets_PROG2/Icons/{theme.current_name}_prev.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_prev_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_prev_click.png", self.prev_button.pos, self.size)
-            self.play_button = ImageButton(self.pause, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", self.play_button.pos, self.size)
-            self.stop_button = ImageButton(self.stop, "stop.png", f"./Assets_PROG2/Icons/{theme.current_name}_stop.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_stop_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_stop_click.png", self.stop_button.pos, self.size)
-            self.next_button = ImageButton(self.next, "next.png", f"./Assets_PROG2/Icons/{theme.current_name}_next.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_next_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_next_click.png", self.next_button.pos, self.size)
-            self.sound_button = ImageButton(self.mute, "soundon.png", f"./Assets_PROG2/Icons/{theme.current_name}_soundon.png",
-                                            f"./Assets_PROG2/Icons/{theme.current_name}_soundon_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_soundon_click.png", self.sound_button.pos, self.size)
-            self.rewind10_button = TextButton(
-                self.rewind10, self.rewind10_button.pos, (0, 0), "-10s", 2)
-            self.skip10_button = TextButton(
-                self.skip10, self.skip10_button.pos, (0, 0), "+10s", 2)
-
-        except AttributeError:
-            # if the buttons weren't initialised, initialise them with the defaults values
-            self.prev_button = ImageButton(self.prev, "prev.png", f"./Assets_PROG2/Icons/{theme.current_name}_prev.png", f"./Assets_PROG2/Icons/{theme.current_name}_prev_hov.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_prev_click.png", (self.pos[0]+1*self.spacing+12, self.pos[1]), self.size)
-            self.play_button = ImageButton(self.pause, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (self.pos[0]+2*self.spacing+12, self.pos[1]), self.size)
-            self.stop_button = ImageButton(self.stop, "stop.png", f"./Assets_PROG2/Icons/{theme.current_name}_stop.png", f"./Assets_PROG2/Icons/{theme.current_name}_stop_hov.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_stop_click.png", (self.pos[0]+3*self.spacing+12, self.pos[1]), self.size)
-            self.next_button = ImageButton(self.next, "next.png", f"./Assets_PROG2/Icons/{theme.current_name}_next.png", f"./Assets_PROG2/Icons/{theme.current_name}_next_hov.png",
-                                           f"./Assets_PROG2/Icons/{theme.current_name}_next_click.png", (self.pos[0]+4*self.spacing+12, self.pos[1]), self.size)
-            self.sound_button = ImageButton(self.mute, "soundon.png", f"./Assets_PROG2/Icons/{theme.current_name}_soundon.png", f"./Assets_PROG2/Icons/{theme.current_name}_soundon_hov.png",
-                                            f"./Assets_PROG2/Icons/{theme.current_name}_soundon_click.png", (self.pos[0]-4.5*self.spacing+12, self.pos[1]), self.size)
-            self.rewind10_button = TextButton(
-                self.rewind10, (self.pos[0]+0*self.spacing-4, self.pos[1]-3), (0, 0), "-10s", 2)
-            self.skip10_button = TextButton(
-                self.skip10, (self.pos[0]+5*self.spacing, self.pos[1]-3), (0, 0), "+10s", 2)
-
-        # try loading the different variations (normal, hover, click) of the buttons based on the current theme
-        try:
-            # try loading the normal image
-            self.play_image = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current_name}_play.png")
-        except FileNotFoundError:
-            # if the file doesn't exist, make it
-            # the use of this method is described in the image_editor module, refer to it.
-            self.play_image = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_play.png", theme.current.norm_col, f"Assets_PROG2/Icons/{theme.current_name}_play.png")
-        try:
-            # try loading the hover image
-            self.play_image_hov = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current.hov_col}_play_hov.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.play_image_hov = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_play.png", theme.current.hov_col, f"Assets_PROG2/Icons/{theme.current_name}_play_hov.png")
-        try:
-            # try loading the click image
-            self.play_image_click = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current.click_col}_play_click.png")
-        except FileNotFoundError:
-            # make it if it doesn't exist
-            self.play_image_click = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_play.png", theme.current.click_col, f"Assets_PROG2/Icons/{theme.current_name}_play_click.png")
-        
-        # load variations (normal, hover, click) for the pause images
-        try:
-            # try load the normal image
-            self.pause_image = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current_name}_pause.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.pause_image = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_pause.png", theme.current.norm_col, f"Assets_PROG2/Icons/{theme.current_name}_pause.png")
-        try:
-            # try loading the hover image
-            self.pause_image_hov = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current_name}_pause_hov.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.pause_image_hov = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_pause.png", theme.current.hov_col, f"Assets_PROG2/Icons/{theme.current_name}_pause_hov.png")
-        try:
-            # try loading the click image
-            self.pause_image_click = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current_name}_pause_click.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.pause_image_click = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_pause.png", theme.current.click_col, f"Assets_PROG2/Icons/{theme.current_name}_pause_click.png")
-        
-        # now load the soundon and soundoff images
-        try:
-            # try loading the normal image
-            self.soundon_image = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current_name}_soundon.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.soundon_image = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_soundon.png", theme.current.norm_col, f"Assets_PROG2/Icons/{theme.current_name}_soundon.png")
-        try:
-            # try loading the hover image
-            self.soundon_image_hov = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current.hov_col}_soundon_hov.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.soundon_image_hov = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_soundon.png", theme.current.hov_col, f"Assets_PROG2/Icons/{theme.current_name}_soundon_hov.png")
-        try:
-            # try loading the click image
-            self.soundon_image_click = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current.click_col}_soundon_click.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.soundon_image_click = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_soundon.png", theme.current.click_col, f"Assets_PROG2/Icons/{theme.current_name}_soundon_click.png")
-        # soundoff images
-        try:
-            # try loading the normal image
-            self.soundoff_image = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current_name}_soundoff.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.soundoff_image = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_soundoff.png", theme.current.norm_col, f"Assets_PROG2/Icons/{theme.current_name}_soundoff.png")
-        try:
-            # try loading the hover image
-            self.soundoff_image_hov = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current.hov_col}_soundoff_hov.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.soundoff_image_hov = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_soundoff.png", theme.current.hov_col, f"Assets_PROG2/Icons/{theme.current_name}_soundoff_hov.png")
-        try:
-            # try loading the click image
-            self.soundoff_image_click = pygame.image.load(
-                f"Assets_PROG2/Icons/{theme.current.click_col}_soundoff_click.png")
-        except FileNotFoundError:
-            # generate it if it doesn't exist
-            self.soundoff_image_click = image_editor.change_colour(
-                "Assets_PROG2/Icons/default_soundoff.png", theme.current.click_col, f"Assets_PROG2/Icons/{theme.current_name}_soundoff_click.png")
-        
+        for button in self.get_buttons():
+            button.update_colors()
         return None
 
 
@@ -309,57 +183,72 @@ class ControlsTray:
         - m_down: a bool indicating whether the user is right clicking or not
 
         This method draws the screen elements of the controls tray:
-        - if check is enabled, checks for hover and click on the sound slider before updating the value of the sound slider
+        - if check is enabled, checks for hover and click on the sound slider and the buttons
         - updates the play/pause button and sound button based on whether the music player is paused/muted or not
         - draws the individual buttons and the sound slider
         """
         if check:
-            # check for hover/click if it is supposed to
-            self.check_hover(mouse, m_down)
-            self.check_click(mouse, m_down)
-        
+            self.handle_mouse(mouse, m_down)
+        self.update()
+        self.render(screen)
+        return None
+    
+
+    def handle_mouse(self, mouse: tuple[int, int], m_down: bool) -> None:
+        """
+        Arguments:
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - m_down: a bool indicating whether the user is right clicking or not
+
+        Checks for hover/click on the sound slider and the buttons (called by the input dispatcher when the mouse moves or is pressed/lifted)
+        """
+        self.check_hover(mouse, m_down)
+        self.check_click(mouse, m_down)
+        for button in self.get_buttons():
+            button.handle_mouse(mouse, m_down)
+        return None
+    
+
+    def update(self) -> None:
+        """ Updates the sound slider and the play/pause and sound buttons to match the player, without drawing anything """
         # update the width of the slider's fg rectange relative to the bg based on the current volume
         self.current_sound.width = int(
             self.player.volume*self.total_sound.width)
 
-        if self.player.paused:
-            # use the play images (prompting the user to play) if the music is paused
-            self.play_button.norm_img = self.play_image
-            self.play_button.hov_img = self.play_image_hov
-            self.play_button.click_img = self.play_image_click
-        else:
-            # else use the pause images if the music is playing
-            self.play_button.norm_img = self.pause_image
-            self.play_button.hov_img = self.pause_image_hov
-            self.play_button.click_img = self.pause_image_click
-
-        if self.player.muted:
-            # indicate the sound is muted if it is
-            self.sound_button.norm_img = self.soundoff_image
-            self.sound_button.hov_img = self.soundoff_image_hov
-            self.sound_button.click_img = self.soundoff_image_click
-        else:
-            # else indicate the sound is on
-            self.sound_button.norm_img = self.soundon_image
-            self.sound_button.hov_img = self.soundon_image_hov
-            self.sound_button.click_img = self.soundon_image_click
+        # use the play icon (prompting the user to play) if the music is paused, else the pause icon
+        self.play_button.icon = "play" if self.player.paused else "pause"
+        # indicate whether the sound is muted or not
+        self.sound_button.icon = "soundoff" if self.player.muted else "soundon"
+        return None
+    
 
+    def render(self, screen: pygame.Surface) -> None:
+        """ Draws the sound slider and the buttons on screen """
         # draw the sound slider rectangles
         pygame.draw.rect(screen, self.bar_colour, self.total_sound)
         pygame.draw.rect(screen, self.done_colour, self.current_sound)
 
         # draw the rest of the control elements
-        self.play_button.draw(screen, True, mouse, m_down)
-        self.stop_button.draw(screen, check, mouse, m_down)
-        self.next_button.draw(screen, check, mouse, m_down)
-        self.prev_button.draw(screen, check, mouse, m_down)
-        self.skip10_button.draw(screen, check, mouse, m_down)
-        self.rewind10_button.draw(screen, check, mouse, m_down)
-        self.sound_button.draw(screen, check, mouse, m_down)
-
+        for button in self.get_buttons():
+            button.render(screen)
         return None
     
 
+    def get_buttons(self) -> list:
+        """ Returns all the buttons in the tray (the play button first) """
+        return [self.play_button, self.stop_button, self.next_button, self.prev_button, self.skip10_button, self.rewind10_button, self.sound_button]
+    
+
+    def get_rect(self) -> pygame.Rect:
+        """ Returns the rect covering the sound slider and all the buttons """
+        return self.total_sound.unionall([button.get_rect() for button in self.get_buttons()])
+    
+
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the tray looks, so the renderer can tell when it needs redrawing """
+        return (self.bar_colour, self.done_colour, self.total_sound.topleft, self.current_sound.width, tuple(button.get_state() for button in self.get_buttons()))
+    
+
     def shift(self, val: float) -> None:
         """
         Arguments:
@@ -378,8 +267,10 @@ class ControlsTray:
         self.rewind10_button.pos = (self.rewind10_button.pos[0]+val/2, self.skip10_button.pos[1])
 
         # shift the sound slider and sound icon by 7/10 of the value to keep them in sight (a work around for another feature to exist)
-        self.sound_button.pos = (self.sound_button.pos[0]+7*val/10, self.sound_button.pos[1])
-        self.sound_bar_pos = (self.sound_bar_pos[0]+7*val/10, self.sound_bar_pos[1])
+        # they are placed from where they started, so they don't drift by a pixel however the shifts add up
+        self.shifted += val
+        self.sound_button.pos = (self.pos[0]-4.5*self.spacing+12+7*self.shifted/10, self.sound_button.pos[1])
+        self.sound_bar_pos = (self.pos[0]-4.5*self.spacing+45+7*self.shifted/10, self.sound_bar_pos[1])
         self.total_sound = pygame.Rect(self.sound_bar_pos, self.bar_size)
         self.current_sound = pygame.Rect(self.sound_bar_pos, (0, self.bar_size[1]))
         
@@ -8,29 +8,26 @@ This file holds classes essential for the playlist dialog, which allows the user
 # imports
 import pygame
 from copy import deepcopy
-from tkinter import Tk, filedialog
 from math import ceil
 
-# the following two lines are necessary to allow tkinter's filedialog to work
-root = Tk()
-root.withdraw()
-
 # more imports
 import theme
+import assets
+import text_cache
+import compositor
+import services
 from classes.button import TextButton, ImageButton
 from classes.playlist import Playlist, PlaylistManager, Song
 from classes.input_field import InputField
 from classes.sidebar import Sidebar
 from music_player import MusicPlayer
+from library import FORMATS
 from screen_elements.playlist_view import create_pages
 
-# intialise pygame to use the following fonts
-pygame.init()
-
 # declare the fonts to be used in the classes
-title_font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Bold.ttf", 40)
-subtitle_font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Medium.ttf", 24)
-small_font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Thin.ttf", 16)
+title_font = assets.get_font(assets.BOLD, 40)
+subtitle_font = assets.get_font(assets.MEDIUM, 24)
+small_font = assets.get_font(assets.THIN, 16)
 
 class SongCard:
     """
@@ -81,8 +78,8 @@ class SongCard:
         self.artist_field.text = song_artist
 
         # initialise the two buttons that delete or confirm changes on the song card
-        self.delete_icon = ImageButton(lambda: self.remove(self.song_id), "cross.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross_click.png", (self.pos[0]+self.size[0]-20, self.pos[1]+5), (15, 15))
-        self.confirm_icon = ImageButton(self.confirm, "tick.png", f"./Assets_PROG2/Icons/{theme.current_name}_tick.png", f"./Assets_PROG2/Icons/{theme.current_name}_tick_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_tick_click.png", (self.pos[0]+self.size[0]-45, self.pos[1]+5), (15, 15))
+        self.delete_icon = ImageButton(lambda: self.remove(self.song_id), "cross", (self.pos[0]+self.size[0]-20, self.pos[1]+5), (15, 15))
+        self.confirm_icon = ImageButton(self.confirm, "tick", (self.pos[0]+self.size[0]-45, self.pos[1]+5), (15, 15))
         return None
     
 
@@ -148,13 +145,14 @@ class SongCard:
         
     def edit_path(self) -> str:
         """
-        Stops editing all fields and uses Tkinter's file dialog to open an mp3 file to record it as a path
+        Stops editing all fields and uses Tkinter's file dialog to open a song file to record it as a path
         """
         # stop all other edits
         self.stop_editing_name()
         self.stop_editing_artist()
         # obtain the file path from the user
-        path = filedialog.askopenfilename(title="Select your song", filetypes=[("Mp3 files", "*.mp3")])
+        # tkinter (and the hidden window its file dialog needs) is only loaded the first time a song is picked
+        path = services.file_dialog.get().askopenfilename(title="Select your song", filetypes=[("Audio files", " ".join("*"+f for f in FORMATS)), ("Mp3 files", "*.mp3")])
 
         # if the user put a path, update the path and update the changes in the playlist dialog
         if path:
@@ -165,14 +163,66 @@ class SongCard:
         return path # required to work with the inherited class
     
 
-    def draw(self, screen, check, mouse, r_click) -> None:
+    def handle_mouse(self, mouse: tuple[int, int], m_down: bool) -> None:
         """
         Arguments:
-        - screen: the pygame surface to draw the elements on [passed by reference]
-        - check: a boolean indicating whether the elements should check for hover and clicks or not
         - mouse: a tuple with the x, y coords of the mouse on the screen.
         - m_down: a bool indicating whether the user is right clicking or not
 
+        This method checks for hover/click on:
+        - the delete_icon if it exists
+        - the confirm icon if modifications have been made
+        - the name_field/name_button depending on which one is active
+        - the artist_field/artist_button depending on which one is active
+        - the path button
+        """
+        # the delete icon doesn't exist in the inherited class, which is why this measure is necessary
+        if self.delete_icon:
+            self.delete_icon.handle_mouse(mouse, m_down)
+        # the confirm icon should only be usable if there are modifications in the song card to save
+        if self.modified:
+            self.confirm_icon.handle_mouse(mouse, m_down)
+
+        # check the name field or the name button depending on which one is shown
+        if self.editing_name:
+            self.name_field.handle_mouse(mouse, m_down)
+        else:
+            self.name_button.handle_mouse(mouse, m_down)
+        
+        # check the artist field or the artist button depending on which one is shown
+        if self.editing_artist:
+            self.artist_field.handle_mouse(mouse, m_down)
+        else:
+            self.artist_button.handle_mouse(mouse, m_down)
+        
+        # the path button is always shown
+        self.path_button.handle_mouse(mouse, m_down)
+        return None
+    
+
+    def update(self) -> None:
+        """ Blink the cursor of the field being edited """
+        if self.editing_name:
+            self.name_field.update()
+        elif self.editing_artist:
+            self.artist_field.update()
+        return None
+    
+
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the song card looks, so the renderer can tell when it needs redrawing """
+        name = self.name_field.get_state() if self.editing_name else self.name_button.get_state()
+        artist = self.artist_field.get_state() if self.editing_artist else self.artist_button.get_state()
+        delete = self.delete_icon.get_state() if self.delete_icon else None
+        confirm = self.confirm_icon.get_state() if self.modified else None
+        return (self.pos, name, artist, self.path_button.get_state(), delete, confirm)
+    
+
+    def render(self, screen: pygame.Surface) -> None:
+        """
+        Arguments:
+        - screen: the pygame surface to draw the elements on [passed by reference]
+
         This method:
         - draws the delete_icon if it exists
         - draws the confirm icon if modifications have been made
@@ -183,38 +233,32 @@ class SongCard:
         if self.delete_icon:
             if self.delete_icon.hover:
                 # if the mouse is hovering over the delete icon, draw a translucent surface indicating which SongCard is subject to being deleted
-                a = pygame.Surface(self.size)
-                a.fill(theme.current.hov_col)
-                a.set_alpha(100)
-                screen.blit(a, (self.pos[0], self.pos[1]+3))
+                screen.blit(compositor.get_overlay(self.size, theme.current.hov_col, 100), (self.pos[0], self.pos[1]+3))
             # draw the delete icon
-            self.delete_icon.draw(screen, check, mouse, r_click)
+            self.delete_icon.render(screen)
         
         # if there are modifications in the SongCard, draw it (the icon should only show up if there are modifications in the song card to save)
         if self.modified:
             if self.confirm_icon.hover:
                 # if the mouse is hovering over the confirm icon, draw a translucent surface indicating which SongCard is subject to being confirmed
-                a = pygame.Surface(self.size)
-                a.fill(theme.current.hov_col)
-                a.set_alpha(100)
-                screen.blit(a, (self.pos[0], self.pos[1]+3))
+                screen.blit(compositor.get_overlay(self.size, theme.current.hov_col, 100), (self.pos[0], self.pos[1]+3))
             # draw the confirm icon
-            self.confirm_icon.draw(screen, check, mouse, r_click)
+            self.confirm_icon.render(screen)
 
         # draw the name field or the name button depending on what is supposed to be drawn
         if self.editing_name:
-            self.name_field.draw(screen, check, mouse, r_click)
+            self.name_field.render(screen)
         else:
-            self.name_button.draw(screen, check, mouse, r_click)
+            self.name_button.render(screen)
         
         # draw the artist field or the artist button depending on what is supposed to be drawn
         if self.editing_artist:
-            self.artist_field.draw(screen, check, mouse, r_click)
+            self.artist_field.render(screen)
         else:
-            self.artist_button.draw(screen, check, mouse, r_click)
+            self.artist_button.render(screen)
         
         # always draw the path button
-        self.path_button.draw(screen, check, mouse, r_click)
+        self.path_button.render(screen)
         return None
         
 
@@ -251,12 +295,21 @@ class NewSongCard(SongCard):
         return None
     
     
-    def draw(self, screen, check, mouse, r_click) -> None:
+    def handle_mouse(self, mouse: tuple[int, int], m_down: bool) -> None:
         """
-        Execute the normal draw method but always set modified to false, since it won't be necessary for a NewSongCard
+        Execute the normal handle_mouse method but always set modified to false, since it won't be necessary for a NewSongCard
         """
         self.modified = False
-        super().draw(screen, check, mouse, r_click)
+        super().handle_mouse(mouse, m_down)
+        return None
+    
+    
+    def render(self, screen: pygame.Surface) -> None:
+        """
+        Execute the normal render method but always set modified to false, since it won't be necessary for a NewSongCard
+        """
+        self.modified = False
+        super().render(screen)
         return None
 
 
@@ -276,7 +329,7 @@ class PlaylistDialog:
         self.player = music_player
         
         # initialise the input field and prompt for the playlist's name
-        self.name_text = subtitle_font.render("Playlist Name: ", True, theme.current.norm_col)
+        self.name_text = text_cache.render(subtitle_font, "Playlist Name: ", theme.current.norm_col)
         self.name_field = InputField((420, 100))
 
         # intialise two lists, songs (to hold actual song objects) and song_cards (to hold the song cards including the NewSongCard)
@@ -291,11 +344,11 @@ class PlaylistDialog:
         self.show_pages: bool = False
 
         # initalise the next page and previous page images and default them to an inactive colour, intialise the page text
-        self.next_page_button = ImageButton(self.next_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (535, 250+23*self.songspp), (10, 10))
-        self.prev_page_button = ImageButton(self.prev_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (450, 250+23*self.songspp), (10, 10), flip=True)
-        self.prev_page_button.image = self.prev_page_button.hov_img
-        self.next_page_button.image = self.next_page_button.hov_img
-        self.page_text = small_font.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+        self.next_page_button = ImageButton(self.next_page, "play", (535, 250+23*self.songspp), (10, 10))
+        self.prev_page_button = ImageButton(self.prev_page, "play", (450, 250+23*self.songspp), (10, 10), flip=True)
+        self.prev_page_button.state = "hov"
+        self.next_page_button.state = "hov"
+        self.page_text = text_cache.render(small_font, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
 
         # more playlist stuff to check if it's open and whether it is being edited or is it a new playlist
         self.is_open: bool = False
@@ -303,7 +356,7 @@ class PlaylistDialog:
 
         # intialise the save, close and delete buttons
         self.submit_button = TextButton(self.submit, (60, 100), (0, 0), "Save", 2)
-        self.close_button = ImageButton(self.close, "cross.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross_click.png", (1045, 10), (25, 25))
+        self.close_button = ImageButton(self.close, "cross", (1045, 10), (25, 25))
         self.delete_button = TextButton(self.delete_playlist, (750, 100), (0, 0), "Delete Playlist")
 
         # refresh songs to update the pages to be displayed
@@ -320,7 +373,8 @@ class PlaylistDialog:
         
         if self.playlist_id:
             # if it is a playlist that was being edited, delete it by removing it from the Playlist Manager (go the classes.playlist for more info)
-            PlaylistManager.playlists.pop(self.playlist_id)
+            # and from the saved playlists, so it is gone the next time they are loaded (more on that in music_player)
+            self.player.remove_playlist(PlaylistManager.playlists.pop(self.playlist_id))
             self.refresh_global_songs(PlaylistManager.sample.id) # update the global playlists to reflect the change
         
         # clear the songs and refresh the view ready for the next time it will be edited
@@ -328,7 +382,6 @@ class PlaylistDialog:
         self.refresh_songs(self.songs)
         self.name_field.text = ""
         self.playlist_id = None
-        self.player.save_playlists() # save the playlists in playlists.json to reflect the change everytime the playlists are loaded (more on that in music_player)
         self.close()
         return None
     
@@ -365,7 +418,7 @@ class PlaylistDialog:
         """
         if self.page_num < len(self.pages):
             self.page_num += 1
-            self.page_text = small_font.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+            self.page_text = text_cache.render(small_font, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
         return None
     
     
@@ -375,7 +428,7 @@ class PlaylistDialog:
         """
         if self.page_num > 0:
             self.page_num -= 1
-            self.page_text = small_font.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+            self.page_text = text_cache.render(small_font, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
         return None
     
 
@@ -384,17 +437,17 @@ class PlaylistDialog:
         Reinitialise the necessary buttons and images and refresh the songs to load the new theme
         """
 
-        self.name_text = subtitle_font.render("Playlist Name: ", True, theme.current.norm_col)
+        self.name_text = text_cache.render(subtitle_font, "Playlist Name: ", theme.current.norm_col)
         
         # buttons
         self.submit_button = TextButton(self.submit, (60, 100), (0, 0), "Save", 2)
         self.delete_button = TextButton(self.delete_playlist, (750, 100), (0, 0), "Delete Playlist")
-        self.close_button = ImageButton(self.close, "cross.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_cross_click.png", self.close_button.pos, self.close_button.size)
+        self.close_button.update_colors()
         # page buttons
-        self.next_page_button = ImageButton(self.next_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (535, 250+23*self.songspp), (10, 10))
-        self.prev_page_button = ImageButton(self.prev_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", (450, 250+23*self.songspp), (10, 10), flip=True)
-        self.prev_page_button.image = self.prev_page_button.hov_img
-        self.next_page_button.image = self.next_page_button.hov_img
+        self.next_page_button.update_colors()
+        self.prev_page_button.update_colors()
+        self.prev_page_button.state = "hov"
+        self.next_page_button.state = "hov"
         # refresh
         self.refresh_songs(self.songs)
         return None
@@ -445,12 +498,12 @@ class PlaylistDialog:
         self.pages = create_pages(self.song_cards, self.songspp)
         
         # update the page stuff according to the pages generated
-        self.page_text = small_font.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
-        self.prev_page_button.image = self.prev_page_button.hov_img
-        self.next_page_button.image = self.next_page_button.hov_img
+        self.page_text = text_cache.render(small_font, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
+        self.prev_page_button.state = "hov"
+        self.next_page_button.state = "hov"
         self.show_pages = len(self.pages)>1
         self.page_num = len(self.pages)-1
-        self.page_text = small_font.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+        self.page_text = text_cache.render(small_font, f"Page {self.page_num+1}/{len(self.pages)}", theme.current.norm_col)
 
         return None
     
@@ -495,7 +548,7 @@ class PlaylistDialog:
     def edit_playlist(self, id: int) -> None:
         """
         Arguments:
-        - id: (int) the id of the playlist to edit
+        - id: (str) the id of the playlist to edit
 
         Load a pre-existing playlist to edit it
         """
@@ -526,43 +579,32 @@ class PlaylistDialog:
             self.pl_bar.add_option((p.name[:13]+"..." if len(p.name)>16 else p.name, lambda: self.pl_option_func(p.id)))
             self.playlist_id = p.id
         
-        # finally, save the playlists and refresh the global songs before closing the dialog
-        self.player.save_playlists()
+        # finally, save the playlist and refresh the global songs before closing the dialog
+        self.player.save_playlist(PlaylistManager.playlists[self.playlist_id])
         self.playlist_id = None
         self.refresh_global_songs()
         self.close()
         return None
     
 
-    def draw(self, screen: pygame.Surface, events: list[pygame.event.Event], shift, mouse: tuple[int, int], m_down: bool) -> None:
+    def handle_mouse(self, mouse: tuple[int, int], m_down: bool) -> None:
         """
         Arguments:
-        - screen (pygame.Surface) the surface to draw on
-        - events (pygame.event.Event) a list of events that happened in the past frame
         - mouse (tuple[int, int]) x, y coords of the mouse
         - m_down (bool) whether the right mouse button has been clicked or not
 
-        This method creates a translucent surface, and draws the dialog elements, updating them as necessary
+        This method checks the dialog elements for hover/click (called by the input dispatcher when the mouse moves or is pressed/lifted while the dialog is open)
         """
-        # create a translucent surface over the screen
-        a = pygame.Surface(screen.get_size())
-        a.fill((theme.current.sidebar))
-        a.set_alpha(220)
-        screen.blit(a, (0, 0))
-
-        # draw the name field and prompt
-        screen.blit(self.name_text, (250, 100))
-        self.name_field.draw(screen, True, mouse, m_down)
-
-        # draw the submit and close buttons
-        self.submit_button.draw(screen, True, mouse, m_down)
-        self.close_button.draw(screen, True, mouse, m_down)
-        # if the playlist is being edited, draw the delete button
+        # check the name field, the submit and close buttons
+        self.name_field.handle_mouse(mouse, m_down)
+        self.submit_button.handle_mouse(mouse, m_down)
+        self.close_button.handle_mouse(mouse, m_down)
+        # if the playlist is being edited, check the delete button
         if self.playlist_id:
-            self.delete_button.draw(screen, True, mouse, m_down)
+            self.delete_button.handle_mouse(mouse, m_down)
 
-        # if the user has clicked the right mouse button, disable all input fields on the current page (and then draw them regardless)
-        # drawing them after disabling all will allow the user to keep active only the field they click on
+        # if the user has clicked the right mouse button, disable all input fields on the current page (and then check them regardless)
+        # checking them after disabling all will allow the user to keep active only the field they click on
         if m_down:
             self.name_field.is_active = False
             for s in self.pages[self.page_num]:
@@ -570,35 +612,83 @@ class PlaylistDialog:
                     s.stop_editing_name()
                 if s.editing_artist:
                     s.stop_editing_artist()
-                s.draw(screen, True, mouse, m_down)
-        else:
-            for s in self.pages[self.page_num]:
-                s.draw(screen, True, mouse, m_down)
+        for s in self.pages[self.page_num]:
+            s.handle_mouse(mouse, m_down)
         
-        # if there is more than one page, then draw the page navigator underneath the current page songs
+        # if there is more than one page, check the page navigator
         if self.show_pages:
             # allow the next page button to only be active if there is a page to come
-            check = True
-            if self.page_num == len(self.pages)-1:
-                check = False
-            self.next_page_button.draw(screen, check, mouse, m_down)
-            # allow the previous page button to only be active if there is a page to go bcak to
-            check = True
-            if self.page_num == 0:
-                check = False
-            self.prev_page_button.draw(screen, check, mouse, m_down)
+            self.next_page_button.update(self.page_num != len(self.pages)-1, mouse, m_down)
+            # allow the previous page button to only be active if there is a page to go back to
+            self.prev_page_button.update(self.page_num != 0, mouse, m_down)
+        return None
+    
+
+    def handle_key(self, event: pygame.event.Event, shift: bool) -> bool:
+        """
+        Arguments:
+        - event (pygame.event.Event) a key press from the main loop
+        - shift (bool) whether the shift key is held down
+
+        Give the key press to the field being edited. Returns True, as no shortcuts work while the dialog is open
+        """
+        if self.name_field.is_active:
+            self.name_field.update_text(event, shift)
+        
+        for s in self.pages[self.page_num]:
+            if s.editing_name:
+                s.name_field.update_text(event, shift)
+            elif s.editing_artist:
+                s.artist_field.update_text(event, shift)
+        return True
+    
+
+    def update(self) -> None:
+        """ Blink the cursors of the fields being edited """
+        self.name_field.update()
+        for s in self.pages[self.page_num]:
+            s.update()
+        return None
+    
+
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the dialog looks, so the renderer can tell when it needs redrawing """
+        buttons = (self.submit_button.get_state(), self.close_button.get_state(), self.delete_button.get_state() if self.playlist_id else None)
+        pages = (self.next_page_button.get_state(), self.prev_page_button.get_state(), id(self.page_text)) if self.show_pages else None
+        return (True, id(self.name_text), self.name_field.get_state(), buttons, self.page_num, tuple(s.get_state() for s in self.pages[self.page_num]), pages)
+    
+
+    def render_overlay(self, screen: pygame.Surface) -> None:
+        """ Draw the translucent layer that covers the screen under the dialog (made once and kept by the compositor) """
+        screen.blit(compositor.get_overlay(screen.get_size(), theme.current.sidebar, 220), (0, 0))
+        return None
+    
+
+    def render(self, screen: pygame.Surface) -> None:
+        """
+        Arguments:
+        - screen (pygame.Surface) the surface to draw on
+
+        This method draws the dialog elements (over the overlay, see render_overlay)
+        """
+        # draw the name field and prompt
+        screen.blit(self.name_text, (250, 100))
+        self.name_field.render(screen)
+
+        # draw the submit and close buttons
+        self.submit_button.render(screen)
+        self.close_button.render(screen)
+        # if the playlist is being edited, draw the delete button
+        if self.playlist_id:
+            self.delete_button.render(screen)
+
+        for s in self.pages[self.page_num]:
+            s.render(screen)
+        
+        # if there is more than one page, then draw the page navigator underneath the current page songs
+        if self.show_pages:
+            self.next_page_button.render(screen)
+            self.prev_page_button.render(screen)
             # finally, draw the page text to show what page the user currently is on
             screen.blit(self.page_text, (465, 247+23*self.songspp))
-        
-        # to update the relevant fields, loop through all events and give the KEYDOWN updates to the relevant fields (can be optimised a little)
-        for e in events:
-            if e.type == pygame.KEYDOWN:
-                if self.name_field.is_active:
-                    self.name_field.update_text(e, shift)
-                
-                for s in self.pages[self.page_num]:
-                    if s.editing_name:
-                        s.name_field.update_text(e, shift)
-                    elif s.editing_artist:
-                        s.artist_field.update_text(e, shift)
-        return None
\ No newline at end of file
+        return None
@@ -8,22 +8,24 @@ import pygame
 import math
 
 import theme
+import assets
+import text_cache
+from tween import Tween
 from music_player import MusicPlayer
 from classes.playlist import Playlist
 from classes.button import ImageButton
 
-# initialise pygame and create some fonts
-pygame.init()
-title = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Bold.ttf", 40)
-subtitle = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Medium.ttf", 30)
-small = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Thin.ttf", 20)
+# the fonts of the title and the song tiles
+title = assets.get_font(assets.BOLD, 40)
+subtitle = assets.get_font(assets.MEDIUM, 30)
+small = assets.get_font(assets.THIN, 20)
 
 
 class SongTile:
     """
     A class to blueprint each SongTile in the PlaylistView, containing the title and the artist
     """
-    def __init__(self, pos: tuple[float, float], title: str = "Hello", artist: str = "World", on_click = None, height: int = 60, length: int = 400, song_id: int = 0) -> None:
+    def __init__(self, pos: tuple[float, float], title: str = "Hello", artist: str = "World", on_click = None, height: int = 60, length: int = 400, song_id: int = 0, path: str = "", get_info = None) -> None:
         """
         Arguments:
         - pos: (tuple[float, float]) the position of the SongTile
@@ -33,10 +35,15 @@ class SongTile:
         - height: (int) the height of the song tile
         - length: (int) the length of the song tile
         - song_id: (int) the position of the song relative to the playlist
+        - path: (str) the path to the song, used to show its duration
+        - get_info: (function) returns the cached TrackInfo of a path (usually MusicPlayer.metadata.get)
         """
         # initialise the song info to make it available within the class
         self.title = title
         self.artist = artist
+        self.path = path
+        self.get_info = get_info
+        self.duration: str | None = None # worked out the first time the tile is drawn, so only visible tiles probe their songs
 
         # initialise more info to make it available to the class
         self.on_click = on_click
@@ -61,8 +68,16 @@ class SongTile:
         a = pygame.Surface(self.size)
         a.fill(theme.current.bg)
         # renderthe artist and title on the surface
-        a.blit(subtitle.render(self.title, True, self.colour), (5, 0))
-        a.blit(small.render(self.artist, True, self.colour), (5, 35))
+        a.blit(text_cache.render(subtitle, self.title, self.colour), (5, 0))
+        a.blit(text_cache.render(small, self.artist, self.colour), (5, 35))
+        # render the duration on the right, looking it up in the metadata cache if it hasn't been done yet
+        if self.duration is None:
+            info = self.get_info(self.path) if self.get_info and self.path else None
+            seconds = info.length//1000 if info else 0
+            self.duration = f"{seconds//60}:{'0' if seconds%60 < 10 else ''}{seconds%60}" if seconds else ""
+        if self.duration:
+            duration = text_cache.render(small, self.duration, self.colour)
+            a.blit(duration, (self.size[0]-duration.get_width()-5, 35))
         # create a divider at the bottom
         pygame.draw.line(a, theme.current.norm_col, (5, self.size[1]-2), (self.size[0]-5, self.size[1]-2))
         return a
@@ -147,9 +162,18 @@ def create_pages(song_list, songspp: int) -> list:
     return pages
 
 
+# how many pixels the playlist view scrolls per step of the mouse wheel
+SCROLL_STEP = 40
+# how long scrolling to a new target takes (seconds)
+SCROLL_TIME = 0.25
+# how many tiles are kept above and below the visible ones
+OVERSCAN = 2
+
+
 class PlaylistView:
     """
-    A class to structure the songs in the current playlist
+    A class to structure the songs in the current playlist.
+    Only the tiles in view (plus a few above and below) exist at any time, so opening a playlist takes as long for 10 songs as for 100,000
     """
     def __init__(self, pos: tuple[int, int], playlist: Playlist, player: MusicPlayer, length: int = 400) -> None:
         """
@@ -163,21 +187,27 @@ class PlaylistView:
         self.player = player
         self.length = length
         self.pos = pos
-        self.title = title.render(playlist.name, True, theme.current.norm_col)
-        self.songs: list[SongTile] = []
+        self.title = text_cache.render(title, playlist.name, theme.current.norm_col)
+        self.tiles: dict[int, SongTile] = {} # the tiles that exist right now, by their song id
+        self.tile_height = 60
 
-        # initialise page stuff
-        self.pages: list[list[SongTile]] = []
+        # scroll is how far down the list the view is (in pixels), it moves smoothly towards target
+        self.scroll: float = 0
+        self.target: float = 0
+        self.tween: Tween | None = None # moves scroll while it is scrolling
+
+        # initialise page stuff (a page is a full view of songs)
         self.songspp = 5 # songs per page
+        self.page_count = 0
         self.page_num = 0
-        self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+        self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{self.page_count}", theme.current.norm_col)
         self.show_pages: bool = False
 
         # page navigation buttons
-        self.next_page_button = ImageButton(self.next_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", ((self.pos[0]+self.length)/2+45, self.pos[1]+120+60*self.songspp), (10, 10))
-        self.prev_page_button = ImageButton(self.prev_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", ((self.pos[0]+self.length)/2-55, self.pos[1]+120+60*self.songspp), (10, 10), flip=True)
-        self.prev_page_button.image = self.prev_page_button.hov_img
-        self.next_page_button.image = self.next_page_button.hov_img
+        self.next_page_button = ImageButton(self.next_page, "play", ((self.pos[0]+self.length)/2+45, self.pos[1]+120+60*self.songspp), (10, 10))
+        self.prev_page_button = ImageButton(self.prev_page, "play", ((self.pos[0]+self.length)/2-55, self.pos[1]+120+60*self.songspp), (10, 10), flip=True)
+        self.prev_page_button.state = "hov"
+        self.next_page_button.state = "hov"
         
         # load the playlist
         self.load_playlist()
@@ -188,37 +218,68 @@ class PlaylistView:
         """
         Reinitialise values/update their colours to match the theme
         """
-        # reinitialise page stuff
-        self.next_page_button = ImageButton(self.next_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", ((self.pos[0]+self.length)/2+55, self.pos[1]+120+60*self.songspp), (10, 10))
-        self.prev_page_button = ImageButton(self.prev_page, "play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_hov.png", f"./Assets_PROG2/Icons/{theme.current_name}_play_click.png", ((self.pos[0]+self.length)/2-55, self.pos[1]+120+60*self.songspp), (10, 10), flip=True)
-        self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+        # reset page stuff
+        self.next_page_button.update_colors()
+        self.prev_page_button.update_colors()
+        self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{self.page_count}", theme.current.norm_col)
         # update the title and song tiles
-        self.title = title.render(self.player.current_playlist.name, True, theme.current.norm_col)
-        for p in self.pages:
-            for tile in p:
-                tile.update_colours()
+        self.title = text_cache.render(title, self.player.current_playlist.name, theme.current.norm_col)
+        for tile in self.tiles.values():
+            tile.update_colours()
         return None
     
 
     def load_playlist(self) -> None:
         """
-        Load the current playlist from the MusicPlayer
+        Load the current playlist from the MusicPlayer (the tiles are made as they scroll into view)
         """
         # change the title
-        self.title = title.render(self.player.current_playlist.name, True, theme.current.norm_col)
-        # clear and add the new songs
-        self.songs.clear()
-        for i, song in enumerate(self.player.current_playlist.songs):
-            self.songs.append(SongTile((self.pos[0], self.pos[1]+50+60*i), song.name, artist=song.artist, on_click=self.player.play, length=self.length, song_id=i))
+        self.title = text_cache.render(title, self.player.current_playlist.name, theme.current.norm_col)
+        # clear the old tiles and go back to the top
+        self.tiles.clear()
+        self.scroll, self.target = 0, 0
+        self.tween = None
         
-        # clear and initalise pages
-        self.pages.clear()
-        self.pages = create_pages(self.songs, self.songspp)
+        # initalise pages
+        self.page_count = math.ceil(len(self.player.current_playlist.songs)/self.songspp)
         self.page_num = 0
-        self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
-        self.prev_page_button.image = self.prev_page_button.hov_img
-        self.next_page_button.image = self.next_page_button.hov_img
-        self.show_pages = len(self.pages)>1 # only show pages if there's more than one
+        self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{self.page_count}", theme.current.norm_col)
+        self.prev_page_button.state = "hov"
+        self.next_page_button.state = "hov"
+        self.show_pages = self.page_count>1 # only show pages if there's more than one
+        return None
+    
+
+    def get_view(self) -> pygame.Rect:
+        """ Returns the part of the screen the song tiles are shown in """
+        return pygame.Rect(self.pos[0], self.pos[1]+100, self.length, self.tile_height*self.songspp)
+    
+
+    def scroll_to(self, target: float) -> None:
+        """
+        Arguments:
+        - target: (float) how far down the list to scroll to (in pixels), kept within the list
+
+        Start scrolling smoothly towards target
+        """
+        bottom = len(self.player.current_playlist.songs)*self.tile_height - self.tile_height*self.songspp
+        target = max(0, min(target, bottom))
+        if target != self.target:
+            # carry on from where the scrolling has got to, so changing the target part of the way there doesn't jump
+            self.tween = Tween(self.tween.get() if self.tween else self.scroll, target, SCROLL_TIME)
+            self.target = target
+        return None
+    
+
+    def scroll_by(self, steps: float) -> None:
+        """ Scroll by a number of mouse wheel steps (positive is down) """
+        self.scroll_to(self.target+steps*SCROLL_STEP)
+        return None
+    
+
+    def jump_to_current(self) -> None:
+        """ Scroll so the song that is playing is at the top of the view """
+        self.scroll_to(self.player.current*self.tile_height)
         return None
     
     
@@ -226,9 +287,8 @@ class PlaylistView:
         """
         Move to the next page if possible
         """
-        if self.page_num < len(self.pages):
-            self.page_num += 1
-            self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+        if self.page_num < self.page_count-1:
+            self.scroll_to((self.page_num+1)*self.tile_height*self.songspp)
         return None
     
 
@@ -237,8 +297,7 @@ class PlaylistView:
         Move to the previous page if possible
         """
         if self.page_num > 0:
-            self.page_num -= 1
-            self.page_text = small.render(f"Page {self.page_num+1}/{len(self.pages)}", True, theme.current.norm_col)
+            self.scroll_to((self.page_num-1)*self.tile_height*self.songspp)
         return None
 
 
@@ -252,32 +311,111 @@ class PlaylistView:
 
         Render the title and songs and check for hover/clicks if allowed, render the page navigator if there's more than one
         """
+        self.update()
+        if check:
+            self.handle_mouse(mouse, r_click)
+        self.render(screen)
+        return None
+    
+
+    def update(self) -> None:
+        """
+        Scroll towards the target, make the tiles that came into view (and drop the ones that left it) and position them, without drawing anything
+        """
+        # move to where the tween has got to (it takes the same time whatever the frame rate, and slows down as it arrives)
+        if self.tween is not None:
+            done = self.tween.is_done()
+            self.scroll = self.tween.get() # exactly the target once it is done
+            if done:
+                self.tween = None
+        
+        # work out which songs are in view (plus the overscan)
+        view = self.get_view()
+        songs = self.player.current_playlist.songs
+        first = max(0, int(self.scroll)//self.tile_height - OVERSCAN)
+        last = min(len(songs), (int(self.scroll)+view.height)//self.tile_height + 1 + OVERSCAN)
+        for i in [i for i in self.tiles if i < first or i >= last]:
+            del self.tiles[i]
+        for i in range(first, last):
+            if i not in self.tiles:
+                song = songs[i]
+                self.tiles[i] = SongTile(view.topleft, song.name, artist=song.artist, on_click=self.player.play_async, length=self.length, song_id=i, path=song.path, get_info=self.player.metadata.get)
+        
+        self.place_tiles()
+        
+        # the page is the one at the top of the view, or the last one once the view can't scroll any further
+        bottom = len(songs)*self.tile_height - view.height
+        page_num = max(0, self.page_count-1) if self.target >= bottom else int(self.target)//view.height
+        if page_num != self.page_num:
+            self.page_num = page_num
+            self.page_text = text_cache.render(small, f"Page {self.page_num+1}/{self.page_count}", theme.current.norm_col)
+        return None
+    
+
+    def place_tiles(self) -> None:
+        """ Position the tiles (only the ones in view exist) from the view's position and the scroll """
+        view = self.get_view()
+        for i, tile in self.tiles.items():
+            tile.pos = view.x, view.y+i*self.tile_height-int(self.scroll)
+        return None
+    
+
+    def is_scrolling(self) -> bool:
+        """ Returns whether the tiles are moving towards the target """
+        return self.tween is not None
+    
+
+    def handle_mouse(self, mouse: tuple[int, int], r_click: bool) -> None:
+        """
+        Arguments:
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - r_click: a bool indicating whether the user is right clicking or not
+
+        Check the tiles and the page navigator for hover/clicks (called by the input dispatcher when the mouse moves or is pressed/lifted, or the tiles moved under it)
+        """
+        # tiles that are partly out of view can only be hovered on the part that is in view
+        in_view = self.get_view().collidepoint(mouse)
+        for tile in list(self.tiles.values()):
+            tile.check_hover(mouse if in_view else (-1, -1), r_click)
+            tile.check_click(r_click)
+        
+        if self.show_pages: # only check the page navigator if there's more than 1 page
+            # leave the next page button inactive if there is no next page to go to
+            self.next_page_button.update(self.page_num != self.page_count-1, mouse, r_click)
+            # leave the previous page button inactive if there is no previous page to go to
+            self.prev_page_button.update(self.page_num != 0, mouse, r_click)
+        return None
+    
+
+    def render(self, screen: pygame.Surface) -> None:
+        """ Render the title, the tiles in view and the page navigator on screen """
         # render the playlist title
         screen.blit(self.title, (self.pos[0], self.pos[1]+20))
-        # render each tile on the current page and check if they work
-        for i, tile in enumerate(self.pages[self.page_num]):
-            # update the tile's position before rendering it
-            tile.pos = self.pos[0], self.pos[1]+100+60*i
+        # render each tile, cutting off the parts that are scrolled out of view
+        clip = screen.get_clip()
+        screen.set_clip(self.get_view().clip(clip))
+        for tile in self.tiles.values():
             screen.blit(tile.get_tile(), tile.pos)
-            if check:
-                # only check for hover/click if allowed
-                tile.check_hover(mouse, r_click)
-                tile.check_click(r_click)
+        screen.set_clip(clip)
         
         if self.show_pages: # only show the page navigator if there's more than 1 page
-            # leave the next page button inactive if there is no next page to go to
-            check = True
-            if self.page_num == len(self.pages)-1:
-                check = False
-            self.next_page_button.draw(screen, check, mouse, r_click)
-            # leave the previous page button inactive if there is no previous page to go to
-            check = True
-            if self.page_num == 0:
-                check = False
-            self.prev_page_button.draw(screen, check, mouse, r_click)
+            self.next_page_button.render(screen)
+            self.prev_page_button.render(screen)
             screen.blit(self.page_text, ((self.pos[0]+self.length)/2-42, self.pos[1]+116+60*self.songspp))
         return None
     
+
+    def get_rect(self) -> pygame.Rect:
+        """ Returns the rect covering the title, the tiles and the page navigator """
+        return pygame.Rect(self.pos, (self.length, 140+60*self.songspp))
+    
+
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the playlist view looks, so the renderer can tell when it needs redrawing """
+        tiles = tuple((tile.pos, tile.colour, tile.title, tile.artist) for tile in self.tiles.values())
+        pages = (self.next_page_button.get_state(), self.prev_page_button.get_state(), id(self.page_text)) if self.show_pages else None
+        return (self.pos, id(self.title), tiles, pages)
+    
     
     def shift(self, val: int) -> None:
         """
@@ -286,12 +424,63 @@ class PlaylistView:
 
         Shifts all elements of this class by `val` on the x axis
         """
-        # update the structure position
+        # update the structure position, and place the tiles from it
         self.pos = (self.pos[0]+val, self.pos[1])
-        # update position of each song tile
-        for s in self.songs:
-            s.pos = (s.pos[0]+val, s.pos[1])
+        self.place_tiles()
         # update the posiiton of the page buttons
         self.prev_page_button.pos = (self.prev_page_button.pos[0]+val/2, self.prev_page_button.pos[1])
         self.next_page_button.pos = (self.next_page_button.pos[0]+val/2, self.next_page_button.pos[1])
         return None
+
+
+if __name__ == "__main__":
+    # measure how long it takes to open playlists of different sizes and draw the first frame, scroll and slide them
+    # usage (from the src folder): python -m screen_elements.playlist_view
+    import time
+    from classes.playlist import Song
+
+    class Metadata:
+        """ A metadata cache that doesn't know any songs """
+        def get(self, path: str) -> None:
+            return None
+
+    class Player:
+        """ Just enough of a MusicPlayer for the playlist view """
+        def __init__(self, count: int) -> None:
+            self.current_playlist = Playlist("Benchmark", [Song(f"Song {i}", f"./Music/song_{i}.mp3", f"Artist {i%100}") for i in range(count)])
+            self.current = 0
+            self.metadata = Metadata()
+            return None
+        
+        def play_async(self, id: int) -> None:
+            return None
+
+    screen = pygame.display.set_mode((1080, 720))
+    # draw a view once first, so loading the icons and the fonts' glyphs isn't counted
+    warm_up = Player(10)
+    view = PlaylistView((100, 50), warm_up.current_playlist, warm_up, length=880) # type: ignore
+    view.update()
+    view.render(screen)
+    for count in (10, 1000, 10000, 100000):
+        player = Player(count)
+        start = time.perf_counter()
+        view = PlaylistView((100, 50), player.current_playlist, player, length=880) # type: ignore
+        view.update()
+        view.render(screen)
+        opened = time.perf_counter()-start
+        # scroll to the middle and let the scrolling settle
+        view.scroll_to(count*view.tile_height/2)
+        start = time.perf_counter()
+        frames = 0
+        while view.scroll != view.target:
+            view.update()
+            view.render(screen)
+            frames += 1
+        scrolled = (time.perf_counter()-start)/max(frames, 1)
+        # slide the view out and back like the playlist bar does when it opens and closes
+        start = time.perf_counter()
+        for val in [27]*10+[-27]*10:
+            view.shift(val)
+        slid = (time.perf_counter()-start)/20
+        print(f"{count:>7} songs: opened in {opened*1000:5.2f} ms with {len(view.tiles)} tiles, scrolled halfway in {frames} frames ({scrolled*1000:.2f} ms per frame), slid in {slid*1000:.3f} ms per frame")
+    pygame.quit()
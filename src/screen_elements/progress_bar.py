@@ -5,11 +5,12 @@ This file holds the progress bar class, which shows the progress of the song
 import pygame
 
 import theme
+import assets
+import text_cache
 from music_player import MusicPlayer
 
-# init pygame and import a small sized font
-pygame.init()
-font = pygame.font.Font("./Assets_PROG2/Fonts/Roboto-Thin.ttf", 16)
+# a small sized font for the times
+font = assets.get_font(assets.THIN, 16)
 
 class ProgressBar:
     def __init__(self, player: MusicPlayer, pos: tuple, size: tuple, on_click) -> None:
@@ -28,9 +29,9 @@ class ProgressBar:
         self.pos = pos
         self.size = size
 
-        # time stamps for elapsed and remaining
-        self.elapsed = font.render("0:00", True,  (240, 240, 240))
-        self.remaining = font.render("0:00", True,  (240, 240, 240))
+        # time stamps for elapsed and remaining (in seconds)
+        self.elapsed = 0
+        self.remaining = 0
 
         # to access information and execute functions
         self.player: MusicPlayer = player
@@ -66,42 +67,76 @@ class ProgressBar:
 
         Evaluate the position and draw the progress bar on the screen
         """
-        # get progress from the music player
-        progress = self.player.get_progress()
-        if progress > 0.9999:
-            # go to the next song if it is about to end
-            self.player.next()
-        if progress < 0:
-            # go to the previous song if it somehow went beyond
-            self.player.prev()
+        if check:
+            self.handle_mouse(mouse, m_down)
+        self.update(check)
+        self.render(screen)
+        return None
+    
+
+    def update(self, check: bool) -> None:
+        """
+        Arguments:
+        - check: a boolean indicating whether the progress bar can be used (it shows nothing if not)
+
+        Evaluate the position and time stamps, without drawing anything
+        """
+        # get the position from the music player's clock (it stays within the song, the next song is started by the main loop when the mixer says this one ended)
+        playback = self.player.playback
+        position, duration = playback.get_position(), playback.get_duration()
+        progress = position/duration if duration > 0 else 0
         # calculate the time elapsed and remaining
-        elapsed = int(self.player.start_time+self.player.length_done)
-        remaining = int(self.player.song_length - elapsed)
+        elapsed = int(position)
+        remaining = int(duration - elapsed)
 
         self.done.width = int(progress*self.bar.width)
-        if check:
-            # check for hover/click if allowed to
-            self.check_hover(mouse, m_down)
-            self.check_click(mouse, m_down)
-        else:
-            # else default it to nothing
+        if not check:
+            # default it to nothing if it can't be used
             self.bar_colour = self.bar_norm_col
             self.done_colour = self.done_norm_col
             self.done.width = 0
             elapsed = 0
             remaining = 0
-        
+        self.elapsed, self.remaining = elapsed, remaining
+        return None
+    
+
+    def handle_mouse(self, mouse: tuple[int, int], m_down: bool) -> None:
+        """
+        Arguments:
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - m_down: a bool indicating whether the user is right clicking or not
+
+        Check for hover/click (called by the input dispatcher when the mouse moves or is pressed/lifted)
+        """
+        self.check_hover(mouse, m_down)
+        self.check_click(mouse, m_down)
+        return None
+    
+
+    def render(self, screen: pygame.Surface) -> None:
+        """ Draw the progress bar and the time stamps on screen """
         # draw the foreground and backgroud rectangles for the progress bar
         pygame.draw.rect(screen, self.bar_colour, self.bar)
         pygame.draw.rect(screen, self.done_colour, self.done)
 
         # render the timestamps and draw them
-        self.elapsed = font.render(f"{elapsed//60}:{'0' if elapsed%60 < 10 else ''}{elapsed%60}", True,  theme.current.norm_col)
-        self.remaining = font.render(f"{remaining//60}:{'0' if remaining%60 < 10 else ''}{remaining%60}", True,  theme.current.norm_col)
-        screen.blit(self.elapsed, (self.pos[0], self.pos[1]+12))
-        screen.blit(self.remaining, (self.pos[0]+self.size[0]-30, self.pos[1]+12))
+        elapsed = text_cache.render(font, f"{self.elapsed//60}:{'0' if self.elapsed%60 < 10 else ''}{self.elapsed%60}", theme.current.norm_col)
+        remaining = text_cache.render(font, f"{self.remaining//60}:{'0' if self.remaining%60 < 10 else ''}{self.remaining%60}", theme.current.norm_col)
+        screen.blit(elapsed, (self.pos[0], self.pos[1]+12))
+        screen.blit(remaining, (self.pos[0]+self.size[0]-30, self.pos[1]+12))
         return None
     
+
+    def get_rect(self) -> pygame.Rect:
+        """ Returns the rect covering the bar and the time stamps under it """
+        return pygame.Rect(self.pos, (self.size[0], 35))
+    
+
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the progress bar looks, so the renderer can tell when it needs redrawing """
+        return (self.pos, self.size, self.bar_colour, self.done_colour, self.done.width, self.elapsed, self.remaining)
+    
     
     def load_theme(self) -> None:
         """
@@ -0,0 +1,170 @@
+"""
+This file contains the search box, which finds songs in the search index as the user types and lists them under it.
+"""
+# imports
+import pygame
+
+import theme
+import text_cache
+from classes.input_field import InputField, font
+from classes.button import TextButton
+from search_index import SearchIndex
+
+
+class SearchBox:
+    def __init__(self, pos: tuple[int, int], index: SearchIndex, on_pick, width: int = 300, rows: int = 8) -> None:
+        """
+        Arguments:
+        - pos: (tuple[int, int]) the top left position of the search box
+        - index: (SearchIndex) the index to search [passed by reference]
+        - on_pick: (function) called with the path of the song the user picked
+        - width: (int) the width of the search box and the results under it
+        - rows: (int) the most results to show
+        """
+        self.pos = pos
+        self.width = width
+        self.index = index
+        self.on_pick = on_pick
+        self.rows = rows
+        self.row_height = 30
+
+        # the input field the user types in (it only shows the end of the text if it doesn't fit)
+        self.field = InputField(pos, (width, 35))
+        self.field.text = ""
+        self.field.display_limit = width-20
+        self.placeholder = text_cache.render(font, "Search songs", theme.current.hov_col)
+
+        # what was last searched for and the results of it, as buttons
+        self.query = ""
+        self.results: list[TextButton] = []
+        return None
+
+
+    def load_theme(self) -> None:
+        """ Update the colours to match the theme """
+        self.field.colour = theme.current.norm_col
+        self.placeholder = text_cache.render(font, "Search songs", theme.current.hov_col)
+        self.search()
+        return None
+
+
+    def is_showing(self) -> bool:
+        """ Returns whether the results are shown (only while typing) """
+        return self.field.is_active and len(self.results) > 0
+
+
+    def get_results_rect(self) -> pygame.Rect:
+        """ Returns the rect of the list of results under the input field """
+        return pygame.Rect(self.pos[0], self.pos[1]+40, self.width, self.row_height*len(self.results)+10)
+
+
+    def covers(self, mouse: tuple) -> bool:
+        """ Returns whether the input field or the results (if they are shown) are under the mouse, so the input dispatcher doesn't give the mouse to the elements under them """
+        return self.field.get_rect().collidepoint(mouse) or self.is_showing() and self.get_results_rect().collidepoint(mouse)
+
+
+    def get_area(self) -> pygame.Rect:
+        """ Returns the most the search box can cover (the input field and a full list of results) """
+        return self.field.get_rect().union(pygame.Rect(self.pos[0], self.pos[1]+40, self.width, self.row_height*self.rows+10))
+
+
+    def open(self) -> None:
+        """ Start typing in the search box """
+        self.field.is_active = True
+        return None
+
+
+    def close(self) -> None:
+        """ Stop typing and clear the search """
+        self.field.is_active = False
+        self.field.text = ""
+        self.search()
+        return None
+
+
+    def handle_key(self, event: pygame.event.Event, shift: bool) -> bool:
+        """
+        Arguments:
+        - event: (pygame.event.Event) an event from the main loop
+        - shift: (bool) whether the shift key is held down
+
+        Types into the search box while it is active (escape closes it, enter picks the first result).
+        Returns whether the event was used, so it isn't also used as a shortcut
+        """
+        if not self.field.is_active or event.type != pygame.KEYDOWN:
+            return False
+        if event.key == pygame.K_ESCAPE:
+            self.close()
+        elif event.key == pygame.K_RETURN:
+            if self.results:
+                self.results[0].execute()
+        else:
+            self.field.update_text(event, shift)
+        return True
+
+
+    def search(self) -> None:
+        """ Search the index for the text in the input field and make a button for each result """
+        self.query = self.field.text
+        self.results = []
+        for i, (path, name, artist, _) in enumerate(self.index.search(self.query, self.rows)):
+            label = f"{name} - {artist}" if artist else name
+            label = label[:37]+"..." if len(label) > 40 else label
+            self.results.append(TextButton(lambda path=path: self.pick(path), (self.pos[0]+10, self.pos[1]+45+i*self.row_height), (0, 0), label, 1))
+        return None
+
+
+    def pick(self, path: str) -> None:
+        """ Pass the picked song on and close the search box """
+        self.close()
+        self.on_pick(path)
+        return None
+
+
+    def update(self) -> None:
+        """ Blink the cursor of the input field, and search again if the text changed """
+        self.field.update()
+        if self.field.text != self.query:
+            self.search()
+        return None
+
+
+    def handle_mouse(self, mouse: tuple, m_down: bool) -> None:
+        """
+        Arguments:
+        - mouse: a tuple with the x, y coords of the mouse on the screen.
+        - m_down: a bool indicating whether the user is right clicking or not
+
+        Check the input field and the results for hover/clicks (called by the input dispatcher when the mouse moves or is pressed/lifted)
+        """
+        self.field.handle_mouse(mouse, m_down)
+        if self.is_showing():
+            for result in list(self.results): # picking a result clears them
+                result.handle_mouse(mouse, m_down)
+        return None
+
+
+    def render(self, screen: pygame.Surface) -> None:
+        """ Render the input field and the results under it """
+        self.field.render(screen)
+        if not self.field.text and not self.field.is_active:
+            screen.blit(self.placeholder, (self.pos[0]+4, self.pos[1]+4))
+        if self.is_showing():
+            pygame.draw.rect(screen, theme.current.sidebar, self.get_results_rect())
+            for result in self.results:
+                result.render(screen)
+        return None
+
+
+    def get_rect(self) -> pygame.Rect:
+        """ Returns the rect covering the input field and the results (if they are shown) """
+        rect = self.field.get_rect()
+        if self.is_showing():
+            rect.union_ip(self.get_results_rect())
+        return rect
+
+
+    def get_state(self) -> tuple:
+        """ Returns everything that affects how the search box looks, so the renderer can tell when it needs redrawing """
+        results = tuple(result.get_state() for result in self.results) if self.is_showing() else None
+        return (self.field.get_state(), id(self.placeholder), results)
@@ -0,0 +1,309 @@
+"""
+This file holds the search index, which finds songs by their name, artist, album or path as the user types.
+
+Every song is a document made of those four fields (lowercase). The index maps keys to the documents that contain them:
+- the first one and two letters of every word (e.g. "^t", "^tw"), so one and two letter searches match the start of words
+- every three letters in a row of every word (trigrams, e.g. "two", "wor"), so longer searches match anywhere in a word
+- the first one, two and three letters of the name (e.g. "=two"), to find the songs with a name starting with the search, which are shown first
+A search only looks at the documents that have every key of every word in the query (starting from the rarest key), and stops checking them once it has enough results.
+
+The index (documents and keys) is stored in Assets_PROG2/search_index.json next to the playlists, and kept up to date as playlists are saved and song files change.
+It can be run to time it on a made up library (usage from the src folder): python search_index.py [number of songs]
+"""
+# imports
+import os
+import re
+import json
+import heapq
+import threading
+
+from playlist_store import write_atomic
+
+# the most results a search returns
+LIMIT = 20
+# splits text into words
+WORDS = re.compile(r"\w+")
+
+
+def get_keys(text: str) -> set[str]:
+    """ Returns the index keys of the lowercase text of a document (its name is the first line) """
+    words = WORDS.findall(text)
+    keys = {word[i:i+3] for word in words for i in range(len(word)-2)}
+    keys.update("^"+word[:1] for word in words)
+    keys.update("^"+word[:2] for word in words)
+    name = text.split("\n", 1)[0]
+    keys.update("="+name[:n] for n in (1, 2, 3) if len(name) >= n)
+    return keys
+
+
+def get_query_keys(term: str) -> list[str]:
+    """ Returns the keys a document needs to have to match a word of a query """
+    if len(term) < 3:
+        return ["^"+term]
+    return [term[i:i+3] for i in range(len(term)-2)]
+
+
+class SearchIndex:
+    def __init__(self, path: str | None = "Assets_PROG2/search_index.json") -> None:
+        """
+        Arguments:
+        - path: (str or None) where the index is stored (None to only keep it in memory)
+        """
+        self.path = path
+        self.lock = threading.Lock() # the index is built on a worker thread and searched on the main thread
+        self.docs: dict[int, tuple[str, str, str, str]] = {} # the path, name, artist and album of each document, by its id
+        self.texts: dict[int, str] = {} # the lowercase fields of each document, searched for the words of the query
+        self.ids: dict[str, int] = {} # the id of each document, by its normalised path
+        self.keys: dict[str, set[int]] = {} # the ids of the documents with each key
+        self.next_id = 0
+        self.dirty = False # whether there are changes that haven't been saved
+        # the changes made before the stored index is loaded (None once it is, or if there isn't one), they are made again on top of it when it is
+        self.pending: list[tuple] | None = [] if path is not None and os.path.exists(path) else None
+        return None
+
+
+    def put(self, path: str, name: str, artist: str = "", album: str = "") -> None:
+        """
+        Arguments:
+        - path: (str) the path of the song
+        - name: (str) the name of the song
+        - artist: (str) the artist of the song
+        - album: (str) the album of the song
+
+        Adds a song, or updates it if a song with the same path is already in the index (nothing is done if it hasn't changed)
+        """
+        with self.lock:
+            self.change(self.put_fields, ((path, name, artist, album),))
+        return None
+
+
+    def change(self, method, args: tuple) -> None:
+        """ Makes a change with one of the methods below (the lock must be held), remembering it if the stored index hasn't been loaded yet """
+        if self.pending is not None:
+            self.pending.append((method, args))
+        method(*args)
+        return None
+
+
+    def put_fields(self, fields: tuple[str, str, str, str]) -> None:
+        """ Adds or updates a document (the lock must be held) """
+        doc = self.ids.get(os.path.normpath(fields[0]))
+        if doc is not None:
+            if self.docs[doc] == fields:
+                return None
+            self.drop(doc)
+        self.add(fields)
+        self.dirty = True
+        return None
+
+
+    def add(self, fields: tuple[str, str, str, str]) -> None:
+        """ Adds a document (the lock must be held) """
+        doc = self.next_id
+        self.next_id += 1
+        text = "\n".join(fields[1:]+(fields[0],)).lower()
+        self.docs[doc] = fields
+        self.texts[doc] = text
+        self.ids[os.path.normpath(fields[0])] = doc
+        for key in get_keys(text):
+            self.keys.setdefault(key, set()).add(doc)
+        return None
+
+
+    def drop(self, doc: int) -> None:
+        """ Removes a document (the lock must be held) """
+        for key in get_keys(self.texts.pop(doc)):
+            ids = self.keys[key]
+            ids.discard(doc)
+            if not ids:
+                del self.keys[key]
+        del self.ids[os.path.normpath(self.docs.pop(doc)[0])]
+        return None
+
+
+    def contains(self, path: str) -> bool:
+        """ Returns whether the song with the path is in the index """
+        return os.path.normpath(path) in self.ids
+
+
+    def get_paths(self) -> list[str]:
+        """ Returns the path of every song in the index """
+        with self.lock:
+            return [fields[0] for fields in self.docs.values()]
+
+
+    def remove(self, path: str) -> None:
+        """ Removes the song with the path (if it is in the index) """
+        with self.lock:
+            self.change(self.remove_path, (path,))
+        return None
+
+
+    def remove_path(self, path: str) -> None:
+        """ Removes a document by its path (the lock must be held) """
+        doc = self.ids.get(os.path.normpath(path))
+        if doc is not None:
+            self.drop(doc)
+            self.dirty = True
+        return None
+
+
+    def rename(self, old: str, new: str) -> None:
+        """ Moves the song at old to new, keeping its name, artist and album """
+        with self.lock:
+            self.change(self.rename_path, (old, new))
+        return None
+
+
+    def rename_path(self, old: str, new: str) -> None:
+        """ Moves a document to a new path (the lock must be held) """
+        doc = self.ids.get(os.path.normpath(old))
+        if doc is None:
+            return None
+        fields = (new,)+self.docs[doc][1:]
+        self.drop(doc)
+        self.add(fields)
+        self.dirty = True
+        return None
+
+
+    def search(self, query: str, limit: int = LIMIT) -> list[tuple[str, str, str, str]]:
+        """
+        Arguments:
+        - query: (str) what the user typed, every word has to be in the song (at the start of a word if it is shorter than 3 letters)
+        - limit: (int) the most results to return
+
+        Returns the path, name, artist and album of the matching songs, the ones with a name starting with the query first
+        """
+        terms = WORDS.findall(query.lower())
+        if not terms:
+            return []
+        start = " ".join(terms)
+        # the trigrams of a word can all be in a song without the word being there, so the longer words are checked too
+        long_terms = [term for term in terms if len(term) >= 3]
+        with self.lock:
+            keys = [key for term in terms for key in get_query_keys(term)]
+            postings = sorted((self.keys.get(key, set()) for key in keys), key=len)
+            # intersect from the rarest key, so the sets get small quickly
+            candidates = postings[0]
+            for ids in postings[1:]:
+                if not candidates:
+                    return []
+                candidates = candidates & ids
+            texts = self.texts
+            # first the songs with a name starting with the query (in the order they were added)
+            starting = candidates & self.keys.get("="+start[:3], set())
+            results = heapq.nsmallest(limit, starting if len(start) <= 3 else (doc for doc in starting if texts[doc].startswith(start)))
+            # then any others, stopping once there are enough
+            if len(results) < limit:
+                chosen = set(results)
+                for doc in candidates:
+                    if doc not in chosen and all(term in texts[doc] for term in long_terms):
+                        results.append(doc)
+                        if len(results) == limit:
+                            break
+            return [self.docs[doc] for doc in results]
+
+
+    def save(self) -> None:
+        """ Store the index if it has changed (the documents are stored by id, with null for removed ids, and the keys with the ids that have them) """
+        if self.path is None or not self.dirty or self.pending is not None:
+            return None # nothing to store, or only part of the index is in memory until the stored one is loaded
+        with self.lock:
+            docs = [self.docs.get(doc) for doc in range(self.next_id)]
+            text = json.dumps({"docs": docs, "keys": {key: list(ids) for key, ids in self.keys.items()}})
+            self.dirty = False
+        write_atomic(self.path, text)
+        return None
+
+
+    def load(self) -> bool:
+        """
+        Load the stored index, returns False if there isn't one (or it can't be read).
+        It can be loaded on a worker thread while the index is being changed: the changes made before it is loaded are made again on top of it
+        """
+        try:
+            with open(self.path, "r") as file:
+                stored = json.load(file)
+            docs, keys = stored["docs"], stored["keys"]
+        except (OSError, TypeError, KeyError, json.JSONDecodeError):
+            with self.lock:
+                self.pending = None # start from what is in memory
+            return False
+        with self.lock:
+            self.docs = {doc: tuple(fields) for doc, fields in enumerate(docs) if fields is not None}
+            self.texts = {doc: "\n".join(fields[1:]+(fields[0],)).lower() for doc, fields in self.docs.items()}
+            self.ids = {os.path.normpath(fields[0]): doc for doc, fields in self.docs.items()}
+            self.keys = {key: set(ids) for key, ids in keys.items()}
+            self.next_id = len(docs)
+            self.dirty = False
+            pending, self.pending = self.pending or [], None
+            for method, args in pending:
+                method(*args) # marks it dirty again if it changes anything
+        return True
+
+
+def make_corpus(count: int, seed: int = 0) -> list[tuple[str, str, str, str]]:
+    """
+    Arguments:
+    - count: (int) how many songs to make
+    - seed: (int) the random seed, the same seed always makes the same songs
+
+    Returns made up songs (path, name, artist, album) with a realistic spread of words: artists have several albums of about 12 songs, and some words are much more common than others
+    """
+    import random
+
+    rng = random.Random(seed)
+    syllables = [c+v for c in "bcdfghjklmnprstvwz" for v in "aeiouy"]+["th", "ch", "st", "er", "on", "ng"]
+    common = ["the", "love", "night", "you", "me", "heart", "remix", "feat", "live", "dream", "fire", "home", "in", "of", "my"]
+
+    def word() -> str:
+        # most words are common ones, the rest are made up from syllables
+        if rng.random() < 0.35:
+            return rng.choice(common)
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(1, 4)))
+
+    songs = []
+    while len(songs) < count:
+        artist = " ".join(word() for _ in range(rng.randint(1, 3))).title()
+        for _ in range(rng.randint(1, 5)):
+            album = " ".join(word() for _ in range(rng.randint(1, 4))).title()
+            for track in range(rng.randint(8, 16)):
+                name = " ".join(word() for _ in range(rng.randint(1, 5))).title()
+                songs.append((f"./Music/{artist}/{album}/{track+1:02} {name}.mp3", name, artist, album))
+    return songs[:count]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    corpus = make_corpus(count)
+    with tempfile.TemporaryDirectory() as folder:
+        index = SearchIndex(os.path.join(folder, "search_index.json"))
+        start = time.perf_counter()
+        for song in corpus:
+            index.put(*song)
+        print(f"indexed {count} songs in {time.perf_counter()-start:.2f} s ({len(index.keys)} keys)")
+        start = time.perf_counter()
+        index.save()
+        saved = time.perf_counter()-start
+        start = time.perf_counter()
+        loaded = SearchIndex(index.path)
+        loaded.load()
+        print(f"saved in {saved:.2f} s, loaded in {time.perf_counter()-start:.2f} s, same keys: {loaded.keys == index.keys}")
+        # every prefix of some queries, as if they were being typed
+        queries = ["the", "love night", "kalo", "remix", "ka", "t", "my heart feat", "zzz", "e", "in the", corpus[count//2][1], corpus[7][2], corpus[count-1][3]]
+        times = []
+        for query in queries:
+            for end in range(1, len(query)+1):
+                start = time.perf_counter()
+                results = index.search(query[:end])
+                times.append((time.perf_counter()-start, query[:end], len(results)))
+        times.sort()
+        print(f"{len(times)} searches: median {times[len(times)//2][0]*1000:.2f} ms, slowest {times[-1][0]*1000:.2f} ms ({times[-1][1]!r})")
+        start = time.perf_counter()
+        index.put(corpus[0][0], "Renamed Song", corpus[0][2], corpus[0][3])
+        print(f"updating a song: {(time.perf_counter()-start)*1000:.2f} ms, found: {index.search('renamed song')[0][1]}")
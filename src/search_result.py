@@ -1,54 +1,60 @@
-import os
-from pytube import YouTube
-from moviepy.audio.io.AudioFileClip import AudioFileClip
 import pygame
 
 import theme
+import assets
 from classes.button import TextButton
+from downloads import DownloadManager, Download, safe_name, QUEUED, DOWNLOADING, DONE, FAILED
 
-pygame.init()
-
-title_font = pygame.font.Font("./Assets/Fonts/Roboto-Bold.ttf", 40)
-subtitle_font = pygame.font.Font("./Assets/Fonts/Roboto-Medium.ttf", 16)
-small_font = pygame.font.Font("./Assets/Fonts/Roboto-Thin.ttf", 16)
+title_font = assets.get_font(assets.BOLD, 40)
+subtitle_font = assets.get_font(assets.MEDIUM, 16)
+small_font = assets.get_font(assets.THIN, 16)
 
 class SearchResult:
-    def __init__(self, query, pos, title, link, duration) -> None:
+    def __init__(self, query, pos, title, link, duration, downloads: DownloadManager) -> None:
         self.query = query
         self.text = title
         self.pos = pos
         self.link = link
+        self.downloads = downloads
         self.title = TextButton(self.get_music, pos, (0, 0), title[:100]+"..." if len(title)>100 else title, 1)
         self.duration = subtitle_font.render(duration, True, theme.current.norm_col)
+        self.download: Download | None = None
         self.done = None
     
     def get_music(self):
+        # clicking the result again while it is downloading cancels it
+        if self.download and not self.download.is_finished():
+            self.downloads.cancel(self.download)
+            return
         print("fetching", self.link)
-        # download the video file
-        video = YouTube(self.link).streams.filter(only_audio=True).first()
-        vid_file = video.download(output_path="./Music") # type: ignore
-        
-        # convert the video file into an audio
-        self.convert_music(vid_file)
-
-        # delete the video file
-        if os.path.exists(vid_file):
-            os.remove(vid_file)
+        # the title can have characters that can't be in a file name, the query is used if there's nothing left of it
+        name = safe_name(self.text) or safe_name(self.query) or "song"
+        self.download = self.downloads.add(self.link, f"./Music/{name}{self.downloads.target.extension}")
+        self.update_status()
+    
+    def update_status(self):
+        """ Show how far the download has got (called when it posts a DOWNLOAD_PROGRESS event) """
+        download = self.download
+        if download is None:
+            return
+        if download.state == QUEUED:
+            text = "Waiting to download... (click to cancel)"
+        elif download.state == DOWNLOADING:
+            progress = download.get_progress()
+            text = f"Downloading {progress:.0%}" if progress is not None else f"Downloading {download.received//1024} KB"
+            text += " (click to cancel)"
+        elif download.state == DONE:
+            text = "Song Downloaded in ./Music"
+        elif download.state == FAILED:
+            text = "The download failed, click to try again"
         else:
-            print("the file does not exist")
-        
-        self.done = small_font.render("Song Downloaded in ./Music", True, theme.current.norm_col)
+            text = "Download cancelled"
+        self.done = small_font.render(text, True, theme.current.norm_col)
     
-    def convert_music(self, vid_file):
-        mp3_file = AudioFileClip(vid_file)
-        try:
-            mp3_file.write_audiofile(f"./Music/{self.text}.mp3")
-            mp3_file.close()
-        except:
-            mp3_file.close()
-            mp3_file = AudioFileClip(vid_file)
-            mp3_file.write_audiofile(f"./Music/{self.query}.mp3")
-            mp3_file.close()
+    def set_y(self, y):
+        """ Move the result up or down (when the list of results is scrolled) """
+        self.pos = (self.pos[0], y)
+        self.title.pos = self.pos
     
     def draw(self, screen, check, mouse, m_down):
         self.title.draw(screen, check, mouse, m_down)
@@ -0,0 +1,296 @@
+"""
+This file holds the search service, which searches YouTube for the More Music window on the Loader's worker threads, so the window never waits for it.
+
+While the user types, the query is only searched once they stop typing for a moment (debounced), and results for older text are thrown away.
+The results of each query are kept for a while (TTL), so searching for it again shows them straight away. Only the first page of results is fetched,
+the next ones are fetched as the user scrolls to the end of the list.
+
+Where the results come from (the backend) is passed to the service, so it can be run without the internet.
+It can be run to time it with a local backend that takes as long as YouTube (usage from the src folder): python search_service.py
+"""
+# imports
+import time
+import threading
+
+import services
+from loader import Loader
+
+# how long to wait after the last key press before searching, in seconds
+DEBOUNCE = 0.4
+# how long the results of a query are kept, in seconds
+TTL = 10*60
+# how many results are fetched at a time
+PAGE_SIZE = 6
+
+
+def describe_error(error: Exception) -> str:
+    """ Returns a message for the user about why a search failed """
+    name = type(error).__name__
+    # youtubesearchpython uses httpx, whose network errors (ConnectError, ConnectTimeout, ...) aren't OSErrors
+    if isinstance(error, OSError) or "Connect" in name or "Timeout" in name or "Network" in name:
+        return "Couldn't connect to YouTube. Check your internet connection and try again."
+    return f"The search failed ({name}). Please try again later."
+
+
+class YouTubeCursor:
+    """
+    Fetches the results of a query from YouTube, a page at a time (makes requests, so it must be used on a worker thread)
+    """
+    def __init__(self, query: str, limit: int) -> None:
+        """
+        Arguments:
+        - query: (str) what to search for
+        - limit: (int) how many results are in a page
+        """
+        # only loaded once something is searched
+        self.youtube = services.youtube_search.get()
+        self.search = self.youtube.VideosSearch(query, limit=limit)
+        self.fetched = False # whether the first page (fetched when the search is made) has been returned
+        return None
+
+
+    def next_page(self) -> list[dict]:
+        """ Returns the next page of results (title, link and duration of each video), or an empty list if there are no more """
+        if self.fetched and not self.search.next():
+            return []
+        self.fetched = True
+        return [{"title": f"{r['title']}, by {r['channel']['name']}", "link": f"youtube.com/watch?v={r['id']}", "duration": r["duration"] or "LIVE"}
+                for r in self.search.result(self.youtube.ResultMode.dict)["result"]] # type: ignore
+
+
+class Entry:
+    """
+    Holds the results of a query fetched so far
+    """
+    def __init__(self, query: str, time: float) -> None:
+        """
+        Arguments:
+        - query: (str) the query
+        - time: (float) when it was made, it is fetched again once it is older than the TTL
+        """
+        self.query = query
+        self.time = time
+        self.cursor = None # made by the backend when the first page is fetched
+        self.results: list[dict] = []
+        self.done = False # whether every page has been fetched
+        self.lock = threading.Lock() # pages of the same query are fetched one at a time
+        return None
+
+
+class SearchService:
+    def __init__(self, loader: Loader, on_results, on_error, backend = YouTubeCursor, page_size: int = PAGE_SIZE, debounce: float = DEBOUNCE, ttl: float = TTL, clock = time.monotonic) -> None:
+        """
+        Arguments:
+        - loader: (Loader) runs the searches on worker threads [passed by reference]
+        - on_results: (function) called on the main thread with the query, its results so far and whether there are no more, whenever they change
+        - on_error: (function) called on the main thread with the query and a message for the user if the search failed
+        - backend: (class) made with a query and the page size on a worker thread, its next_page() returns the next page of results (see YouTubeCursor)
+        - page_size: (int) how many results are fetched at a time
+        - debounce: (float) how long to wait after the last key press before searching, in seconds
+        - ttl: (float) how long the results of a query are kept, in seconds
+        - clock: (function) returns the time in seconds
+        """
+        self.loader = loader
+        self.on_results = on_results
+        self.on_error = on_error
+        self.backend = backend
+        self.page_size = page_size
+        self.debounce = debounce
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: dict[str, Entry] = {} # the results of each query
+        self.query = "" # the query whose results are shown
+        self.typed = "" # the text being typed
+        self.typed_at: float | None = None # when it was last typed in, None once it has been searched
+        self.requests = 0 # how many pages have been fetched from the backend
+        return None
+
+
+    def type(self, text: str) -> None:
+        """ The text of the search field changed, it is searched once the user stops typing for a moment (see update) """
+        self.typed = text
+        self.typed_at = self.clock()
+        # whatever is being fetched for older text isn't wanted any more
+        self.loader.cancel("search")
+        return None
+
+
+    def update(self) -> None:
+        """ Search for the typed text if the user stopped typing (called every frame) """
+        if self.typed_at is not None and self.clock()-self.typed_at >= self.debounce:
+            self.search(self.typed)
+        return None
+
+
+    def search(self, text: str) -> None:
+        """ Search for the text straight away (e.g. when enter is pressed), showing the kept results if there are any """
+        self.typed_at = None
+        query = " ".join(text.split()).lower()
+        if not query or query == self.query and self.loader.is_busy("search"):
+            return None
+        self.query = query
+        now = self.clock()
+        # forget results that are too old
+        for old in [q for q, entry in self.entries.items() if now-entry.time >= self.ttl]:
+            del self.entries[old]
+        entry = self.entries.get(query)
+        if entry and entry.results:
+            self.loader.cancel("search")
+            self.on_results(query, entry.results, entry.done)
+            return None
+        if entry is None:
+            entry = self.entries[query] = Entry(query, now)
+        self.fetch(entry)
+        return None
+
+
+    def more(self) -> None:
+        """ Fetch the next page of results of the shown query (when the user scrolled to the end of them) """
+        entry = self.entries.get(self.query)
+        if entry is None or entry.done or self.loader.is_busy("search"):
+            return None
+        self.fetch(entry)
+        return None
+
+
+    def is_typing(self) -> bool:
+        """ Returns whether typed text is waiting for the user to stop typing before it is searched """
+        return self.typed_at is not None
+
+
+    def is_loading(self) -> bool:
+        """ Returns whether results are being fetched """
+        return self.loader.is_busy("search")
+
+
+    def fetch(self, entry: Entry) -> None:
+        """ Fetch the next page of the entry on a worker thread """
+        self.loader.submit("search", self.fetch_page, (entry, len(entry.results)), self.show, lambda error: self.on_error(entry.query, describe_error(error)))
+        return None
+
+
+    def fetch_page(self, entry: Entry, known: int) -> Entry:
+        """
+        Arguments:
+        - entry: (Entry) the query to fetch the next page of
+        - known: (int) how many results there were when the page was asked for
+
+        Fetches the next page and adds it to the entry (on a worker thread). The page is kept even if the search was cancelled meanwhile, as the backend can't fetch it again
+        """
+        with entry.lock:
+            # another job got the page while this one waited for the lock
+            if len(entry.results) > known or entry.done:
+                return entry
+            if entry.cursor is None:
+                entry.cursor = self.backend(entry.query, self.page_size)
+            page = entry.cursor.next_page()
+            self.requests += 1
+            # a new list, so the main thread never sees it half updated
+            entry.results = entry.results+page
+            entry.done = len(page) == 0
+        return entry
+
+
+    def show(self, entry: Entry) -> None:
+        """ Pass the results on if they are for the shown query """
+        if entry.query == self.query:
+            self.on_results(entry.query, entry.results, entry.done)
+        return None
+
+
+if __name__ == "__main__":
+    # type a query a letter at a time and count the requests with and without debouncing, then time searching it again (cached) and scrolling through the pages,
+    # exits with 1 if debounced typing made more than one request, a stale query was shown or searching again asked the backend
+    import sys
+    import pygame
+
+    from loader import LOAD_DONE
+
+    LATENCY = 0.3 # seconds YouTube takes to answer
+    TYPING = 0.12 # seconds between key presses
+    PAGES = 3
+
+    class FakeCursor:
+        """ A stand-in for YouTubeCursor that takes as long as YouTube, with made up results """
+        def __init__(self, query: str, limit: int) -> None:
+            self.query = query
+            self.limit = limit
+            self.page = 0
+            time.sleep(LATENCY)
+
+        def next_page(self) -> list[dict]:
+            if self.page > 0:
+                time.sleep(LATENCY)
+            if self.page == PAGES:
+                return []
+            self.page += 1
+            return [{"title": f"{self.query} {self.page}.{i}", "link": f"{self.query}/{self.page}/{i}", "duration": "3:00"} for i in range(self.limit)]
+
+    def run(service: SearchService, loader: Loader, until) -> float:
+        """ Run a main loop until the condition is met, returns the worst frame time """
+        worst = 0
+        while not until():
+            start = time.perf_counter()
+            for e in pygame.event.get():
+                if e.type == LOAD_DONE:
+                    loader.finish(e)
+            service.update()
+            worst = max(worst, time.perf_counter()-start)
+            time.sleep(1/60)
+        return worst
+
+    pygame.display.init()
+    pygame.display.set_mode((200, 200))
+    query = "never gonna give you up"
+    failures = []
+    for debounce in (0, DEBOUNCE):
+        loader = Loader()
+        shown = []
+        service = SearchService(loader, lambda q, results, done: shown.append((q, len(results), done)), lambda q, message: print("error:", message), FakeCursor, debounce=debounce)
+        start = time.perf_counter()
+        for end in range(1, len(query)+1):
+            service.type(query[:end])
+            typed = time.perf_counter()
+            run(service, loader, lambda: time.perf_counter()-typed >= TYPING)
+        worst = run(service, loader, lambda: shown and shown[-1][0] == query)
+        print(f"debounce {debounce} s: {service.requests} requests while typing {len(query)} letters, results {time.perf_counter()-start-TYPING*len(query):.2f} s after the last letter, "
+              f"only the final query shown: {all(q == query for q, _, _ in shown)}, worst frame {worst*1000:.2f} ms")
+        if debounce and service.requests > 1:
+            failures.append(f"{service.requests} requests while typing with debouncing")
+        if any(q != query for q, _, _ in shown):
+            failures.append(f"stale queries shown with debounce {debounce} s: {sorted({q for q, _, _ in shown if q != query})}")
+        loader.shutdown()
+
+    # searching the same query again is answered from the kept results
+    loader = Loader()
+    shown = []
+    service = SearchService(loader, lambda q, results, done: shown.append((q, len(results), done)), lambda q, message: print("error:", message), FakeCursor)
+    service.search(query)
+    run(service, loader, lambda: shown)
+    service.search("something else")
+    run(service, loader, lambda: len(shown) == 2)
+    requests = service.requests
+    start = time.perf_counter()
+    service.search(query)
+    if service.requests != requests or shown[-1][0] != query:
+        failures.append("searching again wasn't answered from the kept results")
+    print(f"searching again: {(time.perf_counter()-start)*1000:.3f} ms, {service.requests} requests in total")
+    # scroll to the end of the results until there are no more
+    while not shown[-1][2]:
+        service.more()
+        run(service, loader, lambda: not service.is_loading())
+    print(f"scrolling: {shown[-1][1]} results in {PAGES} pages, {service.requests} requests in total")
+    # a failing backend gives a message instead of a crash
+    def offline(query: str, limit: int):
+        raise OSError("Network is unreachable")
+    errors = []
+    service = SearchService(loader, lambda *_: None, lambda q, message: errors.append(message), offline)
+    service.search(query)
+    run(service, loader, lambda: errors)
+    print(f"offline: {errors[0]}")
+    loader.shutdown()
+    pygame.quit()
+    for failure in failures:
+        print("failed:", failure)
+    if failures:
+        sys.exit(1)
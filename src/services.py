@@ -0,0 +1,142 @@
+"""
+This file holds the services, the heavy parts of the app that most launches never use: the file dialog (tkinter), the downloader (pytube), the transcoder (ffmpeg) and the YouTube search.
+
+Each service is only loaded the first time it is used (Service.get), so starting the app doesn't pay for importing them, or for making the hidden tkinter window the file dialog needs.
+The time spent loading them is added to the asset timings, so the startup profiler would show it if one was ever loaded while starting.
+
+It can be run to check that the modules main.py and more_music.py import don't load any of the services, and how long they take to import (with python -X importtime).
+It exits with an error if a service is imported or the imports take longer than the budget (usage from the src folder): python services.py [budget in ms]
+"""
+# imports
+import time
+import shutil
+import threading
+
+import assets
+
+
+class Service:
+    """
+    Loads a subsystem the first time it is used, and hands out the same one after that (it can be used from any thread)
+    """
+    def __init__(self, name: str, load) -> None:
+        """
+        Arguments:
+        - name: (str) what the service is, for messages
+        - load: (function) imports and sets up the subsystem, returns what get returns. If it raises, it is tried again the next time
+        """
+        self.name = name
+        self.load = load
+        self.value = None
+        self.loaded = False
+        self.lock = threading.Lock()
+        return None
+
+
+    def get(self):
+        """ Returns the subsystem, loading it if it hasn't been used yet """
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    start = time.perf_counter()
+                    self.value = self.load()
+                    self.loaded = True
+                    assets.record("services", time.perf_counter()-start)
+        return self.value
+
+
+def load_file_dialog():
+    """ Imports tkinter and makes the hidden root window its file dialog needs, returns tkinter.filedialog """
+    import tkinter
+    from tkinter import filedialog
+
+    root = tkinter.Tk()
+    root.withdraw()
+    return filedialog
+
+
+def load_downloader():
+    """ Imports pytube (with its request module, which streams the downloads) """
+    import pytube
+    import pytube.request
+
+    return pytube
+
+
+def load_transcoder() -> str:
+    """ Returns the path of ffmpeg, the one that comes with moviepy (imageio-ffmpeg) if it is installed, otherwise the one on the PATH """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        pass
+    path = shutil.which("ffmpeg")
+    if path is None:
+        raise FileNotFoundError("ffmpeg was not found")
+    return path
+
+
+def load_youtube_search():
+    """ Imports youtubesearchpython """
+    import youtubesearchpython
+
+    return youtubesearchpython
+
+
+# the services
+file_dialog = Service("file dialog", load_file_dialog)
+downloader = Service("downloader", load_downloader)
+transcoder = Service("transcoder", load_transcoder)
+youtube_search = Service("YouTube search", load_youtube_search)
+
+
+if __name__ == "__main__":
+    import os
+    import ast
+    import sys
+    import subprocess
+
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    # the top level packages of the services, none of them should be imported when the app starts
+    SERVICE_PACKAGES = {"tkinter", "_tkinter", "pytube", "imageio_ffmpeg", "moviepy", "youtubesearchpython"}
+    RUNS = 3
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+
+    def get_imports(path: str) -> list[str]:
+        """ Returns the modules the file imports at the top level """
+        with open(path, "r") as file:
+            tree = ast.parse(file.read())
+        return [alias.name for node in tree.body if isinstance(node, ast.Import) for alias in node.names]+[node.module for node in tree.body if isinstance(node, ast.ImportFrom) and node.module]
+
+    def import_times(modules: list[str]) -> list[tuple[str, int, int, int]]:
+        """ Imports the modules in a new interpreter, returns the name, depth, own time and cumulative time (in microseconds) of every module it imported """
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import "+", ".join(modules)], capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            sys.exit("\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:")))
+        times = []
+        # each line looks like "import time:       591 |      18140 |           numpy.lib", the name is indented by 2 spaces per level
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            own, cumulative, name = line[len("import time:"):].split("|")
+            times.append((name.strip(), (len(name)-len(name.lstrip())-1)//2, int(own), int(cumulative)))
+        return times
+
+    failed = False
+    for entry in ("main.py", "more_music.py"):
+        modules = get_imports(entry)
+        # the fastest of a few runs, so a slow run doesn't look like a regression
+        runs = [import_times(modules) for _ in range(RUNS)]
+        times = min(runs, key=lambda t: sum(c for _, depth, _, c in t if depth == 0))
+        total = sum(cumulative for _, depth, _, cumulative in times if depth == 0)/1000
+        print(f"{entry}: {len(times)} modules imported in {total:.1f} ms (budget {budget:.0f} ms), slowest:")
+        for name, depth, _, cumulative in sorted((t for t in times if t[1] == 0), key=lambda t: -t[3])[:8]:
+            print(f"  {name:<36}{cumulative/1000:8.1f} ms")
+        services = sorted({name for name, *_ in times if name.split(".")[0] in SERVICE_PACKAGES})
+        if services:
+            print(f"  services imported at startup: {', '.join(services)}")
+            failed = True
+        if total > budget:
+            print("  over budget")
+            failed = True
+    sys.exit(1 if failed else 0)
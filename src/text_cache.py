@@ -0,0 +1,85 @@
+"""
+This file holds the text cache, which remembers rendered text so widgets don't call font.render every frame.
+
+Surfaces are stored by (font, size, text, colour, antialias) and the least recently used ones are dropped when they take up more than the byte budget.
+The surfaces are shared between everyone that asks for the same text, so they must not be drawn on.
+"""
+# imports
+from collections import OrderedDict
+
+import pygame
+
+# how many bytes of rendered text to keep around
+BUDGET = 8*1024*1024
+
+
+class TextCache:
+    def __init__(self, budget: int = BUDGET) -> None:
+        """
+        Arguments:
+        - budget: (int) the most bytes of surfaces to keep before dropping the least recently used ones
+        """
+        self.budget = budget
+        self.surfaces: OrderedDict[tuple, pygame.Surface] = OrderedDict() # the least recently used surface is first
+        self.bytes = 0
+        # counters to check how well the cache works (a frame where nothing changed should only hit)
+        self.hits = 0
+        self.misses = 0
+        return None
+
+
+    def render(self, font: pygame.font.Font, text: str, colour, antialias: bool = True) -> pygame.Surface:
+        """
+        Arguments:
+        - font: (pygame.font.Font) the font to render the text with
+        - text: (str) the text to render
+        - colour: the colour of the text
+        - antialias: (bool) whether to smooth the edges of the text
+
+        Returns the rendered text, only rendering it if it isn't in the cache yet
+        """
+        key = (font, font.get_height(), text, colour if isinstance(colour, int) else tuple(colour), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, colour)
+        self.surfaces[key] = surface
+        self.bytes += surface.get_pitch()*surface.get_height()
+        # drop the least recently used surfaces until it fits in the budget again (always keeping the new one)
+        while self.bytes > self.budget and len(self.surfaces) > 1:
+            _, old = self.surfaces.popitem(last=False)
+            self.bytes -= old.get_pitch()*old.get_height()
+        return surface
+
+
+    def invalidate(self, colours) -> None:
+        """
+        Arguments:
+        - colours: (iterable) the colours to forget the text of (e.g. the colours of the old theme)
+        """
+        colours = {c if isinstance(c, int) else tuple(c) for c in colours}
+        for key in [key for key in self.surfaces if key[3] in colours]:
+            old = self.surfaces.pop(key)
+            self.bytes -= old.get_pitch()*old.get_height()
+        return None
+
+
+    def clear(self) -> None:
+        """ Forget every surface and reset the counters """
+        self.surfaces.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        return None
+
+
+# the cache shared by every widget
+cache = TextCache()
+
+
+def render(font: pygame.font.Font, text: str, colour, antialias: bool = True) -> pygame.Surface:
+    """ Render text through the shared cache, see TextCache.render """
+    return cache.render(font, text, colour, antialias)
@@ -0,0 +1,63 @@
+"""
+This file holds the Tween, which animates a value from a start to an end over some time.
+
+Animations used to move by a fixed amount every frame, so they were slower when the frame rate dropped (or the loop slept between frames).
+A tween works out the value from how long it has been running instead, so it always takes the same time, and an easing function shapes the movement
+(e.g. ease_out starts fast and slows down as it arrives).
+"""
+# imports
+import time
+
+
+def linear(t: float) -> float:
+    """ Moves at the same speed the whole way """
+    return t
+
+
+def ease_out(t: float) -> float:
+    """ Starts fast and slows down as it arrives """
+    return 1-(1-t)**3
+
+
+def ease_in_out(t: float) -> float:
+    """ Speeds up, then slows down as it arrives """
+    return 4*t**3 if t < 0.5 else 1-(2-2*t)**3/2
+
+
+class Tween:
+    def __init__(self, start: float, end: float, duration: float, easing = ease_out, clock = time.monotonic) -> None:
+        """
+        Arguments:
+        - start: (float) the value it starts from
+        - end: (float) the value it ends at
+        - duration: (float) how long it takes to get from start to end (seconds)
+        - easing: (function) takes how far through the tween it is (0 to 1), returns how far the value has moved (0 to 1)
+        - clock: (function) returns the time in seconds
+        """
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.easing = easing
+        self.clock = clock
+        self.started = clock()
+        return None
+
+
+    def get_progress(self) -> float:
+        """ Returns how far through the tween it is (0 to 1) """
+        if self.duration <= 0:
+            return 1.0
+        return min(max((self.clock()-self.started)/self.duration, 0.0), 1.0)
+
+
+    def get(self) -> float:
+        """ Returns the value right now """
+        progress = self.get_progress()
+        if progress >= 1:
+            return self.end
+        return self.start+(self.end-self.start)*self.easing(progress)
+
+
+    def is_done(self) -> bool:
+        """ Returns whether the value has got to the end """
+        return self.get_progress() >= 1
@@ -0,0 +1,220 @@
+"""
+This file holds the watcher, which keeps the library and the playlists up to date while the app is running.
+
+On Linux it asks the kernel (inotify, through ctypes so nothing has to be installed) to tell it when anything in a music folder or next to the playlists file changes,
+and rescans the library straight away. Anywhere else (or if inotify can't be used) it falls back to rescanning every few seconds, which is cheap as unchanged folders are only stat'ed.
+The changes the library finds and any change to the watched files are posted as a LIBRARY_CHANGED event, which the main loop passes to MusicPlayer.apply_library_changes.
+"""
+# imports
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import threading
+
+import pygame
+
+from library import Library, Changes, ScanStats
+from playlist_store import file_stamp
+
+# event posted when songs or watched files changed, with the library Changes (or None) as changes and whether a watched file changed as files_changed
+LIBRARY_CHANGED = pygame.USEREVENT+3
+# how long to wait for the rest of a burst of events (e.g. copying an album) before rescanning, in seconds
+DEBOUNCE = 0.2
+# how often to rescan when inotify can't be used, in seconds
+POLL_INTERVAL = 2.0
+
+# inotify flags (from <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+FOLDER_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_CLOSE_WRITE | IN_ONLYDIR
+# the header of each event read from inotify: watch descriptor, mask, cookie and length of the name after it
+EVENT = struct.Struct("iIII")
+
+
+def load_inotify():
+    """ Returns libc if it has inotify (Linux), None otherwise """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+class Watcher:
+    def __init__(self, library: Library, files: list[str], poll: bool = False) -> None:
+        """
+        Arguments:
+        - library: (Library) the library to keep up to date
+        - files: (list[str]) other files to watch (e.g. the playlists file), they can be replaced by other programs as the folders they are in are watched
+        - poll: (bool) rescan every few seconds even if inotify could be used
+        """
+        self.library = library
+        self.files = [os.path.normpath(f) for f in files]
+        self.libc = None if poll else load_inotify()
+        self.fd = -1
+        self.watches: dict[str, int] = {} # the watch descriptor of each watched folder, by path
+        self.paths: dict[int, str] = {} # the reverse of watches
+        self.stamps = {f: file_stamp(f) for f in self.files} # used to notice the files changing when polling
+        self.scanned: ScanStats | None = None # how the first scan went, once it is done
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="watcher", daemon=True)
+        # every change the library finds (also in scans started by the player) is passed on to the main loop
+        library.on_change = lambda changes: self.post(changes, False)
+        return None
+
+
+    def start(self) -> None:
+        """ Start watching on a background thread (the first thing it does is scan the library) """
+        self.thread.start()
+        return None
+
+
+    def stop(self) -> None:
+        """ Stop watching and wait for the thread to finish """
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        return None
+
+
+    def post(self, changes: Changes | None, files_changed: bool) -> None:
+        """ Tell the main loop about the changes """
+        pygame.event.post(pygame.event.Event(LIBRARY_CHANGED, changes=changes, files_changed=files_changed))
+        return None
+
+
+    def run(self) -> None:
+        """ Scan the library, then watch for changes until stopped """
+        self.scanned = self.library.scan()
+        if self.libc is not None:
+            self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+            if self.fd < 0:
+                print(f"inotify unavailable ({os.strerror(ctypes.get_errno())}), checking for changes every {POLL_INTERVAL} s")
+                self.libc = None
+        if self.libc is None:
+            self.run_polling()
+        else:
+            self.run_inotify()
+        return None
+
+
+    def run_polling(self) -> None:
+        """ Rescan the library and check the files every POLL_INTERVAL seconds """
+        while not self.stopping.wait(POLL_INTERVAL):
+            self.library.scan()
+            self.check_files()
+        return None
+
+
+    def check_files(self) -> None:
+        """ Post an event if any of the watched files changed since they were last checked """
+        changed = False
+        for path in self.files:
+            stamp = file_stamp(path)
+            if stamp != self.stamps[path]:
+                self.stamps[path] = stamp
+                changed = True
+        if changed:
+            self.post(None, True)
+        return None
+
+
+    def sync_watches(self) -> None:
+        """ Watch every folder in the library and the folders of the watched files, and stop watching folders that are gone """
+        wanted = set(self.library.folders) | {os.path.dirname(f) or "." for f in self.files}
+        for path in [p for p in self.watches if p not in wanted]:
+            self.libc.inotify_rm_watch(self.fd, self.watches[path]) # fails harmlessly if the folder was deleted (its watch is already gone)
+            del self.paths[self.watches.pop(path)]
+        for path in wanted - self.watches.keys():
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), FOLDER_MASK)
+            if wd >= 0:
+                self.watches[path] = wd
+                self.paths[wd] = path
+        return None
+
+
+    def read_events(self) -> tuple[set[str], bool, bool]:
+        """ Read every waiting event, returns the folders that changed, whether a watched file changed and whether events were lost """
+        folders: set[str] = set()
+        files_changed = False
+        overflow = False
+        while select.select([self.fd], [], [], 0)[0]:
+            data = os.read(self.fd, 64*1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                name = data[offset+EVENT.size:offset+EVENT.size+length].rstrip(b"\0")
+                offset += EVENT.size+length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                folder = self.paths.get(wd)
+                if folder is None:
+                    continue
+                if os.path.normpath(os.path.join(folder, os.fsdecode(name))) in self.files:
+                    files_changed = True
+                if folder in self.library.folders:
+                    folders.add(folder)
+        return folders, files_changed, overflow
+
+
+    def run_inotify(self) -> None:
+        """ Wait for inotify events and rescan the folders they happened in """
+        self.sync_watches()
+        self.library.scan() # catch anything that changed before the folders were watched
+        while not self.stopping.is_set():
+            if not select.select([self.fd], [], [], 0.5)[0]:
+                continue
+            # let the rest of the burst arrive, so it is dealt with in one scan
+            if self.stopping.wait(DEBOUNCE):
+                break
+            folders, files_changed, overflow = self.read_events()
+            if folders or overflow:
+                # read the folders the events were in even if their modification time looks the same, if events were lost read everything
+                self.library.scan(set(self.library.folders) if overflow else folders)
+                self.sync_watches()
+            if files_changed or overflow:
+                self.post(None, True)
+        return None
+
+
+if __name__ == "__main__":
+    # measure how long it takes for a change to a folder to be noticed, with inotify and with polling
+    # usage (from the src folder): python watcher.py
+    import tempfile
+
+    pygame.display.init()
+    with tempfile.TemporaryDirectory() as folder:
+        root = os.path.join(folder, "Music")
+        os.makedirs(os.path.join(root, "Album"))
+        open(os.path.join(root, "Album", "song.mp3"), "w").close()
+        for poll in (False, True):
+            library = Library([root], os.path.join(folder, f"library{int(poll)}.db"))
+            watcher = Watcher(library, [os.path.join(folder, "playlists.json")], poll)
+            watcher.start()
+            time.sleep(0.5)
+            pygame.event.clear()
+            start = time.perf_counter()
+            os.rename(os.path.join(root, "Album", "song.mp3"), os.path.join(root, "Album", "renamed.mp3"))
+            event = None
+            while event is None and time.perf_counter()-start < 5:
+                event = next((e for e in pygame.event.get() if e.type == LIBRARY_CHANGED), None)
+                time.sleep(0.01)
+            print(f"{'polling' if watcher.libc is None else 'inotify'}: rename noticed after {(time.perf_counter()-start)*1000:.0f} ms:", event.changes.renamed if event else None)
+            watcher.stop()
+            os.rename(os.path.join(root, "Album", "renamed.mp3"), os.path.join(root, "Album", "song.mp3"))
+    pygame.quit()